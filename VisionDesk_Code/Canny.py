@@ -1,59 +1,208 @@
+import json
+import os
 import sys
+import time
+# Startup timings (imports, window shown, camera open, first frame) are measured from here
+STARTUP_START = time.perf_counter()
 import cv2
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QSlider, 
                             QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, 
-                            QComboBox, QFileDialog, QGroupBox, QGridLayout, QStatusBar)
-from PyQt5.QtCore import Qt, QTimer, pyqtSlot
-from PyQt5.QtGui import QImage, QPixmap, QFont, QIcon
+                            QComboBox, QGroupBox, QGridLayout, QStatusBar,
+                            QSpinBox, QDialog)
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QPixmap, QFont, QIcon, QPainter, QPen, QColor
+
+from pipeline import FramePipeline
+from cache import ResultCache
+from capture import (BACKENDS, PIXEL_FORMATS, SYNTHETIC, CaptureSettings, LatencyProbe,
+                     open_source_async)
+from display import DisplayConverter
+from filters import FILTER_NAMES
+from metrics import Metrics, MetricsServer
+from processing import FrameProcessor, RoiRegion, ScaleController
+from style import APP_STYLESHEET
+# Stays eager: the codec and overflow combo boxes are filled from it while the window is built,
+# and it only needs cv2 and numpy, which are loaded for the first frame anyway
+from recorder import CODECS, OVERFLOW_POLICIES, AsyncVideoWriter, open_output
+# Optional subsystems (analytics, frame store, incremental rendering, playback, scheduler,
+# threshold tuning, snapshot writer) and QFileDialog are imported where they are first used
+
+IMPORTS_DONE = time.perf_counter()
+
+# Recording choice that stores the camera's raw frames for replay instead of encoding output
+RAW_STORE_CODEC = "Raw Camera Frames (VDF Store)"
+# Seconds the encoders get on exit to write what is still queued
+WRITER_EXIT_TIMEOUT = 10.0
+# Where edge analytics go: a file format from analytics.FORMATS, or the local UDP socket
+ANALYTICS_OUTPUTS = {
+    "JSON Lines File": "jsonl",
+    "Columnar Binary Files": "columnar",
+    "Local Socket (UDP 127.0.0.1:9109)": "socket",
+}
+
+
+class ThresholdSweepDialog(QDialog):
+    # Heatmap of edge density over the (low, high) threshold grid; clicking a cell applies it
+    threshold_chosen = pyqtSignal(int, int)
+    
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Threshold Sweep")
+        self.result = result
+        self.cell = 16
+        
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Edge density for low {result.lows[0]}-{result.lows[-1]} (down) and "
+                                f"high {result.highs[0]}-{result.highs[-1]} (across).\n"
+                                "Click a cell to use that pair."))
+        from tuning import heatmap_image
+        image = heatmap_image(result, self.cell)
+        height, width = image.shape[:2]
+        self.heatmap_label = QLabel()
+        self.heatmap_label.setFixedSize(width, height)
+        self.heatmap_label.setPixmap(QPixmap.fromImage(DisplayConverter().to_qimage(image, width, height)))
+        self.heatmap_label.mousePressEvent = self.heatmap_clicked
+        layout.addWidget(self.heatmap_label)
+        self.info_label = QLabel("Blue: few edges, red: many. Grey: high below low.")
+        layout.addWidget(self.info_label)
+    
+    def heatmap_clicked(self, event):
+        row, col = event.y() // self.cell, event.x() // self.cell
+        density = self.result.density
+        if not (0 <= row < density.shape[0] and 0 <= col < density.shape[1]):
+            return
+        low, high = int(self.result.lows[row]), int(self.result.highs[col])
+        if np.isnan(density[row, col]):
+            self.info_label.setText(f"High {high} is below low {low}")
+            return
+        self.info_label.setText(f"Low {low}, High {high}: {density[row, col]:.1%} of pixels are edges")
+        self.threshold_chosen.emit(low, high)
+
+
+class LatencyProbeWindow(QWidget):
+    # Shows the probe code for the current time; with the camera pointed at this window the
+    # app reads the code back from each frame (see capture.LatencyProbe)
+    def __init__(self, probe, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Latency Probe")
+        self.probe = probe
+        self.resize(640, 200)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.code_label = QLabel()
+        self.code_label.setMinimumSize(160, 40)
+        layout.addWidget(self.code_label)
+        # Redraw faster than the screen refreshes, so the code is never more than a frame old
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(5)
+    
+    def refresh(self):
+        width, height = self.code_label.width(), self.code_label.height()
+        image = self.probe.render(width, height, time.perf_counter())
+        q_img = QImage(image.data, width, height, width, QImage.Format_Grayscale8)
+        self.code_label.setPixmap(QPixmap.fromImage(q_img))
+    
+    def closeEvent(self, event):
+        self.timer.stop()
+        event.accept()
+
 
 class ImageProcessingApp(QMainWindow):
-    def __init__(self):
+    # Emitted from the snapshot writer thread; delivered on the GUI thread
+    snapshot_saved = pyqtSignal(str)
+    # Emitted from the camera-open thread: source, connect generation, seconds, settings
+    camera_opened = pyqtSignal(object, int, float, object)
+    sweep_done = pyqtSignal(object, int, float)
+    
+    def __init__(self, device=0):
         super().__init__()
         
         # App settings
         self.setWindowTitle("Canny Edge Detector")
         self.setGeometry(100, 100, 1200, 800)
         
+        # Milliseconds from STARTUP_START to each startup milestone
+        self.startup = {"imports": (IMPORTS_DONE - STARTUP_START) * 1000.0}
+        
         # Initialize variables
-        self.camera = cv2.VideoCapture(0)
-        self.frame_width = int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.frame_height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        self.fps = self.camera.get(cv2.CAP_PROP_FPS)
+        # Backend, buffering and format; changing them reopens the source (Camera group).
+        # The camera is opened in the background, so it is None until connected.
+        self.capture_settings = CaptureSettings(device=device)
+        self.camera = None
+        self.connect_generation = 0
+        self.closing = False
+        self.frame_width, self.frame_height, self.fps = 0, 0, 0.0
+        self.camera_format = (self.frame_width, self.frame_height, self.fps)
+        
+        # Glass-to-glass measurement: LatencyProbe while enabled, and its probe window
+        self.latency_probe = None
+        self.probe_window = None
+        self.glass_to_glass_ms = None
+        
+        # Recorded clip being played back instead of the camera, if any
+        self.clip = None
+        # Stage results for clip frames, so replays and threshold changes reuse earlier work
+        self.result_cache = ResultCache(budget_mb=512)
         
         # Image processing variables
         self.drawing = False
-        self.roi_selected = False
         self.roi_start = (0, 0)
         self.roi_end = (0, 0)
-        self.roi = None
         
-        # Canny parameters
-        self.low_threshold = 50
-        self.high_threshold = 150
-        self.canny_active = False
+        # Per-stage timings, counters and queue depths for the whole pipeline
+        self.metrics = Metrics()
+        self.metrics_server = None
+        
+        # Canny parameters, ROI and selected filter live on the GUI-free processor
+        self.processor = FrameProcessor(low_threshold=50, high_threshold=150, flip=True,
+                                        metrics=self.metrics, cache=self.result_cache)
+        # Filter stages already added to the chain; the combo box selection follows them
+        self.chain_stages = []
         
         # Video recording variables
         self.is_recording = False
+        self.record_full_resolution = True
         self.video_writer = None
+        self.stopped_writers = []
+        # framestore.FrameStoreWriter while recording raw camera frames
+        self.frame_store = None
+        # analytics.AnalyticsStage while edge measurements are being streamed
+        self.analytics = None
         
-        # Selected filter
-        self.current_filter = "None"
+        # Snapshots are encoded and written off the GUI thread, by a writer made on first use
+        self.snapshot_writer = None
+        self.snapshot_saved.connect(self.status_message)
         
         # Setup UI
         self.setup_ui()
+        self.update_source_actions()
         
-        # Start timer for video feed
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)  # ~30 FPS
+        # Downscales frames to the display size and wraps them without extra copies
+        self.display_converter = DisplayConverter()
         
         # Performance tracking
         self.frame_count = 0
+        self.latency_ms = 0.0
+        # AdaptiveScheduler while "Adaptive Scheduling" is on
+        self.scheduler = None
+
+        # Capture and processing run on their own threads; the GUI thread only displays.
+        # The capture thread idles until connect_camera() hands it a source.
+        self.pipeline = FramePipeline(self.camera, self.process_frame, metrics=self.metrics)
+        self.pipeline.frame_ready.connect(self.update_frame)
+        self.pipeline.start()
+        
         self.fps_timer = QTimer()
         self.fps_timer.timeout.connect(self.update_fps)
         self.fps_timer.start(1000)  # Update FPS every second
         self.current_fps = 0
+        
+        self.camera_opened.connect(self.on_camera_opened)
+        self.sweep_done.connect(self.on_sweep_done)
+        self.display_label.setText("Connecting to camera...")
+        self.connect_camera(self.capture_settings)
 
     def setup_ui(self):
         # Main widget and layout
@@ -82,6 +231,70 @@ class ImageProcessingApp(QMainWindow):
         title_label.setStyleSheet("color: #3498db; margin-bottom: 20px;")
         control_layout.addWidget(title_label)
         
+        # Camera Controls
+        camera_group = QGroupBox("Camera")
+        camera_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        camera_layout = QGridLayout()
+        
+        # A camera index, a video file or GStreamer pipeline, or the synthetic test pattern
+        camera_layout.addWidget(QLabel("Source:"), 0, 0)
+        self.device_combo = QComboBox()
+        self.device_combo.setEditable(True)
+        self.device_combo.addItems(["0", "1", SYNTHETIC])
+        self.device_combo.setCurrentText(str(self.capture_settings.device))
+        camera_layout.addWidget(self.device_combo, 0, 1)
+        
+        camera_layout.addWidget(QLabel("Backend:"), 1, 0)
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(list(BACKENDS))
+        camera_layout.addWidget(self.backend_combo, 1, 1)
+        
+        camera_layout.addWidget(QLabel("Resolution:"), 2, 0)
+        self.resolution_combo = QComboBox()
+        self.resolution_combo.addItems(["Default", "640x480", "1280x720", "1920x1080"])
+        camera_layout.addWidget(self.resolution_combo, 2, 1)
+        
+        camera_layout.addWidget(QLabel("Frame Rate:"), 3, 0)
+        self.camera_fps_spin = QSpinBox()
+        self.camera_fps_spin.setRange(0, 240)
+        self.camera_fps_spin.setSpecialValueText("Default")
+        camera_layout.addWidget(self.camera_fps_spin, 3, 1)
+        
+        camera_layout.addWidget(QLabel("Pixel Format:"), 4, 0)
+        self.pixel_format_combo = QComboBox()
+        self.pixel_format_combo.addItems(["Default"] + list(PIXEL_FORMATS))
+        camera_layout.addWidget(self.pixel_format_combo, 4, 1)
+        
+        # Fewer driver buffers means less queued (old) video in front of every frame
+        camera_layout.addWidget(QLabel("Driver Buffers:"), 5, 0)
+        self.buffer_spin = QSpinBox()
+        self.buffer_spin.setRange(0, 10)
+        self.buffer_spin.setSpecialValueText("Default")
+        self.buffer_spin.setValue(self.capture_settings.buffer_size)
+        camera_layout.addWidget(self.buffer_spin, 5, 1)
+        
+        self.latest_only_checkbox = QCheckBox("Latest Frame Only (Drop Stale Buffers)")
+        self.latest_only_checkbox.setChecked(self.capture_settings.latest_only)
+        camera_layout.addWidget(self.latest_only_checkbox, 6, 0, 1, 2)
+        
+        self.apply_camera_button = QPushButton("Apply Camera Settings")
+        self.apply_camera_button.clicked.connect(self.apply_camera_settings)
+        camera_layout.addWidget(self.apply_camera_button, 7, 0, 1, 2)
+        
+        self.probe_checkbox = QCheckBox("Measure Glass-to-Glass Latency")
+        self.probe_checkbox.toggled.connect(self.toggle_latency_probe)
+        camera_layout.addWidget(self.probe_checkbox, 8, 0)
+        self.probe_button = QPushButton("Show Probe")
+        self.probe_button.clicked.connect(self.show_latency_probe)
+        camera_layout.addWidget(self.probe_button, 8, 1)
+        
+        self.capture_info_label = QLabel("Capture: connecting...")
+        self.capture_info_label.setWordWrap(True)
+        camera_layout.addWidget(self.capture_info_label, 9, 0, 1, 2)
+        
+        camera_group.setLayout(camera_layout)
+        control_layout.addWidget(camera_group)
+        
         # Canny Edge Detection Controls
         canny_group = QGroupBox("Canny Edge Detection")
         canny_group.setStyleSheet("QGroupBox { font-weight: bold; }")
@@ -99,23 +312,38 @@ class ImageProcessingApp(QMainWindow):
         threshold_layout.addWidget(QLabel("Low Threshold:"), 0, 0)
         self.low_threshold_slider = QSlider(Qt.Horizontal)
         self.low_threshold_slider.setRange(0, 255)
-        self.low_threshold_slider.setValue(self.low_threshold)
+        self.low_threshold_slider.setValue(self.processor.low_threshold)
         self.low_threshold_slider.valueChanged.connect(self.update_low_threshold)
         threshold_layout.addWidget(self.low_threshold_slider, 0, 1)
-        self.low_threshold_value = QLabel(f"{self.low_threshold}")
+        self.low_threshold_value = QLabel(f"{self.processor.low_threshold}")
         threshold_layout.addWidget(self.low_threshold_value, 0, 2)
         
         # High threshold
         threshold_layout.addWidget(QLabel("High Threshold:"), 1, 0)
         self.high_threshold_slider = QSlider(Qt.Horizontal)
         self.high_threshold_slider.setRange(0, 255)
-        self.high_threshold_slider.setValue(self.high_threshold)
+        self.high_threshold_slider.setValue(self.processor.high_threshold)
         self.high_threshold_slider.valueChanged.connect(self.update_high_threshold)
         threshold_layout.addWidget(self.high_threshold_slider, 1, 1)
-        self.high_threshold_value = QLabel(f"{self.high_threshold}")
+        self.high_threshold_value = QLabel(f"{self.processor.high_threshold}")
         threshold_layout.addWidget(self.high_threshold_value, 1, 2)
         
         canny_layout.addLayout(threshold_layout)
+        
+        # Thresholds from the image itself, recomputed every frame
+        auto_layout = QHBoxLayout()
+        auto_layout.addWidget(QLabel("Auto Threshold:"))
+        self.auto_threshold_combo = QComboBox()
+        self.auto_threshold_combo.addItems(["Off", "Median", "Otsu"])
+        self.auto_threshold_combo.currentTextChanged.connect(self.change_auto_threshold)
+        auto_layout.addWidget(self.auto_threshold_combo)
+        canny_layout.addLayout(auto_layout)
+        
+        # Edge density over a whole grid of threshold pairs, on the most recent frames
+        self.sweep_button = QPushButton("Threshold Sweep")
+        self.sweep_button.clicked.connect(self.show_threshold_sweep)
+        canny_layout.addWidget(self.sweep_button)
+        
         canny_group.setLayout(canny_layout)
         control_layout.addWidget(canny_group)
         
@@ -128,6 +356,10 @@ class ImageProcessingApp(QMainWindow):
         self.roi_checkbox.toggled.connect(self.toggle_roi_selection)
         roi_layout.addWidget(self.roi_checkbox)
         
+        # Each additional ROI keeps the filter chain that was active when it was drawn
+        self.multi_roi_checkbox = QCheckBox("Keep Multiple ROIs")
+        roi_layout.addWidget(self.multi_roi_checkbox)
+        
         self.reset_roi_button = QPushButton("Reset ROI")
         self.reset_roi_button.clicked.connect(self.reset_roi)
         roi_layout.addWidget(self.reset_roi_button)
@@ -142,10 +374,24 @@ class ImageProcessingApp(QMainWindow):
         
         filters_layout.addWidget(QLabel("Select Filter:"))
         self.filter_combo = QComboBox()
-        self.filter_combo.addItems(["None", "Grayscale", "Sepia", "Blur", "Sharpen", "Invert"])
+        self.filter_combo.addItems(FILTER_NAMES)
         self.filter_combo.currentTextChanged.connect(self.change_filter)
         filters_layout.addWidget(self.filter_combo)
         
+        # Filter chain: stack several stages, e.g. Blur -> Sharpen -> Canny
+        chain_buttons = QHBoxLayout()
+        self.add_stage_button = QPushButton("Add to Chain")
+        self.add_stage_button.clicked.connect(self.add_filter_stage)
+        chain_buttons.addWidget(self.add_stage_button)
+        self.clear_chain_button = QPushButton("Clear Chain")
+        self.clear_chain_button.clicked.connect(self.clear_filter_chain)
+        chain_buttons.addWidget(self.clear_chain_button)
+        filters_layout.addLayout(chain_buttons)
+        
+        self.chain_label = QLabel("Chain: None")
+        self.chain_label.setWordWrap(True)
+        filters_layout.addWidget(self.chain_label)
+        
         filters_group.setLayout(filters_layout)
         control_layout.addWidget(filters_group)
         
@@ -158,13 +404,128 @@ class ImageProcessingApp(QMainWindow):
         self.snapshot_button.clicked.connect(self.take_snapshot)
         capture_layout.addWidget(self.snapshot_button)
         
+        # Burst and pre-trigger capture come from the pipeline's recent-frame history
+        burst_layout = QHBoxLayout()
+        burst_layout.addWidget(QLabel("Burst / Pre-trigger Frames:"))
+        self.burst_spin = QSpinBox()
+        self.burst_spin.setRange(1, 60)
+        self.burst_spin.setValue(30)
+        burst_layout.addWidget(self.burst_spin)
+        capture_layout.addLayout(burst_layout)
+        
+        self.burst_button = QPushButton("Save Burst")
+        self.burst_button.clicked.connect(self.save_burst)
+        capture_layout.addWidget(self.burst_button)
+        
+        self.pretrigger_checkbox = QCheckBox("Include Pre-trigger Frames in Recording")
+        capture_layout.addWidget(self.pretrigger_checkbox)
+        
         self.record_button = QPushButton("Start Recording")
         self.record_button.clicked.connect(self.toggle_recording)
         capture_layout.addWidget(self.record_button)
         
+        capture_layout.addWidget(QLabel("Recording Codec:"))
+        self.codec_combo = QComboBox()
+        self.codec_combo.addItems(list(CODECS) + [RAW_STORE_CODEC])
+        capture_layout.addWidget(self.codec_combo)
+        
+        # What to do when the encoder falls behind and its queue is full
+        capture_layout.addWidget(QLabel("When Encoder Lags:"))
+        self.overflow_combo = QComboBox()
+        self.overflow_combo.addItems([policy.capitalize() for policy in OVERFLOW_POLICIES])
+        capture_layout.addWidget(self.overflow_combo)
+        
+        # Per-ROI edge counts, contours, boxes and line segments as data instead of video
+        capture_layout.addWidget(QLabel("Edge Analytics Output:"))
+        self.analytics_combo = QComboBox()
+        self.analytics_combo.addItems(list(ANALYTICS_OUTPUTS))
+        capture_layout.addWidget(self.analytics_combo)
+        
+        self.analytics_button = QPushButton("Start Analytics")
+        self.analytics_button.clicked.connect(self.toggle_analytics)
+        capture_layout.addWidget(self.analytics_button)
+        
         capture_group.setLayout(capture_layout)
         control_layout.addWidget(capture_group)
         
+        # Recorded footage, e.g. for tuning thresholds on a clip
+        playback_group = QGroupBox("Recorded Footage")
+        playback_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        playback_layout = QVBoxLayout()
+        
+        playback_buttons = QHBoxLayout()
+        self.open_clip_button = QPushButton("Open Clip")
+        self.open_clip_button.clicked.connect(self.open_clip)
+        playback_buttons.addWidget(self.open_clip_button)
+        self.open_store_button = QPushButton("Open Frame Store")
+        self.open_store_button.clicked.connect(self.open_frame_store)
+        playback_buttons.addWidget(self.open_store_button)
+        self.play_pause_button = QPushButton("Pause")
+        self.play_pause_button.setEnabled(False)
+        self.play_pause_button.clicked.connect(self.toggle_playback)
+        playback_buttons.addWidget(self.play_pause_button)
+        self.camera_button = QPushButton("Back to Camera")
+        self.camera_button.setEnabled(False)
+        self.camera_button.clicked.connect(self.back_to_camera)
+        playback_buttons.addWidget(self.camera_button)
+        playback_layout.addLayout(playback_buttons)
+        
+        self.position_slider = QSlider(Qt.Horizontal)
+        self.position_slider.setEnabled(False)
+        self.position_slider.valueChanged.connect(self.seek_clip)
+        playback_layout.addWidget(self.position_slider)
+        
+        self.cache_label = QLabel("Cache: empty")
+        playback_layout.addWidget(self.cache_label)
+        
+        playback_group.setLayout(playback_layout)
+        control_layout.addWidget(playback_group)
+        
+        # Performance Controls
+        performance_group = QGroupBox("Performance")
+        performance_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        performance_layout = QVBoxLayout()
+        
+        performance_layout.addWidget(QLabel("Processing Scale:"))
+        self.scale_combo = QComboBox()
+        self.scale_combo.addItems(["100%", "75%", "50%", "25%", "Auto"])
+        self.scale_combo.currentTextChanged.connect(self.change_processing_scale)
+        performance_layout.addWidget(self.scale_combo)
+        
+        # Snapshots are always full resolution; recording is by default too
+        self.full_res_record_checkbox = QCheckBox("Record at Full Resolution")
+        self.full_res_record_checkbox.setChecked(self.record_full_resolution)
+        self.full_res_record_checkbox.toggled.connect(self.toggle_full_resolution_recording)
+        performance_layout.addWidget(self.full_res_record_checkbox)
+        
+        # With a static camera only the tiles that changed need Canny/filters again
+        self.incremental_checkbox = QCheckBox("Skip Unchanged Regions (Static Camera)")
+        self.incremental_checkbox.toggled.connect(self.toggle_incremental)
+        performance_layout.addWidget(self.incremental_checkbox)
+        
+        # Under load: skip display updates, then lower the scale, then drop late frames
+        self.scheduler_checkbox = QCheckBox("Adaptive Scheduling (Degrade Under Load)")
+        self.scheduler_checkbox.toggled.connect(self.toggle_scheduler)
+        performance_layout.addWidget(self.scheduler_checkbox)
+        
+        targets_layout = QHBoxLayout()
+        targets_layout.addWidget(QLabel("Latency Target (ms):"))
+        self.latency_target_spin = QSpinBox()
+        self.latency_target_spin.setRange(20, 2000)
+        self.latency_target_spin.setValue(100)
+        self.latency_target_spin.valueChanged.connect(self.change_scheduler_targets)
+        targets_layout.addWidget(self.latency_target_spin)
+        targets_layout.addWidget(QLabel("FPS Target:"))
+        self.fps_target_spin = QSpinBox()
+        self.fps_target_spin.setRange(0, 240)
+        self.fps_target_spin.setSpecialValueText("Camera")
+        self.fps_target_spin.valueChanged.connect(self.change_scheduler_targets)
+        targets_layout.addWidget(self.fps_target_spin)
+        performance_layout.addLayout(targets_layout)
+        
+        performance_group.setLayout(performance_layout)
+        control_layout.addWidget(performance_group)
+        
         # Information Group
         info_group = QGroupBox("App Statistics")
         info_group.setStyleSheet("QGroupBox { font-weight: bold; }")
@@ -173,9 +534,48 @@ class ImageProcessingApp(QMainWindow):
         self.fps_label = QLabel("FPS: 0")
         info_layout.addWidget(self.fps_label)
         
-        self.resolution_label = QLabel(f"Camera Resolution: {self.frame_width}x{self.frame_height}")
+        self.resolution_label = QLabel("Camera Resolution: -")
         info_layout.addWidget(self.resolution_label)
         
+        self.latency_label = QLabel("Latency: 0.0 ms")
+        info_layout.addWidget(self.latency_label)
+        
+        self.dropped_label = QLabel("Dropped Frames: 0")
+        info_layout.addWidget(self.dropped_label)
+        
+        self.scale_label = QLabel("Processing Scale: 100%")
+        info_layout.addWidget(self.scale_label)
+        
+        self.changed_tiles_label = QLabel("Changed Tiles: -")
+        info_layout.addWidget(self.changed_tiles_label)
+        
+        self.scheduler_label = QLabel("Scheduler: off")
+        info_layout.addWidget(self.scheduler_label)
+        
+        self.recorder_label = QLabel("Recorder: idle")
+        info_layout.addWidget(self.recorder_label)
+        
+        self.analytics_label = QLabel("Analytics: off")
+        info_layout.addWidget(self.analytics_label)
+        
+        # Rolling p50/p95/p99 per pipeline stage
+        self.timings_label = QLabel("Stage timings (ms): waiting for frames")
+        self.timings_label.setFont(QFont("Courier New", 8))
+        info_layout.addWidget(self.timings_label)
+        
+        export_layout = QHBoxLayout()
+        self.export_csv_button = QPushButton("Export CSV")
+        self.export_csv_button.clicked.connect(lambda: self.export_metrics("csv"))
+        export_layout.addWidget(self.export_csv_button)
+        self.export_json_button = QPushButton("Export JSON")
+        self.export_json_button.clicked.connect(lambda: self.export_metrics("json"))
+        export_layout.addWidget(self.export_json_button)
+        info_layout.addLayout(export_layout)
+        
+        self.metrics_server_checkbox = QCheckBox("Serve Metrics on localhost:9108")
+        self.metrics_server_checkbox.toggled.connect(self.toggle_metrics_server)
+        info_layout.addWidget(self.metrics_server_checkbox)
+        
         info_group.setLayout(info_layout)
         control_layout.addWidget(info_group)
         
@@ -188,143 +588,248 @@ class ImageProcessingApp(QMainWindow):
         self.setStatusBar(self.status_bar)
         self.status_bar.showMessage("Ready")
     
+    def process_frame(self, packet):
+        # Runs on the processing thread
+        # While recording at full resolution the preview is simply the full-size result
+        full_resolution = self.video_writer is not None and self.record_full_resolution
+        frame = self.processor.process(packet.raw, draw_roi=False, full_resolution=full_resolution,
+                                       frame_id=packet.frame_id)
+        packet.frame = frame
+        packet.scale = frame.shape[1] / packet.raw.shape[1]
+        
+        # Edge measurements on the Canny output, restricted to the ROIs
+        analytics = self.analytics
+        if analytics is not None:
+            analytics.process(frame, packet.index, packet.t_capture, packet.scale, packet.wall_time)
+        
+        # Record video if active; encoding happens on the writer's own thread
+        writer = self.video_writer
+        if writer is not None:
+            with self.metrics.time("record_enqueue"):
+                writer.write(self.recording_frame(frame, packet.scale))
+        
+        # ROI outlines are drawn on the display pixmap, so history frames stay clean
+        return frame
+    
+    def recording_frame(self, frame, scale):
+        # Recordings show the ROI outlines like the preview does; they go on a copy so the
+        # history frames used for snapshots stay clean
+        if not self.processor.rois:
+            return frame
+        return self.processor.draw_rois(frame.copy(), scale)
+
+    @pyqtSlot()
     def update_frame(self):
-        ret, frame = self.camera.read()
-        if not ret:
+        packet = self.pipeline.take_latest()
+        if packet is None:
             return
-        
+
         self.frame_count += 1
+        self.metrics.incr("frames_displayed")
+        start = time.perf_counter()
+        frame = packet.frame
+        if "first_frame" not in self.startup:
+            QTimer.singleShot(0, lambda: self.mark_startup("first_frame"))
+
+        # Convert to QImage and display
+        area = self.display_label.contentsRect()
+        q_img = self.display_converter.to_qimage(frame, area.width(), area.height())
+        pixmap = QPixmap.fromImage(q_img)
+        self.draw_overlays(pixmap)
+        self.display_label.setPixmap(pixmap)
         
-        # Flip horizontally for selfie view
-        frame = cv2.flip(frame, 1)
+        if self.processor.auto_threshold is not None:
+            self.show_thresholds()
         
-        # Store original frame
-        original_frame = frame.copy()
+        if packet.frame_id is not None and self.clip is not None:
+            # Follow playback without triggering a seek
+            self.position_slider.blockSignals(True)
+            self.position_slider.setValue(packet.frame_id[1])
+            self.position_slider.blockSignals(False)
+
+        # End-to-end latency: capture timestamp to pixmap on screen
+        packet.t_displayed = self.metrics.since("display", start)
+        self.latency_ms = packet.latency_ms()
+        self.metrics.record("latency", self.latency_ms / 1000.0)
         
-        # Process ROI if selected
-        if self.roi_selected and self.roi is not None:
-            # Extract ROI coordinates
-            x1, y1, x2, y2 = self.roi
-            # Ensure coordinates are within frame bounds
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(frame.shape[1], x2), min(frame.shape[0], y2)
-            
-            # Create a mask for ROI
-            mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-            mask[y1:y2, x1:x2] = 255
-            
-            # Process only ROI area
-            if self.canny_active:
-                # Apply Canny to ROI
-                gray_roi = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
-                blurred_roi = cv2.GaussianBlur(gray_roi, (5, 5), 0)
-                canny_roi = cv2.Canny(blurred_roi, self.low_threshold, self.high_threshold)
-                
-                # Convert back to BGR for merging
-                canny_colored = cv2.cvtColor(canny_roi, cv2.COLOR_GRAY2BGR)
-                
-                # Create masked regions
-                roi_area = cv2.bitwise_and(frame, frame, mask=mask)
-                
-                # Create inverse mask
-                mask_inv = cv2.bitwise_not(mask)
-                background = cv2.bitwise_and(frame, frame, mask=mask_inv)
-                
-                # Place canny ROI into position
-                frame[y1:y2, x1:x2] = canny_colored
-                
-                # Combine with background
-                frame = cv2.add(background, frame)
-            
-            # Apply selected filter to ROI if not Canny
-            if not self.canny_active and self.current_filter != "None":
-                filtered_roi = self.apply_filter(frame[y1:y2, x1:x2], self.current_filter)
-                
-                # Create masked regions
-                roi_area = cv2.bitwise_and(frame, frame, mask=mask)
-                
-                # Create inverse mask
-                mask_inv = cv2.bitwise_not(mask)
-                background = cv2.bitwise_and(frame, frame, mask=mask_inv)
-                
-                # Place filtered ROI into position
-                frame[y1:y2, x1:x2] = filtered_roi
-                
-                # Combine with background
-                frame = cv2.add(background, frame)
-            
-            # Draw rectangle around ROI
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-        else:
-            # Process full frame
-            if self.canny_active:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-                edges = cv2.Canny(blurred, self.low_threshold, self.high_threshold)
-                frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-            elif self.current_filter != "None":
-                frame = self.apply_filter(frame, self.current_filter)
+        # Probe code in the raw frame: time it was drawn to the time it reached the display
+        probe = self.latency_probe
+        if probe is not None and packet.raw is not None:
+            glass_to_glass = probe.read(packet.raw, packet.t_displayed)
+            if glass_to_glass is not None:
+                self.glass_to_glass_ms = glass_to_glass * 1000.0
+                self.metrics.record("glass_to_glass", glass_to_glass)
         
-        # Draw ROI selection in progress
-        if self.drawing:
-            cv2.rectangle(frame, self.roi_start, self.roi_end, (255, 0, 0), 2)
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.displayed(packet, packet.t_displayed - start)
+    
+    def draw_overlays(self, pixmap):
+        rois = self.processor.rois
+        if (not rois and not self.drawing) or not self.frame_width or not self.frame_height:
+            return
+        # ROIs are in full-resolution coordinates; the pixmap is the displayed size
+        sx = pixmap.width() / self.frame_width
+        sy = pixmap.height() / self.frame_height
         
-        # Record video if active
-        if self.is_recording and self.video_writer is not None:
-            self.video_writer.write(frame)
+        def to_rect(start, end):
+            return QRect(QPoint(int(start[0] * sx), int(start[1] * sy)),
+                         QPoint(int(end[0] * sx), int(end[1] * sy))).normalized()
         
-        # Convert to QImage and display
-        height, width, channel = frame.shape
-        bytes_per_line = 3 * width
-        q_img = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-        self.display_label.setPixmap(QPixmap.fromImage(q_img).scaled(
-            self.display_label.width(), self.display_label.height(), 
-            Qt.KeepAspectRatio, Qt.SmoothTransformation))
-    
-    def apply_filter(self, image, filter_name):
-        if filter_name == "Grayscale":
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-        elif filter_name == "Sepia":
-            kernel = np.array([[0.272, 0.534, 0.131],
-                              [0.349, 0.686, 0.168],
-                              [0.393, 0.769, 0.189]])
-            sepia = cv2.transform(image, kernel)
-            sepia = np.clip(sepia, 0, 255).astype(np.uint8)
-            return sepia
-        elif filter_name == "Blur":
-            return cv2.GaussianBlur(image, (15, 15), 0)
-        elif filter_name == "Sharpen":
-            kernel = np.array([[-1, -1, -1],
-                               [-1,  9, -1],
-                               [-1, -1, -1]])
-            return cv2.filter2D(image, -1, kernel)
-        elif filter_name == "Invert":
-            return cv2.bitwise_not(image)
-        else:
-            return image
+        painter = QPainter(pixmap)
+        painter.setPen(QPen(QColor(0, 255, 0), 2))
+        for region in rois:
+            x1, y1, x2, y2 = region.rect
+            painter.drawRect(to_rect((x1, y1), (x2, y2)))
+        
+        # Draw ROI selection in progress
+        if self.drawing:
+            painter.setPen(QPen(QColor(0, 0, 255), 2))
+            painter.drawRect(to_rect(self.roi_start, self.roi_end))
+        painter.end()
     
     def update_fps(self):
         self.current_fps = self.frame_count
         self.frame_count = 0
         self.fps_label.setText(f"FPS: {self.current_fps}")
+        latency = f"Latency: {self.latency_ms:.1f} ms"
+        if self.glass_to_glass_ms is not None:
+            latency += f" (glass-to-glass {self.glass_to_glass_ms:.0f} ms)"
+        self.latency_label.setText(latency)
+        if self.camera is not None and self.apply_camera_button.isEnabled():
+            self.capture_info_label.setText(f"Capture: {self.camera.describe()}, "
+                                            f"{self.camera.stale_dropped} stale frames dropped")
+        self.dropped_label.setText(f"Dropped Frames: {self.pipeline.dropped_frames()}")
+        self.scale_label.setText(f"Processing Scale: {self.processor.last_scale:.0%}")
+        incremental = self.processor.incremental
+        if incremental is not None:
+            self.changed_tiles_label.setText(f"Changed Tiles: {incremental.dirty_fraction:.0%}")
+        else:
+            self.changed_tiles_label.setText("Changed Tiles: -")
+        self.update_recorder_stats()
+        self.update_scheduler_stats()
+        if self.analytics is not None:
+            text = f"Analytics: {self.analytics.records} frames measured"
+            skipped = self.analytics.regions_skipped
+            if skipped:
+                text += f", {skipped} ROI{'s' if skipped != 1 else ''} skipped (no Canny)"
+            self.analytics_label.setText(text)
+            self.metrics.set_counter("analytics_records", self.analytics.records)
+        self.update_metrics()
+        cache = self.result_cache.stats()
+        self.cache_label.setText(f"Cache: {cache['size_mb']:.0f}/{cache['budget_mb']:.0f} MB, "
+                                 f"{cache['hit_rate']:.0%} hits")
+    
+    def update_metrics(self):
+        self.pipeline.update_metrics()
+        self.metrics.set_gauge("display_fps", self.current_fps)
+        self.metrics.set_gauge("processing_scale", self.processor.last_scale)
+        if self.camera is not None:
+            self.metrics.set_counter("stale_frames_dropped", self.camera.stale_dropped)
+        if self.processor.incremental is not None:
+            self.metrics.set_gauge("changed_tiles_fraction", self.processor.incremental.dirty_fraction)
+        writer = self.video_writer
+        if writer is not None:
+            stats = writer.stats()
+            self.metrics.set_gauge("recorder_queue_depth", stats["queue_depth"])
+            self.metrics.set_gauge("recorder_spilled_pending", stats["spilled_pending"])
+            self.metrics.set_gauge("recorder_write_fps", stats["write_fps"])
+            self.metrics.set_counter("recorder_frames_dropped", stats["frames_dropped"])
+        cache = self.result_cache.stats()
+        self.metrics.set_gauge("cache_size_mb", cache["size_mb"])
+        self.metrics.set_counter("cache_hits", cache["hits"])
+        self.metrics.set_counter("cache_misses", cache["misses"])
+        self.metrics.set_counter("cache_evictions", cache["evictions"])
+        
+        stages = self.metrics.snapshot()["stages"]
+        if stages:
+            lines = [f"{'stage':<16}{'p50':>7}{'p95':>7}{'p99':>7}"]
+            for name, summary in sorted(stages.items()):
+                lines.append(f"{name:<16}{summary['p50_ms']:>7.1f}{summary['p95_ms']:>7.1f}"
+                             f"{summary['p99_ms']:>7.1f}")
+            self.timings_label.setText("\n".join(lines))
+    
+    def export_metrics(self, kind):
+        from PyQt5.QtWidgets import QFileDialog
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "",
+                                                  "CSV (*.csv)" if kind == "csv" else "JSON (*.json)")
+        if not filename:
+            return
+        self.update_metrics()
+        if kind == "csv":
+            self.metrics.write_csv(filename)
+        else:
+            self.metrics.write_json(filename)
+        self.status_bar.showMessage(f"Metrics exported to {filename}")
+    
+    @pyqtSlot(bool)
+    def toggle_metrics_server(self, checked):
+        if checked and self.metrics_server is None:
+            try:
+                self.metrics_server = MetricsServer(self.metrics)
+            except OSError as exc:
+                self.status_bar.showMessage(f"Could not start metrics server: {exc}")
+                self.metrics_server_checkbox.setChecked(False)
+                return
+            host, port = self.metrics_server.address
+            self.status_bar.showMessage(f"Metrics at http://{host}:{port}/metrics")
+        elif not checked and self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+    
+    def update_scheduler_stats(self):
+        scheduler = self.scheduler
+        if scheduler is None:
+            self.scheduler_label.setText("Scheduler: off")
+            return
+        stats = scheduler.stats()
+        self.scheduler_label.setText(
+            f"Scheduler: {stats['mode']} (budget {stats['frame_budget_ms']:.0f} ms), "
+            f"{stats['display_skipped']} displays skipped, {stats['dropped_late']} late drops")
+        self.metrics.set_gauge("scheduler_level", stats["level"])
+        self.metrics.set_counter("scheduler_display_skipped", stats["display_skipped"])
+        self.metrics.set_counter("scheduler_dropped_late", stats["dropped_late"])
+    
+    def update_recorder_stats(self):
+        store = self.frame_store
+        if store is not None:
+            self.recorder_label.setText(f"Recorder: {store.count} raw frames stored, "
+                                        f"{store.rejected} rejected")
+            return
+        writer = self.video_writer
+        if writer is None:
+            self.recorder_label.setText("Recorder: idle")
+            return
+        if writer.error is not None:
+            self.status_bar.showMessage(f"Recording error: {writer.error}")
+        stats = writer.stats()
+        self.recorder_label.setText(
+            f"Recorder: queue {stats['queue_depth']} (+{stats['spilled_pending']} on disk), "
+            f"{stats['write_fps']:.1f} fps written, {stats['encode_fps']:.0f} fps encoder, "
+            f"{stats['frames_dropped']} dropped")
+    
+    def widget_to_frame(self, event):
+        # Map a click on the (letterboxed, possibly reduced-scale) display to full-resolution
+        # camera coordinates, which is what the processor expects for ROIs at any scale
+        area = self.display_label.contentsRect()
+        x, y, width, height = self.display_converter.display_rect(area.width(), area.height())
+        fx = min(max((event.x() - area.x() - x) / width, 0.0), 1.0)
+        fy = min(max((event.y() - area.y() - y) / height, 0.0), 1.0)
+        return int(fx * self.frame_width), int(fy * self.frame_height)
     
     def mouse_press_event(self, event):
         if self.roi_checkbox.isChecked():
             self.drawing = True
-            self.roi_start = (int(event.x() * self.frame_width / self.display_label.width()),
-                             int(event.y() * self.frame_height / self.display_label.height()))
+            self.roi_start = self.widget_to_frame(event)
             self.roi_end = self.roi_start
     
     def mouse_move_event(self, event):
         if self.drawing:
-            self.roi_end = (int(event.x() * self.frame_width / self.display_label.width()),
-                           int(event.y() * self.frame_height / self.display_label.height()))
+            self.roi_end = self.widget_to_frame(event)
     
     def mouse_release_event(self, event):
         if self.drawing:
             self.drawing = False
-            self.roi_selected = True
             
             # Ensure start point is upper left, end point is lower right
             x1, y1 = self.roi_start
@@ -336,100 +841,534 @@ class ImageProcessingApp(QMainWindow):
             if y1 > y2:
                 y1, y2 = y2, y1
                 
-            self.roi = (x1, y1, x2, y2)
-            self.status_bar.showMessage(f"ROI Selected: ({x1},{y1}) to ({x2},{y2})")
+            if self.multi_roi_checkbox.isChecked():
+                # Every kept region, the first one included, freezes the chain active now
+                region = RoiRegion((x1, y1, x2, y2), filters=self.processor.stage_names())
+                self.processor.rois = self.processor.rois + [region]
+            else:
+                self.processor.roi = (x1, y1, x2, y2)
+            self.status_bar.showMessage(f"ROI Selected: ({x1},{y1}) to ({x2},{y2}) "
+                                        f"[{len(self.processor.rois)} active]")
     
     @pyqtSlot(bool)
     def toggle_canny(self, checked):
-        self.canny_active = checked
+        self.processor.canny_active = checked
+        self.update_chain_label()
     
     @pyqtSlot(bool)
     def toggle_roi_selection(self, checked):
         if not checked:
-            self.roi_selected = False
-            self.roi = None
+            self.processor.roi = None
     
     @pyqtSlot()
     def reset_roi(self):
-        self.roi_selected = False
-        self.roi = None
+        self.processor.roi = None
         self.status_bar.showMessage("ROI Reset")
     
     @pyqtSlot(int)
     def update_low_threshold(self, value):
-        self.low_threshold = value
+        self.processor.low_threshold = value
         self.low_threshold_value.setText(str(value))
     
     @pyqtSlot(int)
     def update_high_threshold(self, value):
-        self.high_threshold = value
+        self.processor.high_threshold = value
         self.high_threshold_value.setText(str(value))
     
+    def show_thresholds(self):
+        # Let the sliders follow the automatic thresholds without feeding them back
+        for slider, label, value in ((self.low_threshold_slider, self.low_threshold_value,
+                                      self.processor.low_threshold),
+                                     (self.high_threshold_slider, self.high_threshold_value,
+                                      self.processor.high_threshold)):
+            slider.blockSignals(True)
+            slider.setValue(value)
+            slider.blockSignals(False)
+            label.setText(str(value))
+    
+    @pyqtSlot(str)
+    def change_auto_threshold(self, text):
+        auto = text != "Off"
+        if auto:
+            from tuning import AutoThreshold
+            self.processor.auto_threshold = AutoThreshold(text.lower())
+        else:
+            self.processor.auto_threshold = None
+        # Sliders keep the last automatic values when switching back to manual
+        self.low_threshold_slider.setEnabled(not auto)
+        self.high_threshold_slider.setEnabled(not auto)
+    
+    @pyqtSlot()
+    def show_threshold_sweep(self):
+        packets = self.pipeline.history.last(self.burst_spin.value())
+        frames = [packet.raw for packet in packets if packet.raw is not None]
+        if not frames:
+            self.status_bar.showMessage("No frames available yet")
+            return
+        from tuning import pre_canny_stages, sweep_async
+        # The sweep takes a second or more, so it runs off the GUI thread on the frames as
+        # the filters in front of Canny leave them
+        stages = pre_canny_stages(self.processor.stage_names())
+        self.sweep_button.setEnabled(False)
+        self.status_bar.showMessage(f"Sweeping thresholds on {len(frames)} frame(s)...")
+        count = len(frames)
+        sweep_async(frames, lambda result, seconds: self.sweep_done.emit(result, count, seconds),
+                    stages=stages)
+    
+    @pyqtSlot(object, int, float)
+    def on_sweep_done(self, result, count, seconds):
+        self.sweep_button.setEnabled(True)
+        if self.closing:
+            return
+        dialog = ThresholdSweepDialog(result, self)
+        dialog.threshold_chosen.connect(self.apply_thresholds)
+        dialog.show()
+        self.status_bar.showMessage(f"Swept {result.density.size} threshold pairs on {count} "
+                                    f"frame(s) in {seconds * 1000.0:.0f} ms")
+    
+    @pyqtSlot(int, int)
+    def apply_thresholds(self, low, high):
+        self.auto_threshold_combo.setCurrentText("Off")
+        self.low_threshold_slider.setValue(low)
+        self.high_threshold_slider.setValue(high)
+    
     @pyqtSlot(str)
     def change_filter(self, filter_name):
-        self.current_filter = filter_name
+        # Assign a new list so the processing thread never sees a half-updated chain
+        pending = [] if filter_name == "None" else [filter_name]
+        self.processor.filters = self.chain_stages + pending
+        self.update_chain_label()
+    
+    @pyqtSlot(str)
+    def change_processing_scale(self, text):
+        if text == "Auto":
+            # Pick a pyramid level that keeps processing within the camera's frame interval
+            self.processor.scale_controller = ScaleController(target_fps=self.fps or 30.0)
+        else:
+            self.processor.scale_controller = None
+            self.processor.processing_scale = int(text.rstrip("%")) / 100.0
+    
+    @pyqtSlot(bool)
+    def toggle_scheduler(self, checked):
+        previous = self.scheduler
+        if checked:
+            from scheduler import AdaptiveScheduler
+            target_latency = self.latency_target_spin.value() / 1000.0
+            self.scheduler = AdaptiveScheduler(self.processor, target_latency=target_latency,
+                                               target_fps=self.fps_target_spin.value())
+        else:
+            self.scheduler = None
+        self.pipeline.set_scheduler(self.scheduler)
+        if previous is not None:
+            # Removes the scale controller it may have installed
+            previous.stop()
+    
+    @pyqtSlot(int)
+    def change_scheduler_targets(self, _value):
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.target_latency = self.latency_target_spin.value() / 1000.0
+            scheduler.target_fps = self.fps_target_spin.value()
+    
+    @pyqtSlot(bool)
+    def toggle_full_resolution_recording(self, checked):
+        self.record_full_resolution = checked
+    
+    @pyqtSlot()
+    def apply_camera_settings(self):
+        resolution = self.resolution_combo.currentText()
+        width, height = (0, 0) if resolution == "Default" else map(int, resolution.split("x"))
+        pixel_format = self.pixel_format_combo.currentText()
+        settings = CaptureSettings(device=self.device_combo.currentText().strip(),
+                                   backend=self.backend_combo.currentText(),
+                                   buffer_size=self.buffer_spin.value(),
+                                   width=width, height=height, fps=self.camera_fps_spin.value(),
+                                   pixel_format="" if pixel_format == "Default" else pixel_format,
+                                   latest_only=self.latest_only_checkbox.isChecked())
+        self.connect_camera(settings)
+    
+    def connect_camera(self, settings):
+        # Opening a camera can take seconds (device probing, format negotiation), so it runs
+        # on a background thread; the current source keeps running until the new one is up
+        self.connect_generation += 1
+        generation = self.connect_generation
+        self.apply_camera_button.setEnabled(False)
+        self.capture_info_label.setText(f"Capture: connecting to {settings.device}...")
+        self.status_bar.showMessage(f"Connecting to {settings.device}...")
+        open_source_async(settings, lambda camera, seconds:
+                          self.camera_opened.emit(camera, generation, seconds, settings))
+    
+    @pyqtSlot(object, int, float, object)
+    def on_camera_opened(self, camera, generation, seconds, settings):
+        if self.closing or generation != self.connect_generation:
+            # Superseded by a later connect, or the window is gone
+            camera.release()
+            return
+        self.apply_camera_button.setEnabled(True)
+        self.metrics.set_gauge("camera_open_ms", seconds * 1000.0)
+        if not camera.isOpened():
+            camera.release()
+            self.capture_info_label.setText(f"Capture: could not open {settings.device}")
+            self.status_bar.showMessage(f"Could not open {settings.device}")
+            if self.camera is None and self.clip is None:
+                self.display_label.setText("No camera. Pick another source in the Camera group "
+                                           "or open recorded footage.")
+            return
+        self.mark_startup("camera_open")
+        previous, self.camera = self.camera, camera
+        self.capture_settings = settings
+        self.camera_format = (int(camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                              int(camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                              camera.get(cv2.CAP_PROP_FPS))
+        # A clip keeps playing; the new camera takes over on "Back to Camera"
+        if self.clip is None:
+            self.pipeline.set_source(camera)
+            self.set_source_format(*self.camera_format)
+        if previous is not None:
+            # release() waits for a read in progress, so this is safe right away
+            previous.release()
+        self.update_source_actions()
+        self.capture_info_label.setText(f"Capture: {camera.describe()}")
+        self.status_bar.showMessage(f"Camera: {camera.describe()} (opened in {seconds * 1000:.0f} ms)")
+    
+    def mark_startup(self, milestone):
+        # Records the first time each startup milestone is reached
+        if milestone in self.startup:
+            return
+        elapsed = (time.perf_counter() - STARTUP_START) * 1000.0
+        self.startup[milestone] = elapsed
+        self.metrics.set_gauge(f"startup_{milestone}_ms", elapsed)
+        if milestone != "first_frame":
+            return
+        self.status_bar.showMessage(
+            "Startup: " + ", ".join(f"{name.replace('_', ' ')} {ms:.0f} ms"
+                                    for name, ms in self.startup.items()))
+        # benchmarks/startup.py sets this to collect the timings, then the app exits
+        report = os.environ.get("VISIONDESK_STARTUP_REPORT")
+        if report:
+            with open(report, "w") as f:
+                json.dump(self.startup, f)
+            self.close()
+    
+    @pyqtSlot(bool)
+    def toggle_latency_probe(self, checked):
+        self.latency_probe = LatencyProbe() if checked else None
+        self.glass_to_glass_ms = None
+    
+    @pyqtSlot()
+    def show_latency_probe(self):
+        # For real cameras: point the camera at this window, filling the frame's width
+        if self.probe_window is None:
+            self.probe_window = LatencyProbeWindow(LatencyProbe(), self)
+        self.probe_checkbox.setChecked(True)
+        self.probe_window.show()
+        self.probe_window.raise_()
+    
+    @pyqtSlot(bool)
+    def toggle_incremental(self, checked):
+        if checked:
+            from incremental import IncrementalRenderer
+            self.processor.incremental = IncrementalRenderer()
+        else:
+            self.processor.incremental = None
+    
+    @pyqtSlot()
+    def add_filter_stage(self):
+        filter_name = self.filter_combo.currentText()
+        if filter_name != "None":
+            self.chain_stages = self.chain_stages + [filter_name]
+            # Resetting the combo re-runs change_filter with the committed stages
+            self.filter_combo.setCurrentText("None")
+    
+    @pyqtSlot()
+    def clear_filter_chain(self):
+        self.chain_stages = []
+        self.filter_combo.setCurrentText("None")
+        self.change_filter("None")
+    
+    def update_chain_label(self):
+        stages = self.processor.stage_names()
+        self.chain_label.setText("Chain: " + (" → ".join(stages) if stages else "None"))
+    
+    @pyqtSlot()
+    def open_clip(self):
+        from PyQt5.QtWidgets import QFileDialog
+        filename, _ = QFileDialog.getOpenFileName(self, "Open Clip", "",
+                                                  "Videos (*.avi *.mp4 *.mkv *.mov);;All Files (*)")
+        if filename:
+            self.play_recording(filename)
+    
+    @pyqtSlot()
+    def open_frame_store(self):
+        from PyQt5.QtWidgets import QFileDialog
+        path = QFileDialog.getExistingDirectory(self, "Open Frame Store")
+        if path:
+            self.play_recording(path)
+    
+    def play_recording(self, path):
+        from playback import open_playback
+        try:
+            clip = open_playback(path, cache=self.result_cache)
+        except (IOError, ValueError, KeyError) as exc:
+            self.status_bar.showMessage(f"Could not open {path}: {exc}")
+            return
+        previous, self.clip = self.clip, clip
+        self.pipeline.set_source(clip)
+        if previous is not None:
+            # release() waits for a read in progress, so this is safe right away
+            previous.release()
+        self.set_source_format(int(clip.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                               int(clip.get(cv2.CAP_PROP_FRAME_HEIGHT)), clip.fps)
+        self.position_slider.blockSignals(True)
+        self.position_slider.setRange(0, max(0, clip.frame_count - 1))
+        self.position_slider.setValue(0)
+        self.position_slider.blockSignals(False)
+        self.position_slider.setEnabled(True)
+        self.play_pause_button.setEnabled(True)
+        self.play_pause_button.setText("Pause")
+        self.update_source_actions()
+        self.status_bar.showMessage(f"Playing {clip.name}")
+    
+    @pyqtSlot()
+    def back_to_camera(self):
+        if self.camera is None:
+            # Still connecting, or the camera failed to open
+            return
+        clip, self.clip = self.clip, None
+        self.pipeline.set_source(self.camera)
+        if clip is not None:
+            clip.release()
+        self.set_source_format(*self.camera_format)
+        self.position_slider.setEnabled(False)
+        self.play_pause_button.setEnabled(False)
+        self.update_source_actions()
+        self.status_bar.showMessage("Live camera")
+    
+    def set_source_format(self, width, height, fps):
+        self.frame_width, self.frame_height, self.fps = width, height, fps
+        self.resolution_label.setText(f"Camera Resolution: {width}x{height}")
+    
+    def update_source_actions(self):
+        # Until a camera or clip is open there are no frames and no frame size, so nothing to
+        # record or snapshot; a recording in progress can always be stopped
+        has_source = self.camera is not None or self.clip is not None
+        for button in (self.snapshot_button, self.burst_button, self.record_button):
+            button.setEnabled(has_source or self.is_recording)
+        self.camera_button.setEnabled(self.clip is not None and self.camera is not None)
+    
+    @pyqtSlot()
+    def toggle_playback(self):
+        if self.clip is None:
+            return
+        # While paused the clip keeps repeating its frame, so slider changes still show
+        self.clip.paused = not self.clip.paused
+        self.play_pause_button.setText("Play" if self.clip.paused else "Pause")
+    
+    @pyqtSlot(int)
+    def seek_clip(self, index):
+        if self.clip is not None:
+            self.clip.seek(index)
     
     @pyqtSlot()
     def take_snapshot(self):
+        # Grab the frame at the moment of the click, before the dialog opens
+        packet = self.pipeline.history.latest()
+        if packet is None:
+            self.status_bar.showMessage("No frame available yet")
+            return
+        frame = self.full_resolution_frame(packet)
+        
+        from PyQt5.QtWidgets import QFileDialog
         filename, _ = QFileDialog.getSaveFileName(self, "Save Snapshot", "", "Images (*.png *.jpg *.jpeg)")
         if filename:
-            ret, frame = self.camera.read()
-            if ret:
-                frame = cv2.flip(frame, 1)  # Flip for selfie view
-                
-                # Apply processing if needed
-                if self.roi_selected and self.roi is not None:
-                    x1, y1, x2, y2 = self.roi
-                    if self.canny_active:
-                        gray_roi = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
-                        blurred_roi = cv2.GaussianBlur(gray_roi, (5, 5), 0)
-                        canny_roi = cv2.Canny(blurred_roi, self.low_threshold, self.high_threshold)
-                        canny_colored = cv2.cvtColor(canny_roi, cv2.COLOR_GRAY2BGR)
-                        frame[y1:y2, x1:x2] = canny_colored
-                    elif self.current_filter != "None":
-                        filtered_roi = self.apply_filter(frame[y1:y2, x1:x2], self.current_filter)
-                        frame[y1:y2, x1:x2] = filtered_roi
-                else:
-                    if self.canny_active:
-                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-                        edges = cv2.Canny(blurred, self.low_threshold, self.high_threshold)
-                        frame = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-                    elif self.current_filter != "None":
-                        frame = self.apply_filter(frame, self.current_filter)
-                
-                cv2.imwrite(filename, frame)
-                self.status_bar.showMessage(f"Snapshot saved to {filename}")
+            self.get_snapshot_writer().save(filename, frame)
+            self.status_bar.showMessage(f"Saving snapshot to {filename}...")
+    
+    def full_resolution_frame(self, packet):
+        # The processed frame is reused as is unless the preview ran at a reduced scale, in
+        # which case the kept raw frame is rendered once more at full resolution
+        if packet.scale == 1.0 or packet.raw is None:
+            return packet.frame
+        return self.processor.process(packet.raw, draw_roi=False, full_resolution=True,
+                                      frame_id=packet.frame_id)
+    
+    @pyqtSlot()
+    def save_burst(self):
+        packets = self.pipeline.history.last(self.burst_spin.value())
+        if not packets:
+            self.status_bar.showMessage("No frames available yet")
+            return
+        from PyQt5.QtWidgets import QFileDialog
+        directory = QFileDialog.getExistingDirectory(self, "Save Burst To")
+        if directory:
+            self.get_snapshot_writer().save_burst(directory, packets)
+            self.status_bar.showMessage(f"Saving {len(packets)} frames to {directory}...")
+    
+    def get_snapshot_writer(self):
+        if self.snapshot_writer is None:
+            from recorder import SnapshotWriter
+            self.snapshot_writer = SnapshotWriter(on_done=self.on_snapshot_written)
+        return self.snapshot_writer
+    
+    def on_snapshot_written(self, path, error):
+        # Called on the snapshot writer thread
+        if error is not None:
+            self.snapshot_saved.emit(f"Snapshot failed: {error}")
+        else:
+            self.snapshot_saved.emit(f"Snapshot saved to {path}")
+    
+    @pyqtSlot(str)
+    def status_message(self, message):
+        self.status_bar.showMessage(message)
     
     @pyqtSlot()
     def toggle_recording(self):
-        if not self.is_recording:
-            filename, _ = QFileDialog.getSaveFileName(self, "Save Video", "", "Videos (*.avi)")
+        if not self.is_recording and self.codec_combo.currentText() == RAW_STORE_CODEC:
+            self.start_frame_store()
+        elif not self.is_recording:
+            from PyQt5.QtWidgets import QFileDialog
+            codec = self.codec_combo.currentText()
+            extension, fourcc = CODECS[codec]
+            if fourcc is None:
+                filename = QFileDialog.getExistingDirectory(self, "Save Image Sequence To")
+            else:
+                filename, _ = QFileDialog.getSaveFileName(self, "Save Video", "",
+                                                          f"Videos (*{extension})")
             if filename:
-                fourcc = cv2.VideoWriter_fourcc(*'XVID')
-                self.video_writer = cv2.VideoWriter(filename, fourcc, self.fps, 
-                                                  (self.frame_width, self.frame_height))
+                output = open_output(filename, codec, self.fps or 30.0)
+                overflow = self.overflow_combo.currentText().lower()
+                writer = AsyncVideoWriter(output, overflow=overflow)
+                if self.pretrigger_checkbox.isChecked():
+                    # Start the file with the frames leading up to the click. The output takes
+                    # its size from the first frame, so at full resolution every pre-trigger
+                    # frame must be full size too; those without a raw frame left to render
+                    # again are skipped.
+                    for packet in self.pipeline.history.last(self.burst_spin.value()):
+                        if not self.record_full_resolution:
+                            frame, scale = packet.frame, packet.scale
+                        elif packet.scale == 1.0 or packet.raw is not None:
+                            frame, scale = self.full_resolution_frame(packet), 1.0
+                        else:
+                            continue
+                        writer.write(self.recording_frame(frame, scale))
                 self.is_recording = True
+                self.video_writer = writer
                 self.record_button.setText("⏹️ Stop Recording")
                 self.status_bar.showMessage("Recording started...")
         else:
-            if self.video_writer is not None:
-                self.video_writer.release()
-                self.video_writer = None
+            writer = self.video_writer
+            self.video_writer = None
             self.is_recording = False
+            if writer is not None:
+                # Let the encoder drain its queue in the background
+                writer.close(wait=False)
+                self.stopped_writers.append(writer)
+            store = self.frame_store
+            self.frame_store = None
+            if store is not None:
+                self.pipeline.set_store(None)
+                # Only waits for the one frame the capture thread may be writing
+                store.close()
             self.record_button.setText("🔴 Start Recording")
             self.status_bar.showMessage("Recording stopped")
     
+    @pyqtSlot()
+    def toggle_analytics(self):
+        if self.analytics is not None:
+            analytics, self.analytics = self.analytics, None
+            # Waits for a record being written on the processing thread
+            analytics.close()
+            self.analytics_button.setText("Start Analytics")
+            self.analytics_label.setText(f"Analytics: off ({analytics.records} frames measured)")
+            return
+        from analytics import AnalyticsStage, SocketSink, open_sink
+        from PyQt5.QtWidgets import QFileDialog
+        output = ANALYTICS_OUTPUTS[self.analytics_combo.currentText()]
+        try:
+            if output == "socket":
+                sink = SocketSink()
+            elif output == "columnar":
+                path = QFileDialog.getExistingDirectory(self, "Save Analytics Columns To")
+                sink = open_sink(path, output) if path else None
+            else:
+                path, _ = QFileDialog.getSaveFileName(self, "Save Analytics", "",
+                                                      "JSON Lines (*.jsonl)")
+                sink = open_sink(path, output) if path else None
+        except OSError as exc:
+            self.status_bar.showMessage(f"Could not start analytics: {exc}")
+            return
+        if sink is None:
+            return
+        self.analytics = AnalyticsStage(self.processor, sink, metrics=self.metrics)
+        self.analytics_button.setText("Stop Analytics")
+        if not self.processor.canny_active:
+            self.status_bar.showMessage("Analytics started; they measure regions whose chain ends "
+                                        "with Canny, so enable Canny Edge Detection")
+        else:
+            self.status_bar.showMessage("Analytics started")
+    
+    def start_frame_store(self):
+        # Raw frames go straight from the capture thread into the memory-mapped store, so
+        # recording costs a memory write per frame and no encoding at all
+        from framestore import SUFFIX as FRAME_STORE_SUFFIX, FrameStoreWriter
+        from PyQt5.QtWidgets import QFileDialog
+        if not self.frame_width or not self.frame_height:
+            self.status_bar.showMessage("No camera frames to record yet")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Frame Store", "",
+                                              f"Frame Stores (*{FRAME_STORE_SUFFIX})")
+        if not path:
+            return
+        if not path.lower().endswith(FRAME_STORE_SUFFIX):
+            path += FRAME_STORE_SUFFIX
+        try:
+            store = FrameStoreWriter(path, self.frame_width, self.frame_height, fps=self.fps)
+        except (OSError, ValueError) as exc:
+            self.status_bar.showMessage(f"Could not create {path}: {exc}")
+            return
+        if self.pretrigger_checkbox.isChecked():
+            # Only the newest few history packets still hold their raw frame
+            for packet in self.pipeline.history.last(self.burst_spin.value()):
+                if packet.raw is not None:
+                    store.append(packet.raw, packet.t_capture, packet.wall_time)
+        self.frame_store = store
+        self.pipeline.set_store(store)
+        self.is_recording = True
+        self.record_button.setText("⏹️ Stop Recording")
+        self.status_bar.showMessage(f"Recording raw frames to {path}...")
+    
     def closeEvent(self, event):
         # Clean up
+        self.closing = True
+        # Stop the pipeline threads first so nothing touches the camera or writer afterwards
+        self.pipeline.stop()
+        self.fps_timer.stop()
+        if self.probe_window is not None:
+            self.probe_window.close()
+        
+        # Finish writing everything that was queued
         if self.video_writer is not None:
-            self.video_writer.release()
+            self.stopped_writers.append(self.video_writer)
+            self.video_writer.close(wait=False)
+        deadline = time.perf_counter() + WRITER_EXIT_TIMEOUT
+        for writer in self.stopped_writers:
+            if not writer.join(max(0.0, deadline - time.perf_counter())):
+                # The encoder thread is a daemon and dies with the process
+                print(f"Recording encoder did not finish within {WRITER_EXIT_TIMEOUT:.0f} s; "
+                      f"{writer.queue_depth()} queued frame(s) were not written", file=sys.stderr)
+        if self.frame_store is not None:
+            self.frame_store.close()
+        if self.analytics is not None:
+            self.analytics.close()
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
         
+        if self.clip is not None:
+            self.clip.release()
         if self.camera is not None:
             self.camera.release()
-        
-        self.timer.stop()
-        self.fps_timer.stop()
         event.accept()
 
 
@@ -438,82 +1377,11 @@ if __name__ == "__main__":
     app.setStyle('Fusion')  # Apply Fusion style for a modern look
     
     # Set application stylesheet for a more modern appearance
-    app.setStyleSheet("""
-        QMainWindow {
-            background-color: #2c3e50;
-            color: #ecf0f1;
-        }
-        QLabel {
-            color: #ecf0f1;
-        }
-        QPushButton {
-            background-color: #3498db;
-            color: white;
-            border: none;
-            padding: 8px;
-            border-radius: 4px;
-        }
-        QPushButton:hover {
-            background-color: #2980b9;
-        }
-        QPushButton:pressed {
-            background-color: #1c6ea4;
-        }
-        QSlider::groove:horizontal {
-            border: 1px solid #999999;
-            height: 8px;
-            background: #3c4c5c;
-            margin: 2px 0;
-            border-radius: 4px;
-        }
-        QSlider::handle:horizontal {
-            background: #3498db;
-            border: 1px solid #5c5c5c;
-            width: 18px;
-            margin: -2px 0;
-            border-radius: 9px;
-        }
-        QGroupBox {
-            border: 2px solid #3498db;
-            border-radius: 5px;
-            margin-top: 12px;
-            padding-top: 15px;
-            color: #ecf0f1;
-        }
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            subcontrol-position: top center;
-            padding: 0 5px;
-            color: #3498db;
-        }
-        QComboBox {
-            background-color: #34495e;
-            color: #ecf0f1;
-            border: 1px solid #3498db;
-            padding: 5px;
-            border-radius: 3px;
-        }
-        QComboBox::drop-down {
-            border: none;
-        }
-        QComboBox QAbstractItemView {
-            background-color: #34495e;
-            color: #ecf0f1;
-            selection-background-color: #3498db;
-        }
-        QCheckBox {
-            color: #ecf0f1;
-        }
-        QCheckBox::indicator {
-            width: 15px;
-            height: 15px;
-        }
-        QStatusBar {
-            background-color: #34495e;
-            color: #ecf0f1;
-        }
-    """)
-    
-    window = ImageProcessingApp()
+    app.setStyleSheet(APP_STYLESHEET)
+    
+    # Optional source: camera index, video file, GStreamer pipeline or "synthetic"
+    window = ImageProcessingApp(device=sys.argv[1] if len(sys.argv) > 1 else 0)
     window.show()
+    # Runs once the event loop has painted the window
+    QTimer.singleShot(0, lambda: window.mark_startup("window_shown"))
     sys.exit(app.exec_())
\ No newline at end of file
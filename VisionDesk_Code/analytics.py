@@ -0,0 +1,262 @@
+import json
+import os
+import socket
+import threading
+
+import cv2
+import numpy as np
+
+from filters import CannyStage
+
+# Measurements on the Canny output, for consumers that want numbers rather than video. For
+# each ROI (or the whole frame when there are none) a record holds the edge pixel count and
+# density, the external contours of the edge map with their bounding boxes, and line segments
+# from the probabilistic Hough transform. Everything runs on the binary edge map of just that
+# region. Coordinates are in full-resolution frame coordinates whatever the processing scale.
+#
+# Records go to a sink, one per frame:
+#   JsonLinesSink   one compact JSON object per line
+#   ColumnarSink    a directory of flat binary columns (read back with read_columns)
+#   SocketSink      one JSON datagram per frame over UDP, e.g. to a collector on localhost
+
+FORMATS = ("jsonl", "columnar")
+
+
+def ends_with_canny(chain):
+    # Only then is the output a binary edge map; a stage after Canny (or none) leaves grey
+    # levels that countNonZero, findContours and HoughLinesP would misread as edges
+    return len(chain) > 0 and isinstance(chain.stages[-1], CannyStage)
+
+
+class EdgeAnalytics:
+    # Boxes and lines are capped at max_items per region, largest first, so one noisy frame
+    # cannot produce a huge record; the uncapped counts are always reported.
+    def __init__(self, min_contour_length=20.0, hough_threshold=40, min_line_length=30,
+                 max_line_gap=5, max_items=32, lines=True):
+        self.min_contour_length = min_contour_length
+        self.hough_threshold = hough_threshold
+        self.min_line_length = min_line_length
+        self.max_line_gap = max_line_gap
+        self.max_items = max_items
+        self.lines = lines
+
+    def measure_region(self, edges, x0, y0, scale):
+        # edges: contiguous single-channel view of the region's edge map
+        region = {"edge_pixels": int(cv2.countNonZero(edges)), "density": 0.0}
+        if edges.size:
+            region["density"] = round(region["edge_pixels"] / edges.size, 6)
+        # [-2] picks the contours with both the OpenCV 3 and 4 return conventions
+        contours = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[-2]
+        contours = [c for c in contours if cv2.arcLength(c, False) >= self.min_contour_length]
+        region["contours"] = len(contours)
+        boxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.float64).reshape(-1, 4)
+        if len(boxes) > self.max_items:
+            boxes = boxes[np.argsort(boxes[:, 2] * boxes[:, 3])[::-1][:self.max_items]]
+        boxes[:, :2] += (x0, y0)
+        region["boxes"] = np.round(boxes / scale).astype(int).tolist()
+        if self.lines:
+            lines = cv2.HoughLinesP(edges, 1, np.pi / 180, self.hough_threshold,
+                                    minLineLength=self.min_line_length, maxLineGap=self.max_line_gap)
+            lines = np.zeros((0, 4)) if lines is None else lines.reshape(-1, 4).astype(np.float64)
+            region["line_count"] = len(lines)
+            if len(lines) > self.max_items:
+                lengths = np.hypot(lines[:, 2] - lines[:, 0], lines[:, 3] - lines[:, 1])
+                lines = lines[np.argsort(lengths)[::-1][:self.max_items]]
+            lines += (x0, y0, x0, y0)
+            region["lines"] = np.round(lines / scale).astype(int).tolist()
+        return region
+
+    def measure(self, frame, rects, scale=1.0):
+        # frame is the processed output (edges in channel 0); rects are the regions in frame
+        # coordinates at the processing scale, None for the whole frame
+        height, width = frame.shape[:2]
+        regions = []
+        for rect in rects or [None]:
+            x1, y1, x2, y2 = rect if rect is not None else (0, 0, width, height)
+            edges = frame[y1:y2, x1:x2]
+            if edges.ndim == 3:
+                edges = edges[:, :, 0]
+            region = self.measure_region(np.ascontiguousarray(edges), x1, y1, scale)
+            region["roi"] = None if rect is None else [int(round(v / scale)) for v in rect]
+            regions.append(region)
+        return regions
+
+
+class AnalyticsStage:
+    # Runs after the Canny step: measures the processed frame and hands the record to sink.
+    # Each ROI is judged by its own chain, so regions whose chain does not end with Canny are
+    # left out of the record; regions_skipped is how many were left out of the latest frame.
+    def __init__(self, processor, sink, analytics=None, metrics=None):
+        self.processor = processor
+        self.sink = sink
+        self.analytics = analytics if analytics is not None else EdgeAnalytics()
+        self.metrics = metrics
+        self.records = 0
+        self.regions_skipped = 0
+        # close() may come from another thread than process()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def process(self, frame, index, t_capture, scale=1.0, wall_time=None):
+        processor = self.processor
+        if self._closed:
+            return None
+        rects = []
+        skipped = 0
+        for region in processor.rois:
+            if not ends_with_canny(region.chain(processor)):
+                skipped += 1
+                continue
+            rect = processor.clamp_roi(region.rect, frame.shape, scale)
+            if rect is not None:
+                rects.append(rect)
+        self.regions_skipped = skipped
+        if processor.rois and not rects:
+            return None
+        if not processor.rois and not ends_with_canny(processor.chain()):
+            return None
+        if self.metrics is not None:
+            with self.metrics.time("analytics"):
+                regions = self.analytics.measure(frame, rects, scale)
+        else:
+            regions = self.analytics.measure(frame, rects, scale)
+        record = {"frame": index, "t": round(t_capture, 6), "regions": regions}
+        if wall_time is not None:
+            record["wall_time"] = round(wall_time, 3)
+        with self._lock:
+            if self._closed:
+                return None
+            self.sink.write(record)
+            self.records += 1
+        return record
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.sink.close()
+
+
+class JsonLinesSink:
+    # Replaces an existing file unless append is set
+    def __init__(self, path, append=False):
+        self.path = path
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarSink:
+    # One row per region in the regions.* columns; boxes and lines are rows of their own that
+    # point back to their region row. All columns are little-endian raw arrays:
+    #   regions.frame u4, regions.t f8, regions.wall_time f8 (NaN when not known),
+    #   regions.roi i4 x4 (-1 for the whole frame), regions.edge_pixels u4, regions.density f4,
+    #   regions.contours u4, regions.lines u4
+    #   boxes.region u4, boxes.rect i4 x4, lines.region u4, lines.segment i4 x4
+    # The directory's columns are replaced unless append is set, in which case the existing
+    # schema has to match.
+    VERSION = 2
+    COLUMNS = {
+        "regions.frame": "<u4",
+        "regions.t": "<f8",
+        "regions.wall_time": "<f8",
+        "regions.roi": "<i4",
+        "regions.edge_pixels": "<u4",
+        "regions.density": "<f4",
+        "regions.contours": "<u4",
+        "regions.lines": "<u4",
+        "boxes.region": "<u4",
+        "boxes.rect": "<i4",
+        "lines.region": "<u4",
+        "lines.segment": "<i4",
+    }
+
+    def __init__(self, path, append=False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        schema = {"version": self.VERSION, "columns": self.COLUMNS}
+        schema_path = os.path.join(path, "schema.json")
+        if append and os.path.exists(schema_path):
+            with open(schema_path) as f:
+                if json.load(f) != schema:
+                    raise ValueError(f"Cannot append to {path}: its columns differ")
+        with open(schema_path, "w") as f:
+            json.dump(schema, f, indent=2)
+        self._files = {name: open(os.path.join(path, name + ".bin"), "ab" if append else "wb")
+                       for name in self.COLUMNS}
+        self._rows = os.path.getsize(os.path.join(path, "regions.frame.bin")) // 4
+
+    def _append(self, name, values):
+        self._files[name].write(np.asarray(values, dtype=self.COLUMNS[name]).tobytes())
+
+    def write(self, record):
+        regions = record["regions"]
+        rows = np.arange(self._rows, self._rows + len(regions))
+        self._append("regions.frame", [record["frame"]] * len(regions))
+        self._append("regions.t", [record["t"]] * len(regions))
+        self._append("regions.wall_time", [record.get("wall_time", np.nan)] * len(regions))
+        self._append("regions.roi", [r["roi"] or [-1, -1, -1, -1] for r in regions])
+        self._append("regions.edge_pixels", [r["edge_pixels"] for r in regions])
+        self._append("regions.density", [r["density"] for r in regions])
+        self._append("regions.contours", [r["contours"] for r in regions])
+        self._append("regions.lines", [r.get("line_count", 0) for r in regions])
+        for row, region in zip(rows, regions):
+            boxes = region["boxes"]
+            self._append("boxes.region", [row] * len(boxes))
+            self._append("boxes.rect", np.array(boxes).reshape(-1, 4))
+            segments = region.get("lines", [])
+            self._append("lines.region", [row] * len(segments))
+            self._append("lines.segment", np.array(segments).reshape(-1, 4))
+        self._rows += len(regions)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+def read_columns(path):
+    # The columns of a ColumnarSink directory as numpy arrays, x4 columns shaped (n, 4)
+    with open(os.path.join(path, "schema.json")) as f:
+        columns = json.load(f)["columns"]
+    data = {}
+    for name, dtype in columns.items():
+        array = np.fromfile(os.path.join(path, name + ".bin"), dtype=dtype)
+        if name in ("regions.roi", "boxes.rect", "lines.segment"):
+            array = array.reshape(-1, 4)
+        data[name] = array
+    return data
+
+
+class SocketSink:
+    # Fire-and-forget UDP: a missing or slow collector never stalls processing
+    def __init__(self, host="127.0.0.1", port=9109):
+        self.address = (host, port)
+        self.sent = 0
+        self.failed = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def write(self, record):
+        try:
+            self._socket.sendto(json.dumps(record, separators=(",", ":")).encode(), self.address)
+            self.sent += 1
+        except OSError:
+            self.failed += 1
+
+    def close(self):
+        self._socket.close()
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def open_sink(path, fmt="jsonl", append=False):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown analytics format: {fmt}")
+    return ColumnarSink(path, append) if fmt == "columnar" else JsonLinesSink(path, append)
@@ -0,0 +1,271 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+
+from analytics import FORMATS as ANALYTICS_FORMATS, AnalyticsStage, SocketSink, open_sink, parse_address
+from filters import STAGE_NAMES
+from framestore import FrameStore, is_frame_store
+from incremental import IncrementalRenderer
+from tuning import AUTO_METHODS, AutoThreshold
+from processing import FrameProcessor, RoiRegion
+
+# Headless command line: run the Canny/ROI/filter chain over a video file, an image
+# directory/glob or a camera index without a display, e.g.
+#   python batch.py clip.mp4 -o edges.avi --canny --low 40 --high 120
+#   python batch.py "frames/*.png" -o out_frames --filter Blur Sharpen Canny
+#   python batch.py clip.mp4 -o edges.avi --canny --workers 8
+#   python batch.py session.vdf -o edges.avi --canny      (raw frame store from the GUI)
+#   python batch.py clip.mp4 --canny --roi 0 0 320 240 --analytics edges.jsonl
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def is_image_input(source):
+    if os.path.isdir(source) or glob.has_magic(source):
+        return True
+    return source.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def image_paths(source):
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def open_capture(source):
+    # A bare integer selects a camera, anything else is handed to OpenCV as a file/URL
+    if source.isdigit():
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(source)
+
+
+def read_video_frames(capture, max_frames=None):
+    # Decode into the same buffer every time instead of allocating a frame per read
+    frame = None
+    count = 0
+    while max_frames is None or count < max_frames:
+        ret, frame = capture.read(frame)
+        if not ret:
+            break
+        count += 1
+        yield frame
+
+
+def read_store_frames(store, max_frames=None):
+    # Frames are read-only views into the store's mapped files, nothing is decoded or copied
+    count = len(store) if max_frames is None else min(len(store), max_frames)
+    for index in range(count):
+        yield store[index]
+
+
+def read_image_frames(paths):
+    for path in paths:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            print(f"Skipping unreadable image: {path}", file=sys.stderr)
+            continue
+        yield path, frame
+
+
+def processor_settings(args):
+    return dict(low_threshold=args.low, high_threshold=args.high,
+                canny_active=args.canny, filters=args.filter,
+                rois=[RoiRegion(rect) for rect in args.roi or []], flip=args.flip,
+                incremental=IncrementalRenderer(args.tile_size) if args.incremental else None,
+                auto_threshold=AutoThreshold(args.auto_threshold) if args.auto_threshold else None)
+
+
+def build_processor(args):
+    return FrameProcessor(reuse_buffers=True, **processor_settings(args))
+
+
+def build_analytics(args, processor):
+    # Edge measurements per frame, written next to (or instead of) the video output
+    if args.analytics_socket:
+        sink = SocketSink(*parse_address(args.analytics_socket))
+    elif args.analytics:
+        sink = open_sink(args.analytics, args.analytics_format)
+    else:
+        return None
+    return AnalyticsStage(processor, sink)
+
+
+def report(frames, elapsed):
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {frames} frames in {elapsed:.2f} s ({fps:.1f} frames/sec)")
+
+
+def run_images(args, processor):
+    paths = image_paths(args.input)
+    if not paths:
+        print(f"No images found for {args.input}", file=sys.stderr)
+        return 1
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    analytics = build_analytics(args, processor)
+    frames = 0
+    start = time.perf_counter()
+    try:
+        for path, frame in read_image_frames(paths):
+            result = processor.process(frame, draw_roi=args.draw_roi)
+            if analytics is not None:
+                analytics.process(result, frames, float(frames))
+            if args.output:
+                cv2.imwrite(os.path.join(args.output, os.path.basename(path)), result)
+            frames += 1
+    finally:
+        if analytics is not None:
+            analytics.close()
+    report(frames, time.perf_counter() - start)
+    return 0
+
+
+def run_video(args, processor):
+    if is_frame_store(args.input):
+        capture = None
+        store = FrameStore(args.input)
+        fps = store.fps
+        source = read_store_frames(store, args.max_frames)
+    else:
+        capture = open_capture(args.input)
+        if not capture.isOpened():
+            print(f"Could not open {args.input}", file=sys.stderr)
+            return 1
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+        source = read_video_frames(capture, args.max_frames)
+
+    analytics = build_analytics(args, processor)
+    writer = None
+    frames = 0
+    start = time.perf_counter()
+    try:
+        for frame in source:
+            result = processor.process(frame, draw_roi=args.draw_roi)
+            if analytics is not None:
+                # Stream time of the frame, so records line up with the video
+                analytics.process(result, frames, frames / fps)
+            if args.output:
+                if writer is None:
+                    # Open the writer with the processed frame size, which may differ from the input
+                    height, width = result.shape[:2]
+                    writer = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*args.fourcc),
+                                             fps, (width, height))
+                writer.write(result)
+            frames += 1
+            if args.progress and frames % args.progress == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{frames} frames, {frames / elapsed:.1f} frames/sec", file=sys.stderr)
+    finally:
+        if capture is not None:
+            capture.release()
+        if writer is not None:
+            writer.release()
+        if analytics is not None:
+            analytics.close()
+    report(frames, time.perf_counter() - start)
+    return 0
+
+
+def run_parallel(args):
+    from parallel import ParallelVideoEngine
+
+    capture = cv2.VideoCapture(args.input)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    capture.release()
+
+    state = {"writer": None, "frames": 0}
+    # Results arrive in frame order, so analytics run here exactly as in a single process
+    analytics = build_analytics(args, build_processor(args))
+    start = time.perf_counter()
+
+    def sink(result):
+        if analytics is not None:
+            analytics.process(result, state["frames"], state["frames"] / fps)
+        if args.output:
+            if state["writer"] is None:
+                height, width = result.shape[:2]
+                state["writer"] = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*args.fourcc),
+                                                  fps, (width, height))
+            state["writer"].write(result)
+        state["frames"] += 1
+        if args.progress and state["frames"] % args.progress == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{state['frames']} frames, {state['frames'] / elapsed:.1f} frames/sec",
+                  file=sys.stderr)
+
+    engine = ParallelVideoEngine(processor_settings(args), workers=args.workers,
+                                 chunk_size=args.chunk_size, draw_roi=args.draw_roi)
+    try:
+        engine.run(args.input, sink, max_frames=args.max_frames)
+    finally:
+        if state["writer"] is not None:
+            state["writer"].release()
+        if analytics is not None:
+            analytics.close()
+    report(state["frames"], time.perf_counter() - start)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Canny/filter pipeline without a GUI")
+    parser.add_argument("input",
+                        help="video file, raw frame store, image directory/glob, or camera index")
+    parser.add_argument("-o", "--output",
+                        help="output video file (video/camera input) or directory (image input)")
+    parser.add_argument("--canny", action="store_true", help="enable Canny edge detection")
+    parser.add_argument("--low", type=int, default=50, help="Canny low threshold")
+    parser.add_argument("--high", type=int, default=150, help="Canny high threshold")
+    parser.add_argument("--auto-threshold", choices=AUTO_METHODS,
+                        help="pick Canny thresholds per frame instead of --low/--high")
+    parser.add_argument("--filter", nargs="+", default=[], choices=STAGE_NAMES, metavar="STAGE",
+                        help="filter stages applied in order, e.g. Blur Sharpen Canny "
+                             f"(choices: {', '.join(STAGE_NAMES)})")
+    parser.add_argument("--roi", type=int, nargs=4, action="append", metavar=("X1", "Y1", "X2", "Y2"),
+                        help="process only this region (repeat for several regions)")
+    parser.add_argument("--draw-roi", action="store_true", help="outline the ROI in the output")
+    parser.add_argument("--flip", action="store_true", help="mirror frames like the live view")
+    parser.add_argument("--incremental", action="store_true",
+                        help="re-render only tiles that changed (static-camera footage)")
+    parser.add_argument("--tile-size", type=int, default=64, help="tile size for --incremental")
+    parser.add_argument("--analytics", metavar="PATH",
+                        help="write per-frame edge measurements (needs Canny) to this file")
+    parser.add_argument("--analytics-format", choices=ANALYTICS_FORMATS, default="jsonl",
+                        help="JSON lines, or a directory of binary columns")
+    parser.add_argument("--analytics-socket", metavar="HOST:PORT",
+                        help="send the measurements as UDP datagrams instead of writing a file")
+    parser.add_argument("--fourcc", default="XVID", help="codec for video output")
+    parser.add_argument("--max-frames", type=int, help="stop after this many frames")
+    parser.add_argument("--progress", type=int, default=0, metavar="N",
+                        help="print throughput every N frames")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for video files (0 = one per core)")
+    parser.add_argument("--chunk-size", type=int, default=8,
+                        help="frames per work item in parallel mode")
+    args = parser.parse_args(argv)
+    if args.workers != 1 and (args.auto_threshold or args.incremental):
+        # Both follow the footage frame by frame, which separate workers cannot share
+        parser.error("--auto-threshold and --incremental need --workers 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # A frame store is a directory too, so it has to be recognised before image input
+    if is_frame_store(args.input):
+        return run_video(args, build_processor(args))
+    if is_image_input(args.input):
+        return run_images(args, build_processor(args))
+    if args.workers != 1 and not args.input.isdigit():
+        return run_parallel(args)
+    return run_video(args, build_processor(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ResultCache  # noqa: E402
+from filters import STAGE_NAMES  # noqa: E402
+from incremental import IncrementalRenderer  # noqa: E402
+from metrics import RollingStat  # noqa: E402
+from processing import FrameProcessor, RoiRegion  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Reproducible benchmark for the processing core. Drives FrameProcessor with synthetic frames
+# and with clips from benchmarks/clips (create them with --make-clips), sweeping one axis at a
+# time around a default configuration (Canny 50/150, full frame, OpenCV's default threads):
+#   python benchmarks/bench.py --quick
+#   python benchmarks/bench.py --save-baseline baseline.json
+#   python benchmarks/bench.py --baseline baseline.json --tolerance 0.10
+
+RESOLUTIONS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+THRESHOLDS = [(20, 60), (50, 150), (100, 200), (150, 250)]
+ROI_FRACTIONS = [0.1, 0.25, 0.5, 1.0]
+THREAD_COUNTS = [1, 2, 4, 0]  # 0 = whatever OpenCV picks by default
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+
+
+def synthetic_frames(width, height, count=8, seed=0):
+    # Textured background with moving shapes, so Canny has a realistic amount of edges
+    rng = np.random.default_rng(seed)
+    base = np.zeros((height, width, 3), dtype=np.uint8)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    base[:] = xs[None, :, None].astype(np.uint8)
+    base = cv2.add(base, rng.integers(0, 24, base.shape, dtype=np.uint8))
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        for j in range(12):
+            cx = int((j * 0.08 + i * 0.01) * width) % width
+            cy = int((0.1 + (j % 6) * 0.15) * height)
+            radius = max(4, height // (10 + j))
+            color = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.circle(frame, (cx, cy), radius, color, -1)
+            cv2.rectangle(frame, (cx // 2, cy // 2), (cx // 2 + radius, cy // 2 + radius), color, 3)
+        frames.append(frame)
+    return frames
+
+
+def make_clips(directory=CLIP_DIR, resolutions=("480p", "720p", "1080p"), frames=120):
+    os.makedirs(directory, exist_ok=True)
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        path = os.path.join(directory, f"synthetic_{label}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30.0, (width, height))
+        pool = synthetic_frames(width, height, count=frames)
+        for frame in pool:
+            writer.write(frame)
+        writer.release()
+        print(f"Wrote {path}")
+
+
+def clip_frames(path, limit=60):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < limit:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def centred_roi(width, height, fraction):
+    if fraction >= 1.0:
+        return None
+    w, h = int(width * fraction), int(height * fraction)
+    x1, y1 = (width - w) // 2, (height - h) // 2
+    return (x1, y1, x1 + w, y1 + h)
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_case(frames, settings, threads, iterations, warmup):
+    cv2.setNumThreads(threads)
+    # Memory is traced only while the processor is built and warmed up (buffers plus the
+    # per-frame temporaries); tracing slows allocation, so the timed loop runs without it
+    tracemalloc.start()
+    processor = FrameProcessor(reuse_buffers=True, **settings)
+    # With a result cache the frames are treated as a recorded clip that is replayed
+    frame_ids = list(range(len(frames))) if processor.cache is not None else [None] * len(frames)
+    for i in range(max(1, warmup)):
+        index = i % len(frames)
+        processor.process(frames[index], draw_roi=False, frame_id=frame_ids[index])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latency = RollingStat(window=iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        index = i % len(frames)
+        processor.process(frames[index], draw_roi=False, frame_id=frame_ids[index])
+        latency.add((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - start
+
+    result = latency.summary()
+    result["fps"] = iterations / elapsed if elapsed > 0 else 0.0
+    result["peak_traced_mb"] = peak / (1024 * 1024)
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+
+def build_cases(width, height, quick):
+    # (axis, case label, processor settings, OpenCV threads)
+    default = dict(canny_active=True, low_threshold=50, high_threshold=150)
+    cases = [("baseline", "canny-50-150", default, 0)]
+    for name in STAGE_NAMES:
+        cases.append(("filter", name, dict(filters=[name]), 0))
+    if not quick:
+        for low, high in THRESHOLDS:
+            cases.append(("thresholds", f"canny-{low}-{high}",
+                          dict(canny_active=True, low_threshold=low, high_threshold=high), 0))
+        for fraction in ROI_FRACTIONS:
+            rect = centred_roi(width, height, fraction)
+            rois = [RoiRegion(rect)] if rect else []
+            cases.append(("roi", f"roi-{int(fraction * 100)}pct", dict(default, rois=rois), 0))
+        for threads in THREAD_COUNTS:
+            cases.append(("threads", f"threads-{threads or 'default'}", default, threads))
+        # The synthetic frames only move a few shapes over a fixed background
+        cases.append(("incremental", "canny-50-150",
+                      dict(default, incremental=IncrementalRenderer()), 0))
+        cases.append(("cache", "replay-canny-50-150", dict(default, cache=ResultCache()), 0))
+    return cases
+
+
+def run_suite(args):
+    sources = []
+    resolutions = ["480p", "1080p"] if args.quick else list(RESOLUTIONS)
+    if args.resolutions:
+        resolutions = args.resolutions
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        sources.append((f"synthetic/{label}", synthetic_frames(width, height)))
+    for path in sorted(glob.glob(os.path.join(args.clips, "*"))):
+        frames = clip_frames(path)
+        if frames:
+            sources.append((f"clip/{os.path.basename(path)}", frames))
+
+    results = {}
+    default_threads = cv2.getNumThreads()
+    for source, frames in sources:
+        height, width = frames[0].shape[:2]
+        for axis, label, settings, threads in build_cases(width, height, args.quick):
+            key = f"{source}/{axis}/{label}"
+            results[key] = run_case(frames, settings, threads or default_threads,
+                                    args.iterations, args.warmup)
+            r = results[key]
+            print(f"{key:<52} {r['fps']:>8.1f} fps  p50 {r['p50_ms']:>7.2f}  p95 {r['p95_ms']:>7.2f}"
+                  f"  p99 {r['p99_ms']:>7.2f} ms  peak {r['peak_traced_mb']:>6.1f} MB")
+    cv2.setNumThreads(default_threads)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # A case regresses when its throughput falls (or p95 latency rises) by more than tolerance
+    regressions = []
+    print(f"\n{'case':<52} {'base fps':>9} {'fps':>9} {'change':>8}")
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        change = (result["fps"] - base["fps"]) / base["fps"] if base["fps"] else 0.0
+        p95_change = (result["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        flag = ""
+        if change < -tolerance or p95_change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key:<52} {base['fps']:>9.1f} {result['fps']:>9.1f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the edge/filter pipeline")
+    parser.add_argument("--iterations", type=int, default=100, help="timed frames per case")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed frames per case")
+    parser.add_argument("--quick", action="store_true", help="fewer resolutions and axes")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS))
+    parser.add_argument("--clips", default=CLIP_DIR, help="directory of test clips")
+    parser.add_argument("--make-clips", action="store_true",
+                        help="write synthetic test clips into --clips and exit")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="save results as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative slowdown before a case counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.make_clips:
+        make_clips(args.clips)
+        return 0
+
+    results = run_suite(args)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing import FrameProcessor  # noqa: E402
+
+# Compares the in-place ROI compositing in FrameProcessor with the previous full-frame
+# mask/bitwise/add approach, at 1080p and 4K with a few ROI sizes:
+#   python benchmarks/roi_compositing.py --frames 200
+
+RESOLUTIONS = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+ROI_SIZES = [(160, 120), (640, 480), (1280, 720)]
+
+
+def legacy_composite(frame, roi, low_threshold, high_threshold):
+    # The pre-refactor update_frame path, kept here as the reference point
+    x1, y1, x2, y2 = roi
+    frame = frame.copy()
+    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+    mask[y1:y2, x1:x2] = 255
+    gray_roi = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    blurred_roi = cv2.GaussianBlur(gray_roi, (5, 5), 0)
+    canny_roi = cv2.Canny(blurred_roi, low_threshold, high_threshold)
+    canny_colored = cv2.cvtColor(canny_roi, cv2.COLOR_GRAY2BGR)
+    cv2.bitwise_and(frame, frame, mask=mask)
+    mask_inv = cv2.bitwise_not(mask)
+    background = cv2.bitwise_and(frame, frame, mask=mask_inv)
+    frame[y1:y2, x1:x2] = canny_colored
+    frame = cv2.add(background, frame)
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    return frame
+
+
+def time_per_frame(fn, frame, frames):
+    fn(frame)  # warm up buffers and compiled chains
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn(frame)
+    return (time.perf_counter() - start) * 1000.0 / frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ROI compositing benchmark")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print(f"{'resolution':>10} {'roi':>10} {'legacy ms':>10} {'in-place ms':>12} {'speedup':>8}")
+    for label, (width, height) in RESOLUTIONS.items():
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for roi_w, roi_h in ROI_SIZES:
+            x1, y1 = (width - roi_w) // 2, (height - roi_h) // 2
+            roi = (x1, y1, x1 + roi_w, y1 + roi_h)
+            # Same work as the GUI preview: a fresh output frame, Canny in the ROI
+            processor = FrameProcessor(canny_active=True, roi=roi)
+
+            legacy = time_per_frame(lambda f: legacy_composite(f, roi, 50, 150), frame, args.frames)
+            current = time_per_frame(processor.process, frame, args.frames)
+            print(f"{label:>10} {f'{roi_w}x{roi_h}':>10} {legacy:>10.2f} {current:>12.2f} "
+                  f"{legacy / current:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
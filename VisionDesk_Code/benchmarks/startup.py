@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Startup timing for the desktop app. Launches Canny.py several times with the synthetic
+# source (so no camera is needed), and reports the median time from the top of Canny.py to
+# each milestone: imports done, window shown, camera open and first frame on screen. The
+# app writes its timings to VISIONDESK_STARTUP_REPORT and exits after the first frame.
+#   python benchmarks/startup.py --runs 5
+#   python benchmarks/startup.py --source 0 --save-baseline startup.json
+#   python benchmarks/startup.py --baseline startup.json --tolerance 0.20
+#   python benchmarks/startup.py --imports       (slowest imports, from python -X importtime)
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Canny.py")
+MILESTONES = ("imports", "window_shown", "camera_open", "first_frame")
+
+
+def run_once(source, timeout):
+    fd, report = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    env = dict(os.environ, VISIONDESK_STARTUP_REPORT=report)
+    try:
+        subprocess.run([sys.executable, APP, str(source)], env=env, timeout=timeout,
+                       cwd=os.path.dirname(APP), check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(report) as f:
+            text = f.read()
+        return json.loads(text) if text else None
+    except subprocess.TimeoutExpired:
+        return None
+    finally:
+        os.remove(report)
+
+
+def slowest_imports(count):
+    # python -X importtime prints "import time: self [us] | cumulative | name" to stderr
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import Canny"],
+                            cwd=os.path.dirname(APP), capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        rows.append((int(parts[1]), int(parts[0].split(":")[1]), parts[2].rstrip()))
+    rows.sort(reverse=True)
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for cumulative, own, name in rows[:count]:
+        print(f"{cumulative / 1000.0:>14.1f} {own / 1000.0:>8.1f}  {name}")
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'milestone':<14} {'base ms':>9} {'ms':>9} {'change':>8}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = (value - base) / base
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<14} {base:>9.0f} {value:>9.0f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the desktop app's startup time")
+    parser.add_argument("--runs", type=int, default=5, help="app launches to take the median of")
+    parser.add_argument("--source", default="synthetic",
+                        help="camera index, video file or synthetic (default)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds allowed per launch")
+    parser.add_argument("--imports", type=int, nargs="?", const=20, metavar="N",
+                        help="list the N slowest imports instead")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="save results as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="allowed relative slowdown before a milestone counts as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.imports:
+        slowest_imports(args.imports)
+        return 0
+
+    runs = []
+    for index in range(args.runs):
+        timings = run_once(args.source, args.timeout)
+        if timings is None:
+            print(f"run {index + 1}: no first frame within {args.timeout:.0f} s", file=sys.stderr)
+            continue
+        runs.append(timings)
+        print(f"run {index + 1}: " + ", ".join(f"{name} {timings[name]:.0f} ms"
+                                               for name in MILESTONES if name in timings))
+    if not runs:
+        return 1
+    results = {name: statistics.median(run[name] for run in runs if name in run)
+               for name in MILESTONES if any(name in run for run in runs)}
+    print("median: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in results.items()))
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "source": args.source,
+            "runs": len(runs),
+        },
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} milestone(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
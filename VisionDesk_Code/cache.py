@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+# Memoization for recorded footage. Results are keyed by (frame id, stages so far, parameters),
+# so replaying a clip or moving a threshold slider on a paused frame only recomputes what the
+# change actually affects. Entries are numpy arrays, evicted least recently used first once
+# the total size exceeds the memory budget. Stored arrays are made read-only: a cache hit is
+# shared, and writing into it would silently corrupt later hits.
+
+
+class ResultCache:
+    def __init__(self, budget_mb=512):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            array = self._items.get(key)
+            if array is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return array
+
+    def put(self, key, array):
+        # The array is stored as is (not copied), so pass one nobody else will write to
+        nbytes = array.nbytes
+        if nbytes > self.budget:
+            return
+        array.flags.writeable = False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old.nbytes
+            while self._items and self.size + nbytes > self.budget:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+            self._items[key] = array
+            self.size += nbytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "size_mb": self.size / (1024 * 1024),
+                "budget_mb": self.budget / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,353 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Capture sources for the live pipeline. All of them read like a cv2.VideoCapture (read,
+# get, isOpened, release) and also set timestamp, the time.perf_counter() at which the frame
+# they last returned arrived, so latency is measured from the frame rather than from whenever
+# the capture thread got round to asking for it.
+#
+# Drivers queue frames (often 4+ with V4L2) and hand out the oldest one first, so a slow
+# consumer sees ever older frames. buffer_size asks the driver for fewer buffers, which not
+# every backend honours; latest_only additionally discards whatever is still queued at read
+# time. Frames only queue up while nobody grabs: each read adds the frame intervals since the
+# previous grab to an estimate of the queue, less the frame it takes, and whole frames of that
+# estimate are dropped. A read that comes late by less than a frame interval therefore keeps its
+# frame, while a consumer that keeps falling behind still drains the backlog that adds up. A
+# grab that has to wait for the sensor means the queue is empty, which resets the estimate.
+#
+# FileCamera and SyntheticCamera stand in for a camera without hardware. SyntheticCamera also
+# draws a LatencyProbe code with its render time into every frame, so the whole path up to the
+# screen can be timed.
+
+BACKENDS = {
+    "auto": cv2.CAP_ANY,
+    "v4l2": cv2.CAP_V4L2,
+    "gstreamer": cv2.CAP_GSTREAMER,
+    "dshow": cv2.CAP_DSHOW,
+    "msmf": cv2.CAP_MSMF,
+    "ffmpeg": cv2.CAP_FFMPEG,
+}
+PIXEL_FORMATS = ("MJPG", "YUYV")
+URL_PREFIXES = ("http://", "https://", "rtsp://", "rtmp://", "udp://", "tcp://")
+SYNTHETIC = "synthetic"
+# Most stale frames latest_only will discard in one read
+DRAIN_LIMIT = 8
+
+
+def fourcc_text(value):
+    value = int(value)
+    text = "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+    return text if text.isprintable() and text.strip() else ""
+
+
+class CaptureSettings:
+    # device is a camera index, a file path, a GStreamer pipeline or "synthetic". Zero or
+    # empty values leave the backend's own default in place.
+    def __init__(self, device=0, backend="auto", buffer_size=1, width=0, height=0, fps=0.0,
+                 pixel_format="", latest_only=True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {backend}")
+        if pixel_format and pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format: {pixel_format}")
+        self.device = int(device) if isinstance(device, str) and device.isdigit() else device
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.latest_only = latest_only
+
+
+class CameraSource:
+    def __init__(self, settings):
+        self.settings = settings
+        self.timestamp = None
+        # Driver timestamp of the last frame (CAP_PROP_POS_MSEC), where the backend has one
+        self.device_time = None
+        self.stale_dropped = 0
+        # Buffer count the driver accepted, None if it kept its own
+        self.buffer_size = None
+        self._last_grab = None
+        # Estimated frames still queued in the driver after the last read
+        self._queued = 0.0
+        self._lock = threading.Lock()
+        self.capture = cv2.VideoCapture(settings.device, BACKENDS[settings.backend])
+        if self.capture.isOpened():
+            self._configure()
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.pixel_format = fourcc_text(self.capture.get(cv2.CAP_PROP_FOURCC))
+        self._interval = 1.0 / self.fps if self.fps > 0 else 1.0 / 30.0
+
+    def _configure(self):
+        settings = self.settings
+        capture = self.capture
+        # V4L2 picks the frame sizes on offer from the pixel format, so that goes first
+        if settings.pixel_format:
+            capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*settings.pixel_format))
+        if settings.width and settings.height:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, settings.width)
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, settings.height)
+        if settings.fps:
+            capture.set(cv2.CAP_PROP_FPS, settings.fps)
+        if settings.buffer_size and capture.set(cv2.CAP_PROP_BUFFERSIZE, settings.buffer_size):
+            self.buffer_size = int(capture.get(cv2.CAP_PROP_BUFFERSIZE))
+
+    def get(self, prop):
+        return self.capture.get(prop)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self, image=None):
+        with self._lock:
+            start = time.perf_counter()
+            if not self.capture.grab():
+                return False, None
+            grabbed = time.perf_counter()
+            if grabbed - start > 0.5 * self._interval or self._last_grab is None:
+                # Waited for the sensor: nothing else is queued
+                self._queued = 0.0
+            else:
+                # Frames that arrived since the previous grab, less the one just taken
+                arrived = (grabbed - self._last_grab) / self._interval
+                self._queued = min(max(0.0, self._queued + arrived - 1.0), float(DRAIN_LIMIT))
+            if self.settings.latest_only:
+                while self._queued >= 1.0:
+                    start = grabbed
+                    if not self.capture.grab():
+                        return False, None
+                    grabbed = time.perf_counter()
+                    self.stale_dropped += 1
+                    self._queued -= 1.0
+                    if grabbed - start > 0.5 * self._interval:
+                        self._queued = 0.0
+            self._last_grab = grabbed
+            ret, frame = self.capture.retrieve(image)
+            if ret:
+                self.timestamp = grabbed
+                self.device_time = self.capture.get(cv2.CAP_PROP_POS_MSEC)
+            return ret, frame
+
+    def describe(self):
+        buffers = self.buffer_size or "default"
+        return (f"{self.width}x{self.height} {self.pixel_format or '?'} @ {self.fps:.0f} fps, "
+                f"buffers {buffers}")
+
+    def release(self):
+        # Waits for a read in progress, so the capture thread never reads a released device
+        with self._lock:
+            self.capture.release()
+
+
+class PacedSource:
+    # Base for the stand-ins: frames are handed out at the source's frame rate like a sensor
+    def __init__(self, fps):
+        self.fps = fps
+        self.timestamp = None
+        self.stale_dropped = 0
+        self.pixel_format = "BGR"
+        self._next_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        delay = self._next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.perf_counter()
+        # A consumer that fell behind gets the current frame, not a backlog, like latest_only
+        self._next_time = max(self._next_time + 1.0 / self.fps, now)
+        return now
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0.0
+
+    def describe(self):
+        return f"{self.width}x{self.height} {self.pixel_format} @ {self.fps:.0f} fps ({self.name})"
+
+    def release(self):
+        pass
+
+
+class FileCamera(PacedSource):
+    # A video file replayed in real time and looped, standing in for a camera
+    def __init__(self, path, fps=0.0):
+        self.name = os.path.basename(path)
+        self.capture = cv2.VideoCapture(path)
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def read(self, image=None):
+        now = self._wait()
+        with self._lock:
+            ret, frame = self.capture.read(image)
+            if not ret:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.capture.read(image)
+        if ret:
+            self.timestamp = now
+        return ret, frame
+
+    def release(self):
+        with self._lock:
+            self.capture.release()
+
+
+class SyntheticSource:
+    # Moving test pattern, one per index; also the synthetic streams of mjpeg_server.py
+    def __init__(self, index, width, height):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.count = 0
+        rng = np.random.default_rng(index)
+        ramp = np.linspace(0, 255, width, dtype=np.float32).astype(np.uint8)
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = ramp[None, :, None]
+        self.background = cv2.add(self.background, rng.integers(0, 32, self.background.shape,
+                                                                 dtype=np.uint8))
+        self.color = tuple(int(c) for c in rng.integers(64, 256, 3))
+
+    def read(self):
+        frame = self.background.copy()
+        t = self.count / 30.0
+        cx = int((0.5 + 0.4 * np.sin(t + self.index)) * self.width)
+        cy = int((0.5 + 0.3 * np.cos(1.3 * t)) * self.height)
+        cv2.circle(frame, (cx, cy), self.height // 8, self.color, -1)
+        cv2.rectangle(frame, (self.width - cx - 40, cy // 2), (self.width - cx + 40, cy // 2 + 80),
+                      (255, 255, 255), 3)
+        cv2.putText(frame, f"stream {self.index}  frame {self.count}", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+        self.count += 1
+        return frame
+
+
+class SyntheticCamera(PacedSource):
+    # Moving test pattern with a LatencyProbe code of its render time along the top edge
+    def __init__(self, width=640, height=480, fps=30.0, probe=None):
+        super().__init__(fps)
+        self.name = SYNTHETIC
+        self.width = width
+        self.height = height
+        self.pattern = SyntheticSource(0, width, height)
+        self.probe = probe if probe is not None else LatencyProbe()
+
+    def isOpened(self):
+        return True
+
+    def read(self, image=None):
+        now = self._wait()
+        frame = self.pattern.read()
+        self.probe.draw(frame, now)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            frame = image
+        self.timestamp = now
+        return True, frame
+
+
+def open_source(settings):
+    # Like cv2.VideoCapture, a source that failed to open is returned anyway and reports it
+    # through isOpened()
+    device = settings.device
+    if device == SYNTHETIC:
+        return SyntheticCamera(settings.width or 640, settings.height or 480, settings.fps or 30.0)
+    # Paths go to FileCamera; URLs and GStreamer pipelines are live sources
+    if isinstance(device, str) and settings.backend in ("auto", "ffmpeg") \
+            and not device.startswith(URL_PREFIXES):
+        return FileCamera(device, settings.fps)
+    return CameraSource(settings)
+
+
+def open_source_async(settings, on_open):
+    # Opens the source on a background thread and calls on_open(source, seconds) from there;
+    # some cameras take seconds to enumerate and negotiate a format
+    def run():
+        start = time.perf_counter()
+        source = open_source(settings)
+        on_open(source, time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, name="camera-open", daemon=True)
+    thread.start()
+    return thread
+
+
+class LatencyProbe:
+    # Glass-to-glass latency. The time of drawing is written into an image as a row of black
+    # and white cells: bits of the millisecond clock followed by their complement, so a frame
+    # caught halfway between two codes fails the check instead of giving a wrong reading. The
+    # code is read back from the camera frame when it reaches the screen. With a real camera,
+    # point it at a window showing the probe (render()); the cells span the full height there,
+    # so only the horizontal framing matters.
+    BITS = 20
+
+    def __init__(self, band=(0.0, 0.08), min_contrast=40):
+        # Rows of the frame (as fractions of its height) that carry the code
+        self.band = band
+        self.min_contrast = min_contrast
+        self.misreads = 0
+
+    def _bits(self, t):
+        value = int(t * 1000.0) & ((1 << self.BITS) - 1)
+        bits = [(value >> i) & 1 for i in range(self.BITS)]
+        return bits + [1 - bit for bit in bits]
+
+    def _columns(self, width):
+        return np.linspace(0, width, 2 * self.BITS + 1).astype(int)
+
+    def _rows(self, height, band):
+        y0 = int(band[0] * height)
+        return y0, max(y0 + 1, int(band[1] * height))
+
+    def draw(self, image, t, band=None):
+        height, width = image.shape[:2]
+        y0, y1 = self._rows(height, band or self.band)
+        edges = self._columns(width)
+        for bit, x0, x1 in zip(self._bits(t), edges[:-1], edges[1:]):
+            image[y0:y1, x0:x1] = 255 if bit else 0
+        return image
+
+    def render(self, width, height, t):
+        image = np.empty((height, width), dtype=np.uint8)
+        return self.draw(image, t, band=(0.0, 1.0))
+
+    def read(self, frame, now):
+        # Seconds between drawing the code and now, or None if no valid code is visible
+        height, width = frame.shape[:2]
+        y0, y1 = self._rows(height, self.band)
+        strip = frame[y0:y1]
+        if strip.ndim == 3:
+            strip = cv2.cvtColor(strip, cv2.COLOR_BGR2GRAY)
+        edges = self._columns(width)
+        # Sample the middle half of each cell, away from blurred borders
+        margin = np.diff(edges) // 4
+        cells = np.array([strip[:, x0 + m:x1 - m].mean() for x0, x1, m
+                          in zip(edges[:-1], edges[1:], margin)])
+        low, high = cells.min(), cells.max()
+        if high - low < self.min_contrast:
+            self.misreads += 1
+            return None
+        bits = (cells > 0.5 * (low + high)).astype(int)
+        value_bits, check_bits = bits[:self.BITS], bits[self.BITS:]
+        if np.any(value_bits == check_bits):
+            self.misreads += 1
+            return None
+        value = int(np.dot(value_bits, 1 << np.arange(self.BITS)))
+        now_ms = int(now * 1000.0) & ((1 << self.BITS) - 1)
+        return ((now_ms - value) % (1 << self.BITS)) / 1000.0
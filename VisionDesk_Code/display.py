@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage
+
+# Format_BGR888 (Qt 5.14+) lets QImage wrap OpenCV's BGR data directly; older Qt needs a
+# BGR->RGB pass, which is done on the already downscaled frame into a reused buffer.
+HAS_BGR888 = hasattr(QImage, "Format_BGR888")
+
+
+class DisplayConverter:
+    # Turns processed frames into QImages sized for the display widget. The frame is
+    # downscaled once in OpenCV (area interpolation) instead of copying it with rgbSwapped()
+    # and resampling with Qt.SmoothTransformation on the GUI thread. Target size and buffers
+    # are cached until the frame or widget size changes.
+    def __init__(self):
+        self._key = None
+        self._size = None
+        self._scaled = None
+        self._rgb = None
+
+    def target_size(self, frame_width, frame_height, widget_width, widget_height):
+        key = (frame_width, frame_height, widget_width, widget_height)
+        if key != self._key:
+            # Keep the aspect ratio, like Qt.KeepAspectRatio
+            scale = min(widget_width / frame_width, widget_height / frame_height)
+            width = max(1, int(frame_width * scale))
+            height = max(1, int(frame_height * scale))
+            self._key = key
+            self._size = (width, height)
+        return self._size
+
+    def display_rect(self, widget_width, widget_height):
+        # Where the image lands inside a centre-aligned widget: (x, y, width, height)
+        if self._size is None:
+            return 0, 0, widget_width, widget_height
+        width, height = self._size
+        return (widget_width - width) // 2, (widget_height - height) // 2, width, height
+
+    def _buffer(self, attr, shape):
+        buf = getattr(self, attr)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            setattr(self, attr, buf)
+        return buf
+
+    def to_qimage(self, frame, widget_width, widget_height):
+        # The QImage borrows a buffer that is reused on the next call, so turn it into a
+        # pixmap (which copies) before converting another frame.
+        frame_height, frame_width = frame.shape[:2]
+        width, height = self.target_size(frame_width, frame_height, widget_width, widget_height)
+
+        if (width, height) != (frame_width, frame_height):
+            interpolation = cv2.INTER_AREA if width < frame_width else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, (width, height), dst=self._buffer("_scaled", (height, width, 3)),
+                               interpolation=interpolation)
+        elif not frame.flags["C_CONTIGUOUS"]:
+            frame = np.ascontiguousarray(frame)
+
+        if HAS_BGR888:
+            data = frame
+            image_format = QImage.Format_BGR888
+        else:
+            data = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffer("_rgb", frame.shape))
+            image_format = QImage.Format_RGB888
+
+        image = QImage(data.data, width, height, data.strides[0], image_format)
+        # Keep the backing array alive for as long as the QImage is
+        image.ndarray = data
+        return image
+
+
+class TileComposer:
+    # Lays several frames out in a grid on one canvas at the widget's size, so the tiled
+    # view costs one resize per stream into a reused canvas and a single QImage. Each tile
+    # keeps its frame's aspect ratio; tiles without a frame yet stay dark.
+    def __init__(self, background=(44, 62, 80)):
+        self.background = background
+        self._canvas = None
+
+    @staticmethod
+    def grid(count):
+        columns = max(1, int(np.ceil(np.sqrt(count))))
+        rows = max(1, int(np.ceil(count / columns)))
+        return columns, rows
+
+    def tile_rects(self, count, width, height):
+        # (x, y, w, h) of every tile cell, row by row
+        columns, rows = self.grid(count)
+        cell_w, cell_h = width // columns, height // rows
+        return [((i % columns) * cell_w, (i // columns) * cell_h, cell_w, cell_h)
+                for i in range(count)]
+
+    def tile_at(self, count, width, height, x, y):
+        for index, (tx, ty, tw, th) in enumerate(self.tile_rects(count, width, height)):
+            if tx <= x < tx + tw and ty <= y < ty + th:
+                return index
+        return None
+
+    def compose(self, frames, labels, width, height, selected=None):
+        canvas = self._canvas
+        if canvas is None or canvas.shape[:2] != (height, width):
+            canvas = self._canvas = np.empty((height, width, 3), dtype=np.uint8)
+        canvas[:] = self.background
+        for index, (tx, ty, tw, th) in enumerate(self.tile_rects(len(frames), width, height)):
+            frame = frames[index]
+            if frame is not None and tw > 4 and th > 4:
+                if frame.ndim == 2:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+                frame_height, frame_width = frame.shape[:2]
+                scale = min((tw - 4) / frame_width, (th - 4) / frame_height)
+                w, h = max(1, int(frame_width * scale)), max(1, int(frame_height * scale))
+                x, y = tx + (tw - w) // 2, ty + (th - h) // 2
+                # Resize straight into the tile's slice of the canvas
+                view = canvas[y:y + h, x:x + w]
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+                cv2.resize(frame, (w, h), dst=view, interpolation=interpolation)
+            color = (219, 152, 52) if index == selected else (94, 73, 52)
+            cv2.rectangle(canvas, (tx, ty), (tx + tw - 1, ty + th - 1), color, 2)
+            cv2.putText(canvas, labels[index], (tx + 8, ty + 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6,
+                        (241, 240, 236), 1, cv2.LINE_AA)
+        return canvas
@@ -0,0 +1,271 @@
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+# Filter graph: a list of stage names is compiled once into stage objects with their
+# kernels and lookup tables precomputed. Adjacent point-wise stages are fused into a single
+# LUT pass, and every stage writes into an output buffer that is reused across frames.
+
+FILTER_NAMES = ["None", "Grayscale", "Sepia", "Blur", "Sharpen", "Invert", "Brighten", "Contrast"]
+STAGE_NAMES = FILTER_NAMES[1:] + ["Canny"]
+
+SEPIA_KERNEL = np.array([[0.272, 0.534, 0.131],
+                         [0.349, 0.686, 0.168],
+                         [0.393, 0.769, 0.189]], dtype=np.float32)
+
+SHARPEN_KERNEL = np.array([[-1, -1, -1],
+                           [-1,  9, -1],
+                           [-1, -1, -1]], dtype=np.float32)
+
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+
+
+def gamma_lut(gamma):
+    values = (np.arange(256) / 255.0) ** gamma * 255.0
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def contrast_lut(alpha, pivot=128):
+    values = (np.arange(256) - pivot) * alpha + pivot
+    return np.clip(np.rint(values), 0, 255).astype(np.uint8)
+
+
+def canny_gradients(src):
+    # Grey, 5x5 blur and the Sobel (aperture 3, replicated border) that cv2.Canny runs on an
+    # image, so cv2.Canny(dx, dy, ...) gives the same edges as CannyStage.edges()
+    gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    dx = cv2.Sobel(blurred, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    dy = cv2.Sobel(blurred, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    return dx, dy
+
+
+# Point-wise stages are pure per-channel lookups and can be fused with their neighbours
+POINT_LUTS = {
+    "Invert": IDENTITY_LUT[::-1].copy(),
+    "Brighten": gamma_lut(0.6),
+    "Contrast": contrast_lut(1.5),
+}
+
+
+class Stage(ABC):
+    name = ""
+    # Whether run() may be given the same array as src and dst
+    in_place = True
+    # How far (in pixels) an input change can reach in the output; 0 for point-wise stages
+    radius = 0
+
+    def __init__(self):
+        self._buffers = {}
+
+    def buffer(self, key, shape):
+        buf = self._buffers.get(key)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[key] = buf
+        return buf
+
+    @abstractmethod
+    def run(self, src, dst):
+        pass
+
+    def cache_key(self):
+        # Everything besides the input that determines the output, for ResultCache keys
+        return self.name
+
+    def run_cached(self, src, cache, input_key):
+        # Fresh output array; stages with expensive intermediates override this to cache them
+        return self.run(src, None)
+
+
+class LutStage(Stage):
+    def __init__(self, name, lut):
+        super().__init__()
+        self.name = name
+        self.lut = lut
+
+    def fused_with(self, name, lut):
+        # Applying self.lut and then lut equals a single lookup through lut[self.lut]
+        return LutStage(f"{self.name}+{name}", lut[self.lut])
+
+    def is_identity(self):
+        return np.array_equal(self.lut, IDENTITY_LUT)
+
+    def run(self, src, dst):
+        return cv2.LUT(src, self.lut, dst=dst)
+
+
+class GrayscaleStage(Stage):
+    name = "Grayscale"
+
+    def run(self, src, dst):
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self.buffer("gray", src.shape[:2]))
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=dst)
+
+
+class SepiaStage(Stage):
+    name = "Sepia"
+    in_place = False
+
+    def run(self, src, dst):
+        # uint8 output saturates inside cv2.transform, so no float clip/convert pass is needed
+        return cv2.transform(src, SEPIA_KERNEL, dst=dst)
+
+
+class BlurStage(Stage):
+    name = "Blur"
+    radius = 7
+
+    def run(self, src, dst):
+        return cv2.GaussianBlur(src, (15, 15), 0, dst=dst)
+
+
+class SharpenStage(Stage):
+    name = "Sharpen"
+    radius = 1
+
+    def run(self, src, dst):
+        return cv2.filter2D(src, -1, SHARPEN_KERNEL, dst=dst)
+
+
+class CannyStage(Stage):
+    name = "Canny"
+    # 5x5 Gaussian, 3x3 Sobel and non-maximum suppression. Hysteresis can follow a weak edge
+    # further than that, see incremental.py.
+    radius = 4
+
+    def __init__(self, low_threshold=50, high_threshold=150):
+        super().__init__()
+        # Thresholds are read per frame, so moving a slider does not recompile the chain
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+
+    def edges(self, src):
+        shape = src.shape[:2]
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY, dst=self.buffer("gray", shape))
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0, dst=self.buffer("blurred", shape))
+        return cv2.Canny(blurred, self.low_threshold, self.high_threshold,
+                         edges=self.buffer("edges", shape))
+
+    def run(self, src, dst):
+        return cv2.cvtColor(self.edges(src), cv2.COLOR_GRAY2BGR, dst=dst)
+
+    def cache_key(self):
+        return (self.name, self.low_threshold, self.high_threshold)
+
+    def run_cached(self, src, cache, input_key):
+        # Grey, blur and gradients do not depend on the thresholds; with them cached a
+        # threshold change only reruns non-maximum suppression and hysteresis
+        dx = cache.get(input_key + ("Canny.dx",))
+        dy = cache.get(input_key + ("Canny.dy",))
+        if dx is None or dy is None:
+            dx, dy = canny_gradients(src)
+            cache.put(input_key + ("Canny.dx",), dx)
+            cache.put(input_key + ("Canny.dy",), dy)
+        edges = cv2.Canny(dx, dy, self.low_threshold, self.high_threshold,
+                          edges=self.buffer("edges", dx.shape))
+        return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+
+
+STAGE_TYPES = {
+    "Grayscale": GrayscaleStage,
+    "Sepia": SepiaStage,
+    "Blur": BlurStage,
+    "Sharpen": SharpenStage,
+    "Canny": CannyStage,
+}
+
+
+class FilterChain:
+    def __init__(self, stages):
+        self.stages = stages
+
+    def __len__(self):
+        return len(self.stages)
+
+    def radius(self):
+        return sum(stage.radius for stage in self.stages)
+
+    def describe(self):
+        return " → ".join(stage.name for stage in self.stages) or "None"
+
+    def set_thresholds(self, low_threshold, high_threshold):
+        for stage in self.stages:
+            if isinstance(stage, CannyStage):
+                stage.low_threshold = low_threshold
+                stage.high_threshold = high_threshold
+
+    def apply(self, image, reuse_output=True, out=None, metrics=None):
+        # One pass per compiled stage. With reuse_output=False the last stage allocates a
+        # fresh result so it can be handed to another thread; intermediates are always reused.
+        # If out is given (e.g. an ROI view of the frame) the last stage writes straight into it.
+        # With a metrics.Metrics each stage is timed as "filter.<name>".
+        result = image
+        last = len(self.stages) - 1
+        start = time.perf_counter() if metrics is not None else 0.0
+        for index, stage in enumerate(self.stages):
+            if index < last:
+                dst = stage.buffer("out", result.shape)
+            elif out is not None:
+                if result is out and not stage.in_place:
+                    np.copyto(out, stage.run(result, stage.buffer("out", result.shape)))
+                    if metrics is not None:
+                        metrics.since(f"filter.{stage.name}", start)
+                    return out
+                dst = out
+            else:
+                dst = stage.buffer("out", result.shape) if reuse_output else None
+            result = stage.run(result, dst)
+            if metrics is not None:
+                start = metrics.since(f"filter.{stage.name}", start)
+        return result
+
+    def apply_cached(self, image, cache, key, metrics=None):
+        # key identifies the input image (e.g. clip frame plus scale and flip). The output of
+        # every stage is cached under key + the cache keys of the stages so far, so only the
+        # stages after the last cached result run again. Returns a fresh array.
+        keys = []
+        prefix = key
+        for stage in self.stages:
+            prefix = prefix + (stage.cache_key(),)
+            keys.append(prefix)
+        result = image
+        first = 0
+        for index in range(len(keys) - 1, -1, -1):
+            cached = cache.get(keys[index])
+            if cached is not None:
+                result = cached
+                first = index + 1
+                break
+        start = time.perf_counter() if metrics is not None else 0.0
+        for index in range(first, len(self.stages)):
+            stage = self.stages[index]
+            result = stage.run_cached(result, cache, keys[index - 1] if index else key)
+            cache.put(keys[index], result)
+            if metrics is not None:
+                start = metrics.since(f"filter.{stage.name}", start)
+        # Cached arrays are shared and read-only
+        return result.copy()
+
+
+def compile_chain(names, low_threshold=50, high_threshold=150):
+    stages = []
+    for name in names:
+        if name == "None":
+            continue
+        if name in POINT_LUTS:
+            if stages and isinstance(stages[-1], LutStage):
+                stages[-1] = stages[-1].fused_with(name, POINT_LUTS[name])
+                if stages[-1].is_identity():
+                    stages.pop()
+            else:
+                stages.append(LutStage(name, POINT_LUTS[name]))
+        elif name == "Canny":
+            stages.append(CannyStage(low_threshold, high_threshold))
+        elif name in STAGE_TYPES:
+            stages.append(STAGE_TYPES[name]())
+        else:
+            raise ValueError(f"Unknown filter stage: {name}")
+    return FilterChain(stages)
@@ -0,0 +1,166 @@
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+# Raw frame store: uncompressed frames at a fixed stride in memory-mapped segment files, plus
+# an index of capture timestamps. Frame i lives at a computed offset, so seeking is constant
+# time and reading is a zero-copy NumPy view. Layout of a store directory (*.vdf):
+#   meta.json          width, height, channels, fps, frames per segment
+#   index.bin          one (t_capture, wall_time) float64 pair per committed frame
+#   frames-00000.raw   frames 0 .. frames_per_segment-1, and so on
+# Segments are created at their full size and never resized while mapped (which Windows does
+# not allow), and a frame only counts once its index record is written. The index is written
+# unbuffered and the segments are shared mappings, so both reach the OS with every frame and a
+# store cut short by a crash of the app still opens with every complete frame.
+
+SUFFIX = ".vdf"
+SEGMENT_BYTES = 256 * 1024 * 1024
+INDEX_RECORD = struct.Struct("<dd")
+INDEX_DTYPE = np.dtype([("t_capture", "<f8"), ("wall_time", "<f8")])
+
+
+def is_frame_store(path):
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def segment_path(path, number):
+    return os.path.join(path, f"frames-{number:05d}.raw")
+
+
+class FrameStoreWriter:
+    # Frames can be appended with a copy (append) or written in place: begin() hands out the
+    # next slot so a capture can decode straight into it (camera.read(slot)), and end() then
+    # commits it. Safe to use from one producer thread while another thread calls close().
+    def __init__(self, path, width, height, channels=3, fps=0.0, segment_bytes=SEGMENT_BYTES):
+        if width <= 0 or height <= 0 or channels <= 0:
+            raise ValueError(f"Invalid frame size for a frame store: {width}x{height}x{channels}")
+        if is_frame_store(path):
+            raise FileExistsError(f"Frame store already exists: {path}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.shape = (height, width, channels)
+        self.stride = height * width * channels
+        self.frames_per_segment = max(1, segment_bytes // self.stride)
+        self.count = 0
+        self.rejected = 0
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"version": 1, "width": width, "height": height, "channels": channels,
+                       "dtype": "uint8", "fps": fps,
+                       "frames_per_segment": self.frames_per_segment}, f, indent=2)
+        # Unbuffered: a committed frame's record must not wait in a Python buffer
+        self._index = open(os.path.join(path, "index.bin"), "wb", buffering=0)
+        self._segment = None
+        self._segment_number = -1
+        self._slot = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _next_slot(self):
+        number, offset = divmod(self.count, self.frames_per_segment)
+        if number != self._segment_number:
+            if self._segment is not None:
+                self._segment.flush()
+            path = segment_path(self.path, number)
+            with open(path, "wb") as f:
+                f.truncate(self.stride * self.frames_per_segment)
+            self._segment = np.memmap(path, dtype=np.uint8, mode="r+",
+                                      shape=(self.frames_per_segment,) + self.shape)
+            self._segment_number = number
+        return self._segment[offset].view(np.ndarray)
+
+    def begin(self):
+        # The next free slot as a writable view, or None once closed
+        with self._cond:
+            if self._closed:
+                return None
+            self._slot = self._next_slot()
+            return self._slot
+
+    def end(self, frame, t_capture=0.0, wall_time=0.0):
+        # Commit the slot from begin(). frame is what was actually read: the slot itself
+        # (nothing to copy), another array of the same shape (copied in), or None on failure.
+        with self._cond:
+            slot, self._slot = self._slot, None
+            self._cond.notify_all()
+            if frame is None or slot is None or self._closed:
+                return False
+            # cv2 may return a new array object over the slot's memory; only copy real copies
+            if not np.may_share_memory(frame, slot):
+                if frame.shape != self.shape:
+                    self.rejected += 1
+                    return False
+                np.copyto(slot, frame)
+            self._index.write(INDEX_RECORD.pack(t_capture, wall_time))
+            self.count += 1
+            return True
+
+    def append(self, frame, t_capture=0.0, wall_time=0.0):
+        if self.begin() is None:
+            return False
+        return self.end(frame, t_capture, wall_time)
+
+    def close(self):
+        with self._cond:
+            # A producer between begin() and end() is still writing into the mapping
+            while self._slot is not None:
+                self._cond.wait()
+            if self._closed:
+                return
+            self._closed = True
+            self._index.close()
+            if self._segment is not None:
+                self._segment.flush()
+                self._segment = None
+
+
+class FrameStore:
+    # Read side. store[i] is a read-only view straight into the mapped segment file.
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        self.width = meta["width"]
+        self.height = meta["height"]
+        self.shape = (meta["height"], meta["width"], meta["channels"])
+        self.frames_per_segment = meta["frames_per_segment"]
+        records = np.fromfile(os.path.join(path, "index.bin"), dtype=INDEX_DTYPE)
+        self.t_capture = records["t_capture"]
+        self.wall_time = records["wall_time"]
+        self._fps = meta.get("fps") or 0.0
+        self._segments = {}
+
+    def __len__(self):
+        return len(self.t_capture)
+
+    @property
+    def fps(self):
+        # The recorded timestamps are the better answer when the camera did not report a rate
+        if self._fps > 0:
+            return self._fps
+        if len(self) > 1 and self.t_capture[-1] > self.t_capture[0]:
+            return (len(self) - 1) / (self.t_capture[-1] - self.t_capture[0])
+        return 30.0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Frame {index} out of range for {len(self)} frames")
+        number, offset = divmod(index, self.frames_per_segment)
+        segment = self._segments.get(number)
+        if segment is None:
+            segment = np.memmap(segment_path(self.path, number), dtype=np.uint8, mode="r",
+                                shape=(self.frames_per_segment,) + self.shape)
+            self._segments[number] = segment
+        return segment[offset].view(np.ndarray)
+
+    def frame_at(self, seconds):
+        # Index of the frame captured closest to (at or after) seconds into the recording
+        if not len(self):
+            return 0
+        index = np.searchsorted(self.t_capture - self.t_capture[0], seconds)
+        return int(min(index, len(self) - 1))
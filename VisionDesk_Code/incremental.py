@@ -0,0 +1,161 @@
+import time
+
+import cv2
+import numpy as np
+
+from filters import CannyStage
+
+# Incremental full-frame processing for static cameras. The frame is split into a tile grid
+# and compared with a reference copy of the input; only tiles whose pixels moved by more than
+# pixel_threshold are re-rendered, everything else keeps the previous output.
+#
+# Correctness at tile borders: a changed input pixel affects output pixels up to the chain's
+# radius away (sum of the stages' kernel radii), so the dirty area is grown by that radius and
+# every re-rendered block reads its input with the same radius of padding around it. Inside
+# the frame the block result then matches a full-frame run exactly; at the frame edge the
+# padding is clipped, which is what the full-frame border handling sees as well.
+# Canny's hysteresis is the exception, since an edge can be kept alive through a chain of weak
+# pixels of any length. With Canny in the chain the dirty area grows by one extra tile, and
+# every block reads one extra tile of padding so that margin is rendered from the same input a
+# full-frame run sees. That covers everything but unusually long weak chains crossing into
+# untouched tiles; those catch up the next time their own tiles change.
+#
+# The reference is only refreshed for tiles that were re-rendered because they changed, so
+# slow drift below the threshold still adds up and triggers a render eventually.
+#
+# Every frame size keeps its own reference and output, so a full-resolution snapshot or
+# recording frame in between reduced-scale previews does not force the preview to start over.
+
+
+class IncrementalRenderer:
+    def __init__(self, tile_size=64, pixel_threshold=12, min_changed=0.002, full_render_above=0.6):
+        self.tile_size = tile_size
+        # Grey-level difference that counts a pixel as changed
+        self.pixel_threshold = pixel_threshold
+        # Fraction of a tile's pixels that must change before it is re-rendered (sensor noise)
+        self.min_changed = min_changed
+        # Past this fraction of dirty tiles a single full-frame pass is cheaper
+        self.full_render_above = full_render_above
+        self.dirty_fraction = 1.0
+        self.tiles_rendered = 0
+        self.tiles_total = 0
+        # frame shape -> key of the chain its reference and output were rendered with
+        self._keys = {}
+        self._buffers = {}
+
+    def reset(self):
+        self._keys.clear()
+
+    def _buffer(self, name, shape):
+        # Keyed by shape as well, so alternating frame sizes never reallocate
+        buf = self._buffers.get((name, shape))
+        if buf is None:
+            buf = np.empty(shape, dtype=np.uint8)
+            self._buffers[(name, shape)] = buf
+        return buf
+
+    def grid(self, shape):
+        height, width = shape[:2]
+        size = self.tile_size
+        # Tile edges in pixels; the last row/column may be partial
+        ys = np.minimum(np.arange(-(-height // size) + 1) * size, height)
+        xs = np.minimum(np.arange(-(-width // size) + 1) * size, width)
+        return ys, xs
+
+    def changed_tiles(self, frame, reference):
+        # One absdiff/grey/threshold pass, then per-tile counts from the integral image
+        height, width = frame.shape[:2]
+        diff = cv2.absdiff(frame, reference, dst=self._buffer("diff", frame.shape))
+        gray = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY, dst=self._buffer("gray", (height, width)))
+        cv2.threshold(gray, self.pixel_threshold, 1, cv2.THRESH_BINARY, dst=gray)
+        integral = cv2.integral(gray)
+        ys, xs = self.grid(frame.shape)
+        corners = integral[ys][:, xs]
+        counts = corners[1:, 1:] - corners[:-1, 1:] - corners[1:, :-1] + corners[:-1, :-1]
+        areas = np.outer(np.diff(ys), np.diff(xs))
+        return counts > self.min_changed * areas
+
+    @staticmethod
+    def blocks(tiles):
+        # Merge a boolean tile grid into rectangles (row0, row1, col0, col1): runs of dirty
+        # tiles per row, extended downwards while the next row has the same run
+        open_blocks = {}
+        blocks = []
+        for row in range(tiles.shape[0] + 1):
+            runs = set()
+            if row < tiles.shape[0]:
+                cols = np.flatnonzero(tiles[row])
+                if len(cols):
+                    breaks = np.flatnonzero(np.diff(cols) > 1)
+                    starts = np.concatenate(([cols[0]], cols[breaks + 1]))
+                    ends = np.concatenate((cols[breaks], [cols[-1]])) + 1
+                    runs = set(zip(starts.tolist(), ends.tolist()))
+            for run in list(open_blocks):
+                if run not in runs:
+                    blocks.append((open_blocks.pop(run), row) + run)
+            for run in runs:
+                open_blocks.setdefault(run, row)
+        return blocks
+
+    def _full_render(self, chain, frame, key):
+        output = self._buffer("output", frame.shape)
+        np.copyto(output, chain.apply(frame, reuse_output=True))
+        np.copyto(self._buffer("reference", frame.shape), frame)
+        self._keys[frame.shape] = key
+        self.dirty_fraction = 1.0
+        return output
+
+    def apply(self, chain, frame, key, metrics=None):
+        # Returns the renderer's own output buffer for this frame size, valid until the next
+        # call with the same size. key identifies the chain and its parameters; any change
+        # forces a full render.
+        if self._keys.get(frame.shape) != key:
+            return self._full_render(chain, frame, key)
+        reference = self._buffer("reference", frame.shape)
+
+        start = time.perf_counter()
+        dirty = self.changed_tiles(frame, reference)
+        if metrics is not None:
+            start = metrics.since("incremental_diff", start)
+        count = dirty.size
+        self.tiles_total += count
+        if not dirty.any():
+            self.dirty_fraction = 0.0
+            return self._buffer("output", frame.shape)
+
+        size = self.tile_size
+        radius = chain.radius()
+        reach = -(-radius // size)
+        if any(isinstance(stage, CannyStage) for stage in chain.stages):
+            # Hysteresis margin: one more tile is re-rendered, and every block reads one more
+            # tile of input around it, so the margin tiles see the same context they would in
+            # a full-frame run instead of an edge cut off at the block border
+            reach += 1
+            radius += size
+        render = dirty
+        if reach:
+            kernel = np.ones((2 * reach + 1, 2 * reach + 1), dtype=np.uint8)
+            render = cv2.dilate(dirty.astype(np.uint8), kernel).astype(bool)
+        fraction = float(render.mean())
+        if fraction > self.full_render_above:
+            self.tiles_rendered += count
+            return self._full_render(chain, frame, key)
+        self.dirty_fraction = fraction
+        self.tiles_rendered += int(render.sum())
+
+        height, width = frame.shape[:2]
+        ys, xs = self.grid(frame.shape)
+        output = self._buffer("output", frame.shape)
+        for row0, row1, col0, col1 in self.blocks(render):
+            y0, y1, x0, x1 = ys[row0], ys[row1], xs[col0], xs[col1]
+            # Read the block with enough context that its interior is exact
+            py0, py1 = max(0, y0 - radius), min(height, y1 + radius)
+            px0, px1 = max(0, x0 - radius), min(width, x1 + radius)
+            result = chain.apply(frame[py0:py1, px0:px1], reuse_output=True)
+            output[y0:y1, x0:x1] = result[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        for row0, row1, col0, col1 in self.blocks(dirty):
+            y0, y1, x0, x1 = ys[row0], ys[row1], xs[col0], xs[col1]
+            reference[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+        if metrics is not None:
+            metrics.since("incremental_render", start)
+        return output
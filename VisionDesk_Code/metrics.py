@@ -0,0 +1,175 @@
+import csv
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-stage timing, counters and gauges for the frame pipeline. Stage timings keep a rolling
+# window of recent samples for percentiles plus lifetime count/sum; everything can be exported
+# as CSV/JSON or served in Prometheus text format on localhost.
+
+PERCENTILES = (50, 95, 99)
+
+
+class RollingStat:
+    def __init__(self, window=300):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, points=PERCENTILES):
+        # Nearest-rank percentiles over the rolling window
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {p: 0.0 for p in points}
+        last = len(ordered) - 1
+        return {p: ordered[min(last, int(round(p / 100.0 * last)))] for p in points}
+
+    def summary(self):
+        result = {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "max_ms": self.max,
+        }
+        for point, value in self.percentiles().items():
+            result[f"p{point}_ms"] = value
+        return result
+
+
+class Metrics:
+    def __init__(self, window=300):
+        self.window = window
+        self._stages = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stat = self._stages.get(stage)
+            if stat is None:
+                stat = self._stages[stage] = RollingStat(self.window)
+            stat.add(seconds * 1000.0)
+
+    def since(self, stage, start):
+        # Record the time elapsed since start (a perf_counter value) and return "now"
+        now = time.perf_counter()
+        self.record(stage, now - start)
+        return now
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_counter(self, name, value):
+        # For totals that are already counted elsewhere, e.g. queue drop counters
+        with self._lock:
+            self._counters[name] = value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "stages": {name: stat.summary() for name, stat in self._stages.items()},
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    def write_csv(self, path):
+        snap = self.snapshot()
+        columns = ["count", "mean_ms"] + [f"p{p}_ms" for p in PERCENTILES] + ["max_ms"]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name"] + columns + ["value"])
+            for name, summary in sorted(snap["stages"].items()):
+                writer.writerow(["stage", name, summary["count"]]
+                                + [f"{summary[c]:.4f}" for c in columns[1:]] + [""])
+            for name, value in sorted(snap["counters"].items()):
+                writer.writerow(["counter", name] + [""] * len(columns) + [value])
+            for name, value in sorted(snap["gauges"].items()):
+                writer.writerow(["gauge", name] + [""] * len(columns) + [value])
+
+    def prometheus_text(self, prefix="visiondesk"):
+        snap = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_ms Time spent per pipeline stage in milliseconds",
+            f"# TYPE {prefix}_stage_ms summary",
+        ]
+        for name, summary in sorted(snap["stages"].items()):
+            for point in PERCENTILES:
+                lines.append(f'{prefix}_stage_ms{{stage="{name}",quantile="{point / 100:g}"}} '
+                             f'{summary[f"p{point}_ms"]:.4f}')
+            lines.append(f'{prefix}_stage_ms_sum{{stage="{name}"}} '
+                         f'{summary["mean_ms"] * summary["count"]:.4f}')
+            lines.append(f'{prefix}_stage_ms_count{{stage="{name}"}} {summary["count"]}')
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(snap["gauges"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    # Serves /metrics (Prometheus text) and /metrics.json on localhost only
+    def __init__(self, metrics, port=9108, host="127.0.0.1"):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path == "/metrics":
+                    body = metrics.prometheus_text().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif handler.path == "/metrics.json":
+                    body = metrics.to_json().encode()
+                    content_type = "application/json"
+                else:
+                    handler.send_error(404)
+                    return
+                handler.send_response(200)
+                handler.send_header("Content-Type", content_type)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.address = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
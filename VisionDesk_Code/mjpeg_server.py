@@ -0,0 +1,145 @@
+import argparse
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from capture import SyntheticSource
+
+# Local MJPEG-over-HTTP test server, so several network streams can be exercised without
+# real cameras. Each stream is a looping video file or a synthetic moving pattern, encoded
+# once per frame no matter how many clients are connected:
+#   python mjpeg_server.py --streams 4 --port 8090
+#   python mjpeg_server.py clip1.mp4 clip2.mp4 --size 1280x720
+#   python multicam.py http://127.0.0.1:8090/stream/0.mjpg http://127.0.0.1:8090/stream/1.mjpg
+
+BOUNDARY = "visiondeskframe"
+
+
+class FileSource:
+    def __init__(self, path):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open {path}")
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            # Loop forever
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return frame if ret else None
+
+
+class EncodedStream(threading.Thread):
+    # Produces JPEG frames at a fixed rate; clients wait for the next one on the condition
+    def __init__(self, source, fps, quality):
+        super().__init__(daemon=True)
+        self.source = source
+        self.fps = fps
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.jpeg = None
+        self.sequence = 0
+        self.cond = threading.Condition()
+
+    def run(self):
+        interval = 1.0 / self.fps
+        next_time = time.perf_counter()
+        while True:
+            frame = self.source.read()
+            if frame is not None:
+                ok, data = cv2.imencode(".jpg", frame, self.params)
+                if ok:
+                    with self.cond:
+                        self.jpeg = data.tobytes()
+                        self.sequence += 1
+                        self.cond.notify_all()
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.perf_counter()
+
+    def wait_next(self, sequence, timeout=1.0):
+        with self.cond:
+            if self.sequence == sequence:
+                self.cond.wait(timeout)
+            return self.sequence, self.jpeg
+
+
+def make_handler(streams):
+    path_pattern = re.compile(r"^/stream/(\d+)\.mjpg$")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = path_pattern.match(self.path)
+            if match is None or int(match.group(1)) >= len(streams):
+                self.send_error(404)
+                return
+            stream = streams[int(match.group(1))]
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            sequence = 0
+            try:
+                while True:
+                    sequence, jpeg = stream.wait_next(sequence)
+                    if jpeg is None:
+                        continue
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                     f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve test streams as MJPEG over HTTP")
+    parser.add_argument("files", nargs="*", help="video files to loop (default: synthetic)")
+    parser.add_argument("--streams", type=int, default=4, help="synthetic streams to serve")
+    parser.add_argument("--size", type=parse_size, default=(640, 480), help="synthetic WxH")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args(argv)
+
+    if args.files:
+        sources = [FileSource(path) for path in args.files]
+    else:
+        sources = [SyntheticSource(i, *args.size) for i in range(args.streams)]
+    streams = [EncodedStream(source, args.fps, args.quality) for source in sources]
+    for stream in streams:
+        stream.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(streams))
+    server.daemon_threads = True
+    for i in range(len(streams)):
+        print(f"http://{args.host}:{args.port}/stream/{i}.mjpg")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+import argparse
+import sys
+import time
+
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QSlider,
+                             QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox,
+                             QComboBox, QGroupBox, QGridLayout, QStatusBar, QInputDialog)
+from PyQt5.QtCore import Qt, QTimer, pyqtSlot
+from PyQt5.QtGui import QPixmap, QFont
+
+from display import DisplayConverter, TileComposer
+from filters import FILTER_NAMES
+from metrics import Metrics
+from streams import StreamManager
+from style import APP_STYLESHEET
+
+# Inspection-station view: several cameras, files or stream URLs side by side, each with its
+# own Canny/filter settings, all processed by one shared worker pool.
+#   python multicam.py 0 1 2 3
+#   python multicam.py clip.mp4 http://127.0.0.1:8090/stream/0.mjpg --workers 4
+
+
+class MultiStreamApp(QMainWindow):
+    def __init__(self, sources, workers=None):
+        super().__init__()
+        self.setWindowTitle("Canny Edge Detector - Multi-Camera")
+        self.setGeometry(100, 100, 1400, 900)
+
+        self.metrics = Metrics()
+        self.manager = StreamManager(workers=workers, metrics=self.metrics)
+        for source in sources:
+            self.manager.add_stream(source, flip=False)
+        self.selected = 0
+
+        self.setup_ui()
+
+        self.tile_composer = TileComposer()
+        self.display_converter = DisplayConverter()
+        self.frame_count = 0
+        self.manager.frames_ready.connect(self.update_tiles)
+        self.manager.start()
+
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+
+    def setup_ui(self):
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QHBoxLayout(central_widget)
+
+        # Tiled view of every stream; clicking a tile selects it for the controls
+        self.display_label = QLabel()
+        self.display_label.setAlignment(Qt.AlignCenter)
+        self.display_label.setMinimumSize(960, 720)
+        self.display_label.setStyleSheet("border: 2px solid #3498db; background-color: #2c3e50;")
+        self.display_label.mousePressEvent = self.mouse_press_event
+
+        control_panel = QWidget()
+        control_layout = QVBoxLayout(control_panel)
+        control_layout.setAlignment(Qt.AlignTop)
+
+        title_label = QLabel("Multi-Camera View")
+        title_label.setFont(QFont("Arial", 16, QFont.Bold))
+        title_label.setAlignment(Qt.AlignCenter)
+        title_label.setStyleSheet("color: #3498db; margin-bottom: 20px;")
+        control_layout.addWidget(title_label)
+
+        # Streams
+        streams_group = QGroupBox("Streams")
+        streams_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        streams_layout = QVBoxLayout()
+        self.stream_combo = QComboBox()
+        self.stream_combo.currentIndexChanged.connect(self.select_stream)
+        streams_layout.addWidget(self.stream_combo)
+        stream_buttons = QHBoxLayout()
+        self.add_stream_button = QPushButton("Add Stream")
+        self.add_stream_button.clicked.connect(self.add_stream)
+        stream_buttons.addWidget(self.add_stream_button)
+        self.remove_stream_button = QPushButton("Remove Stream")
+        self.remove_stream_button.clicked.connect(self.remove_stream)
+        stream_buttons.addWidget(self.remove_stream_button)
+        streams_layout.addLayout(stream_buttons)
+        streams_group.setLayout(streams_layout)
+        control_layout.addWidget(streams_group)
+
+        # Settings of the selected stream
+        settings_group = QGroupBox("Selected Stream Settings")
+        settings_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        settings_layout = QVBoxLayout()
+
+        self.canny_checkbox = QCheckBox("Enable Canny Edge Detection")
+        self.canny_checkbox.toggled.connect(self.toggle_canny)
+        settings_layout.addWidget(self.canny_checkbox)
+
+        threshold_layout = QGridLayout()
+        threshold_layout.addWidget(QLabel("Low Threshold:"), 0, 0)
+        self.low_threshold_slider = QSlider(Qt.Horizontal)
+        self.low_threshold_slider.setRange(0, 255)
+        self.low_threshold_slider.valueChanged.connect(self.update_low_threshold)
+        threshold_layout.addWidget(self.low_threshold_slider, 0, 1)
+        self.low_threshold_value = QLabel("0")
+        threshold_layout.addWidget(self.low_threshold_value, 0, 2)
+        threshold_layout.addWidget(QLabel("High Threshold:"), 1, 0)
+        self.high_threshold_slider = QSlider(Qt.Horizontal)
+        self.high_threshold_slider.setRange(0, 255)
+        self.high_threshold_slider.valueChanged.connect(self.update_high_threshold)
+        threshold_layout.addWidget(self.high_threshold_slider, 1, 1)
+        self.high_threshold_value = QLabel("0")
+        threshold_layout.addWidget(self.high_threshold_value, 1, 2)
+        settings_layout.addLayout(threshold_layout)
+
+        settings_layout.addWidget(QLabel("Select Filter:"))
+        self.filter_combo = QComboBox()
+        self.filter_combo.addItems(FILTER_NAMES)
+        self.filter_combo.currentTextChanged.connect(self.change_filter)
+        settings_layout.addWidget(self.filter_combo)
+
+        self.flip_checkbox = QCheckBox("Mirror Image")
+        self.flip_checkbox.toggled.connect(self.toggle_flip)
+        settings_layout.addWidget(self.flip_checkbox)
+
+        settings_layout.addWidget(QLabel("Processing Scale:"))
+        self.scale_combo = QComboBox()
+        self.scale_combo.addItems(["100%", "75%", "50%", "25%"])
+        self.scale_combo.currentTextChanged.connect(self.change_processing_scale)
+        settings_layout.addWidget(self.scale_combo)
+
+        settings_group.setLayout(settings_layout)
+        control_layout.addWidget(settings_group)
+
+        # Statistics
+        info_group = QGroupBox("App Statistics")
+        info_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        info_layout = QVBoxLayout()
+        self.fps_label = QLabel("Display FPS: 0")
+        info_layout.addWidget(self.fps_label)
+        self.pool_label = QLabel(f"Worker Threads: {self.manager.pool.workers}")
+        info_layout.addWidget(self.pool_label)
+        self.streams_label = QLabel("Streams: waiting for frames")
+        self.streams_label.setFont(QFont("Courier New", 8))
+        info_layout.addWidget(self.streams_label)
+        info_group.setLayout(info_layout)
+        control_layout.addWidget(info_group)
+
+        main_layout.addWidget(self.display_label, 3)
+        main_layout.addWidget(control_panel, 1)
+
+        self.status_bar = QStatusBar()
+        self.setStatusBar(self.status_bar)
+        self.status_bar.showMessage("Ready")
+
+        self.refresh_stream_list()
+
+    def refresh_stream_list(self):
+        self.stream_combo.blockSignals(True)
+        self.stream_combo.clear()
+        self.stream_combo.addItems([f"{i + 1}: {s.label}" for i, s in enumerate(self.manager.streams)])
+        self.selected = min(self.selected, max(0, len(self.manager.streams) - 1))
+        self.stream_combo.setCurrentIndex(self.selected)
+        self.stream_combo.blockSignals(False)
+        self.load_stream_settings()
+
+    def selected_stream(self):
+        streams = self.manager.streams
+        return streams[self.selected] if self.selected < len(streams) else None
+
+    def load_stream_settings(self):
+        # Show the selected stream's settings without writing them back through the slots
+        stream = self.selected_stream()
+        if stream is None:
+            return
+        processor = stream.processor
+        widgets = (self.canny_checkbox, self.low_threshold_slider, self.high_threshold_slider,
+                   self.filter_combo, self.flip_checkbox, self.scale_combo)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.canny_checkbox.setChecked(processor.canny_active)
+        self.low_threshold_slider.setValue(processor.low_threshold)
+        self.low_threshold_value.setText(str(processor.low_threshold))
+        self.high_threshold_slider.setValue(processor.high_threshold)
+        self.high_threshold_value.setText(str(processor.high_threshold))
+        self.filter_combo.setCurrentText(processor.current_filter)
+        self.flip_checkbox.setChecked(processor.flip)
+        self.scale_combo.setCurrentText(f"{int(processor.processing_scale * 100)}%")
+        for widget in widgets:
+            widget.blockSignals(False)
+
+    @pyqtSlot()
+    def update_tiles(self):
+        self.manager.take_updated()
+        self.frame_count += 1
+        start = time.perf_counter()
+        streams = self.manager.streams
+        frames = [s.latest.frame if s.latest is not None else None for s in streams]
+        labels = [f"{i + 1}: {s.error or s.label}" for i, s in enumerate(streams)]
+
+        area = self.display_label.contentsRect()
+        canvas = self.tile_composer.compose(frames, labels, area.width(), area.height(),
+                                            selected=self.selected)
+        # The canvas already has the widget's size, so this only wraps it
+        q_img = self.display_converter.to_qimage(canvas, area.width(), area.height())
+        self.display_label.setPixmap(QPixmap.fromImage(q_img))
+        self.metrics.since("display", start)
+
+    def update_stats(self):
+        self.fps_label.setText(f"Display FPS: {self.frame_count}")
+        self.frame_count = 0
+        self.manager.update_metrics()
+        lines = [f"{'#':<3}{'proc':>6}{'drop':>7}{'p95 ms':>8}"]
+        stages = self.metrics.snapshot()["stages"]
+        for i, stream in enumerate(self.manager.streams):
+            summary = stages.get(f"process.{stream.key}")
+            p95 = summary["p95_ms"] if summary else 0.0
+            lines.append(f"{i + 1:<3}{stream.frames_processed:>6}{stream.frames_dropped:>7}"
+                         f"{p95:>8.1f}")
+        lines.append(f"Pixel rate: {self.manager.pixel_rate() / 1e6:.1f} Mpx/s")
+        self.streams_label.setText("\n".join(lines))
+
+    def mouse_press_event(self, event):
+        area = self.display_label.contentsRect()
+        index = self.tile_composer.tile_at(len(self.manager.streams), area.width(), area.height(),
+                                           event.x() - area.x(), event.y() - area.y())
+        if index is not None:
+            self.stream_combo.setCurrentIndex(index)
+
+    @pyqtSlot(int)
+    def select_stream(self, index):
+        if index >= 0:
+            self.selected = index
+            self.load_stream_settings()
+
+    @pyqtSlot()
+    def add_stream(self):
+        text, ok = QInputDialog.getText(self, "Add Stream",
+                                        "Camera index, video file or stream URL:")
+        if ok and text.strip():
+            stream = self.manager.add_stream(text, flip=False)
+            self.selected = len(self.manager.streams) - 1
+            self.refresh_stream_list()
+            self.status_bar.showMessage(f"Added {stream.label}")
+
+    @pyqtSlot()
+    def remove_stream(self):
+        stream = self.selected_stream()
+        if stream is not None:
+            self.manager.remove_stream(stream)
+            self.refresh_stream_list()
+            self.status_bar.showMessage(f"Removed {stream.label}")
+
+    @pyqtSlot(bool)
+    def toggle_canny(self, checked):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.canny_active = checked
+
+    @pyqtSlot(int)
+    def update_low_threshold(self, value):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.low_threshold = value
+        self.low_threshold_value.setText(str(value))
+
+    @pyqtSlot(int)
+    def update_high_threshold(self, value):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.high_threshold = value
+        self.high_threshold_value.setText(str(value))
+
+    @pyqtSlot(str)
+    def change_filter(self, filter_name):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.current_filter = filter_name
+
+    @pyqtSlot(bool)
+    def toggle_flip(self, checked):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.flip = checked
+
+    @pyqtSlot(str)
+    def change_processing_scale(self, text):
+        stream = self.selected_stream()
+        if stream is not None:
+            stream.processor.processing_scale = int(text.rstrip("%")) / 100.0
+
+    def closeEvent(self, event):
+        self.stats_timer.stop()
+        self.manager.stop()
+        event.accept()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tiled multi-camera Canny viewer")
+    parser.add_argument("sources", nargs="*", default=["0"],
+                        help="camera indices, video files or stream URLs")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="shared processing threads (0 = one per core)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    app = QApplication(sys.argv[:1])
+    app.setStyle('Fusion')
+    app.setStyleSheet(APP_STYLESHEET)
+
+    window = MultiStreamApp(args.sources, workers=args.workers or None)
+    window.show()
+    sys.exit(app.exec_())
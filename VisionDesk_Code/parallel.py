@@ -0,0 +1,158 @@
+import multiprocessing as mp
+import os
+import queue
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from processing import FrameProcessor
+
+# Multi-process engine for recorded footage. The parent decodes frames straight into a
+# shared-memory ring of frame slots; workers process a chunk of slots in place and only
+# small (chunk_id, first_slot, count) messages travel through the queues, so no pixels are
+# pickled. Chunks are handed to the sink strictly in input order, which makes the output
+# identical to running FrameProcessor over the file on a single thread. That only holds for
+# settings that treat every frame on its own: options that carry state from frame to frame
+# (STATEFUL_SETTINGS) would get a separate copy in every worker, so they are rejected.
+
+STATEFUL_SETTINGS = ("auto_threshold", "incremental")
+
+
+def _data_address(array):
+    return array.__array_interface__["data"][0]
+
+
+def _worker(shm_name, ring_shape, settings, draw_roi, tasks, done):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        # Workers share the cores with each other, so keep OpenCV from spawning its own pool
+        cv2.setNumThreads(1)
+        processor = FrameProcessor(reuse_buffers=True, **settings)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            chunk_id, first_slot, count = task
+            for slot in range(first_slot, first_slot + count):
+                frame = ring[slot]
+                result = processor.process(frame, draw_roi=draw_roi)
+                if result is not frame:
+                    np.copyto(frame, result)
+            done.put(chunk_id)
+    finally:
+        # Views into the segment must be gone before it can be closed
+        frame = result = ring = None
+        shm.close()
+
+
+class ParallelVideoEngine:
+    def __init__(self, settings=None, workers=None, chunk_size=8, chunks_in_flight=None,
+                 draw_roi=False):
+        # settings are FrameProcessor keyword arguments (thresholds, filter, ROI, flip)
+        self.settings = dict(settings or {})
+        for name in STATEFUL_SETTINGS:
+            if self.settings.get(name) is not None:
+                raise ValueError(f"{name} depends on earlier frames and cannot run in parallel")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.chunks_in_flight = chunks_in_flight or 2 * self.workers
+        self.draw_roi = draw_roi
+
+    def run(self, source, sink, max_frames=None):
+        # sink(frame) is called once per frame in input order. The frame is a view into
+        # shared memory that is recycled after the call returns, so copy it to keep it.
+        capture = cv2.VideoCapture(source)
+        ret, first = capture.read()
+        if not ret:
+            capture.release()
+            return 0
+
+        ring_shape = (self.chunk_size * self.chunks_in_flight,) + first.shape
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+        ring = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+
+        # Spawn rather than fork: forking after OpenCV has started threads can deadlock
+        ctx = mp.get_context("spawn")
+        tasks = ctx.Queue()
+        done = ctx.Queue()
+        procs = [ctx.Process(target=_worker, daemon=True,
+                             args=(shm.name, ring_shape, self.settings, self.draw_roi, tasks, done))
+                 for _ in range(self.workers)]
+        for proc in procs:
+            proc.start()
+
+        free_blocks = deque(range(self.chunks_in_flight))
+        in_flight = {}  # chunk_id -> (first_slot, count)
+        finished = set()
+        next_chunk = 0
+        next_output = 0
+        decoded = 0
+        carry = first
+        view = frame = None
+        exhausted = False
+        try:
+            while True:
+                # Decode into every free block and dispatch it as one chunk
+                while free_blocks and not exhausted:
+                    first_slot = free_blocks.popleft() * self.chunk_size
+                    count = 0
+                    while count < self.chunk_size:
+                        if max_frames is not None and decoded >= max_frames:
+                            exhausted = True
+                            break
+                        view = ring[first_slot + count]
+                        if carry is not None:
+                            view[...] = carry
+                            carry = None
+                        else:
+                            ret, frame = capture.read(view)
+                            if not ret:
+                                exhausted = True
+                                break
+                            if _data_address(frame) != _data_address(view):
+                                view[...] = frame
+                        count += 1
+                        decoded += 1
+                    if count == 0:
+                        free_blocks.appendleft(first_slot // self.chunk_size)
+                        break
+                    tasks.put((next_chunk, first_slot, count))
+                    in_flight[next_chunk] = (first_slot, count)
+                    next_chunk += 1
+
+                if not in_flight:
+                    break
+
+                finished.add(self._wait_done(done, procs))
+
+                # Release finished chunks to the sink in order and recycle their slots
+                while next_output in finished:
+                    finished.remove(next_output)
+                    first_slot, count = in_flight.pop(next_output)
+                    for slot in range(first_slot, first_slot + count):
+                        sink(ring[slot])
+                    free_blocks.append(first_slot // self.chunk_size)
+                    next_output += 1
+        finally:
+            for _ in procs:
+                tasks.put(None)
+            for proc in procs:
+                proc.join(timeout=5.0)
+                if proc.is_alive():
+                    proc.terminate()
+            capture.release()
+            view = frame = ring = None
+            shm.close()
+            shm.unlink()
+        return decoded
+
+    def _wait_done(self, done, procs):
+        while True:
+            try:
+                return done.get(timeout=1.0)
+            except queue.Empty:
+                if not all(proc.is_alive() for proc in procs):
+                    raise RuntimeError("A parallel processing worker exited unexpectedly")
@@ -0,0 +1,283 @@
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class FramePacket:
+    # One captured frame travelling through the pipeline, with its timestamps
+    __slots__ = ("index", "raw", "frame", "scale", "t_capture", "t_processed", "t_displayed",
+                 "wall_time", "frame_id")
+
+    def __init__(self, index, raw, t_capture):
+        self.index = index
+        self.raw = raw
+        self.frame = None
+        # Processing scale of frame relative to raw (see FrameProcessor.processing_scale)
+        self.scale = 1.0
+        self.t_capture = t_capture
+        # Wall-clock capture time, for naming saved frames
+        self.wall_time = time.time()
+        self.t_processed = None
+        self.t_displayed = None
+        # Stable identity of the source frame (e.g. clip frame), None for live cameras
+        self.frame_id = None
+
+    def latency_ms(self):
+        end = self.t_displayed if self.t_displayed is not None else self.t_processed
+        if end is None:
+            return None
+        return (end - self.t_capture) * 1000.0
+
+
+class DropOldestQueue:
+    # Bounded queue that never blocks the producer: when full, the oldest item is dropped
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def get_latest(self):
+        # Return the newest item and discard anything older (counted as dropped)
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class FrameHistory:
+    # Ring buffer of the most recent processed packets. Raw frames are only kept for the
+    # newest raw_capacity packets, which bounds memory while still allowing a full-resolution
+    # re-render of the latest frames.
+    def __init__(self, capacity=60, raw_capacity=4):
+        self.raw_capacity = raw_capacity
+        self._items = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, packet):
+        with self._lock:
+            self._items.append(packet)
+            if len(self._items) > self.raw_capacity:
+                self._items[-self.raw_capacity - 1].raw = None
+
+    def latest(self):
+        with self._lock:
+            return self._items[-1] if self._items else None
+
+    def last(self, count=None):
+        # Oldest first
+        with self._lock:
+            items = list(self._items)
+        return items if count is None else items[-count:]
+
+    def since(self, t_capture):
+        with self._lock:
+            return [p for p in self._items if p.t_capture >= t_capture]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+class CaptureThread(threading.Thread):
+    def __init__(self, camera, out_queue, metrics=None):
+        super().__init__(name="capture", daemon=True)
+        self.camera = camera
+        self.out_queue = out_queue
+        self.metrics = metrics
+        self.frames_captured = 0
+        self.read_failures = 0
+        # Optional framestore.FrameStoreWriter; frames are then decoded straight into it
+        self.store = None
+        # Optional scheduler.AdaptiveScheduler, told about every frame before it is queued
+        self.scheduler = None
+        self._running = threading.Event()
+
+    def run(self):
+        self._running.set()
+        while self._running.is_set():
+            start = time.perf_counter()
+            # Read once per frame, so a source swapped in by set_source() takes effect cleanly
+            camera = self.camera
+            if camera is None:
+                # No source yet, e.g. while the camera is still being opened
+                time.sleep(0.01)
+                continue
+            store = self.store
+            slot = store.begin() if store is not None else None
+            ret, frame = camera.read(slot) if slot is not None else camera.read()
+            if not ret:
+                if slot is not None:
+                    store.end(None)
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+            t_read = time.perf_counter()
+            # Sources from capture.py timestamp the frame's arrival, which can be well before
+            # read() returned (decoding, or a frame that sat in the driver's queue)
+            t_capture = getattr(camera, "timestamp", None) or t_read
+            if self.metrics is not None:
+                self.metrics.record("capture", t_read - start)
+                self.metrics.record("frame_age_at_read", t_read - t_capture)
+            packet = FramePacket(self.frames_captured, frame, t_capture)
+            # Sources such as playback.ClipSource say which frame they returned
+            packet.frame_id = getattr(camera, "frame_id", None)
+            if slot is not None:
+                store.end(frame, t_capture, packet.wall_time)
+            scheduler = self.scheduler
+            if scheduler is not None:
+                scheduler.arrived(t_capture)
+            self.out_queue.put(packet)
+            self.frames_captured += 1
+
+    def stop(self):
+        self._running.clear()
+
+
+class ProcessingThread(threading.Thread):
+    def __init__(self, process_fn, in_queue, out_queue, on_ready, history=None, metrics=None):
+        super().__init__(name="processing", daemon=True)
+        self.process_fn = process_fn
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.on_ready = on_ready
+        self.history = history
+        self.metrics = metrics
+        # Optional scheduler.AdaptiveScheduler, which may drop frames or skip display updates
+        self.scheduler = None
+        self.frames_processed = 0
+        self._running = threading.Event()
+
+    def run(self):
+        self._running.set()
+        while self._running.is_set():
+            packet = self.in_queue.get(timeout=0.1)
+            if packet is None:
+                continue
+            start = time.perf_counter()
+            scheduler = self.scheduler
+            if scheduler is not None and not scheduler.admit(packet, start):
+                continue
+            # process_fn fills in packet.frame (and packet.scale if it resizes)
+            self.process_fn(packet)
+            packet.t_processed = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.record("queue_wait", start - packet.t_capture)
+                self.metrics.record("process", packet.t_processed - start)
+            if scheduler is not None:
+                scheduler.processed(packet.t_processed - start)
+            self.frames_processed += 1
+            if self.history is not None:
+                self.history.append(packet)
+            self.out_queue.put(packet)
+            if scheduler is None or scheduler.should_display(packet.t_processed):
+                self.on_ready()
+
+    def stop(self):
+        self._running.clear()
+
+
+class FramePipeline(QObject):
+    # Capture -> processing -> display, joined by drop-oldest queues.
+    # frame_ready is emitted from the processing thread and delivered to the GUI thread
+    # through a queued connection; the display slot then calls take_latest().
+    # Every processed packet also lands in history, so snapshots and pre-trigger recording
+    # can reuse frames without touching the camera or reprocessing.
+    frame_ready = pyqtSignal()
+
+    def __init__(self, camera, process_fn, queue_size=2, history_size=60, metrics=None):
+        super().__init__()
+        self.metrics = metrics
+        self.capture_queue = DropOldestQueue(queue_size)
+        self.display_queue = DropOldestQueue(queue_size)
+        self.history = FrameHistory(history_size)
+        self.capture_thread = CaptureThread(camera, self.capture_queue, metrics)
+        self.processing_thread = ProcessingThread(process_fn, self.capture_queue,
+                                                  self.display_queue, self._notify, self.history,
+                                                  metrics)
+        # Only one frame_ready is in flight at a time so the GUI event queue cannot pile up
+        self._notify_pending = threading.Event()
+
+    def start(self):
+        self.capture_thread.start()
+        self.processing_thread.start()
+
+    def stop(self):
+        self.capture_thread.stop()
+        self.processing_thread.stop()
+        self.capture_queue.close()
+        self.display_queue.close()
+        for thread in (self.capture_thread, self.processing_thread):
+            if thread.is_alive():
+                thread.join(timeout=1.0)
+
+    def _notify(self):
+        if not self._notify_pending.is_set():
+            self._notify_pending.set()
+            self.frame_ready.emit()
+
+    def set_source(self, camera):
+        # Switch the capture thread to another source, e.g. a ClipSource and back, or None to
+        # idle. The old source may still be inside read(), so the caller must not release it
+        # right away.
+        self.capture_thread.camera = camera
+
+    def set_store(self, writer):
+        # Start (writer) or stop (None) recording raw frames at the capture thread. Stopping
+        # does not wait for a frame in flight; writer.close() does.
+        self.capture_thread.store = writer
+
+    def set_scheduler(self, scheduler):
+        # Enable (AdaptiveScheduler) or disable (None) adaptive scheduling
+        self.capture_thread.scheduler = scheduler
+        self.processing_thread.scheduler = scheduler
+
+    def take_latest(self):
+        self._notify_pending.clear()
+        return self.display_queue.get_latest()
+
+    def dropped_frames(self):
+        return self.capture_queue.dropped + self.display_queue.dropped
+
+    def update_metrics(self):
+        # Copy queue depths and running totals into the metrics registry
+        if self.metrics is None:
+            return
+        self.metrics.set_gauge("capture_queue_depth", len(self.capture_queue))
+        self.metrics.set_gauge("display_queue_depth", len(self.display_queue))
+        self.metrics.set_counter("frames_captured", self.capture_thread.frames_captured)
+        self.metrics.set_counter("frames_processed", self.processing_thread.frames_processed)
+        self.metrics.set_counter("capture_read_failures", self.capture_thread.read_failures)
+        self.metrics.set_counter("dropped_before_processing", self.capture_queue.dropped)
+        self.metrics.set_counter("dropped_before_display", self.display_queue.dropped)
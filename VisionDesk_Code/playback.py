@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import cv2
+
+from framestore import FrameStore, is_frame_store
+
+# Recorded-footage sources for tuning on known scenes. They read like a cv2.VideoCapture, so
+# the capture thread can use them in place of the camera. Playback is paced to the recording's
+# frame rate, can be paused and seeked, and loops at the end. frame_id identifies the frame
+# last returned, so results can be cached per recorded frame. While paused the current frame
+# is handed out again, which lets processing pick up slider changes; with a ResultCache those
+# repeats only redo what the change affects.
+
+
+class PlaybackSource(ABC):
+    # Subclasses set path, name, fps and frame_count and implement _load(index)
+    def __init__(self, loop=True):
+        self.loop = loop
+        self.paused = False
+        self.frame_id = None
+        self._frame = None
+        self._seek_to = None
+        self._next_time = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _load(self, index):
+        pass
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return self.frame_count
+        return 0.0
+
+    def isOpened(self):
+        return True
+
+    @property
+    def index(self):
+        return self.frame_id[1] if self.frame_id is not None else 0
+
+    def seek(self, index):
+        with self._lock:
+            last = max(0, self.frame_count - 1)
+            self._seek_to = min(max(0, int(index)), last)
+
+    def read(self, image=None):
+        # image is accepted for VideoCapture compatibility; recorded frames are never copied
+        delay = self._next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_time = max(self._next_time + 1.0 / self.fps, time.perf_counter())
+        with self._lock:
+            if self._seek_to is not None:
+                index, self._seek_to = self._seek_to, None
+            elif self.paused and self._frame is not None:
+                return True, self._frame
+            else:
+                index = self.index + 1 if self.frame_id is not None else 0
+            frame = self._load(index)
+            if frame is None and self.loop and index > 0:
+                index = 0
+                frame = self._load(index)
+            if frame is None:
+                return False, None
+            self._frame = frame
+            self.frame_id = (self.path, index)
+            return True, frame
+
+    def release(self):
+        pass
+
+
+class ClipSource(PlaybackSource):
+    # A video file. Seeking has to decode from the previous keyframe, so decoded frames go
+    # into the cache as well and replays skip decoding.
+    def __init__(self, path, cache=None, loop=True):
+        super().__init__(loop)
+        self.path = path
+        self.name = os.path.basename(path)
+        self.cache = cache
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Could not open {path}")
+        self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        # Index of the next frame the decoder will produce
+        self._position = 0
+
+    def _load(self, index):
+        key = (self.path, index, "decoded")
+        if self.cache is not None:
+            frame = self.cache.get(key)
+            if frame is not None:
+                return frame
+        if index != self._position:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        self._position = index + 1
+        if self.cache is not None:
+            self.cache.put(key, frame)
+        return frame
+
+    def release(self):
+        with self._lock:
+            self.capture.release()
+
+
+class FrameStoreSource(PlaybackSource):
+    # A raw frame store (framestore.py): exact, constant-time seeks and zero-copy frames, so
+    # nothing needs caching before the filter stages
+    def __init__(self, path, loop=True):
+        super().__init__(loop)
+        self.store = FrameStore(path)
+        self.path = path
+        self.name = self.store.name
+        self.width = self.store.width
+        self.height = self.store.height
+        self.fps = self.store.fps
+        self.frame_count = len(self.store)
+
+    def _load(self, index):
+        if index >= self.frame_count:
+            return None
+        return self.store[index]
+
+
+def open_playback(path, cache=None):
+    if is_frame_store(path):
+        return FrameStoreSource(path)
+    return ClipSource(path, cache=cache)
@@ -0,0 +1,260 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from filters import compile_chain
+
+# GUI-free processing core shared by the desktop app and the batch command line
+
+
+class RoiRegion:
+    # A rectangle (x1, y1, x2, y2) in frame coordinates with its own filter stages.
+    # filters=None means the region follows the processor's main chain.
+    def __init__(self, rect, filters=None):
+        self.rect = tuple(rect)
+        self.filters = list(filters) if filters is not None else None
+        self._chain = None
+
+    def chain(self, processor):
+        if self.filters is None:
+            return processor.chain()
+        if self._chain is None:
+            self._chain = compile_chain(self.filters)
+        self._chain.set_thresholds(processor.low_threshold, processor.high_threshold)
+        return self._chain
+
+
+class ScaleController:
+    # Picks a power-of-two pyramid level (1, 1/2, 1/4, ...) so that processing keeps up with
+    # target_fps. Each level has about a quarter of the pixels of the one above, which is used
+    # to predict the cost after a switch; cooldown frames stop it from oscillating.
+    def __init__(self, target_fps=30.0, max_level=3, smoothing=0.1, cooldown=15):
+        self.target_fps = target_fps
+        self.max_level = max_level
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.level = 0
+        self.average = None
+        self._wait = 0
+
+    @property
+    def scale(self):
+        return 0.5 ** self.level
+
+    def update(self, elapsed):
+        if self.average is None:
+            self.average = elapsed
+        else:
+            self.average += self.smoothing * (elapsed - self.average)
+        if self._wait > 0:
+            self._wait -= 1
+            return
+        budget = 1.0 / self.target_fps
+        if self.average > budget and self.level < self.max_level:
+            self.level += 1
+            self.average /= 4.0
+            self._wait = self.cooldown
+        elif self.level > 0 and self.average * 4.0 < 0.8 * budget:
+            self.level -= 1
+            self.average *= 4.0
+            self._wait = self.cooldown
+
+
+class FrameProcessor:
+    # Canny / ROI / filter chain applied to one BGR frame at a time.
+    # filters is a list of stage names (see filters.STAGE_NAMES) run in order; enabling Canny
+    # appends a Canny stage, so the selected filter now runs before Canny and feeds it instead
+    # of being replaced by it. The chain is recompiled only when that list changes.
+    # rois is a list of RoiRegion; when non-empty only those rectangles are processed, each
+    # composited in place on its slice of the frame so the cost follows the ROI area.
+    # ROI rectangles are always given in full-resolution frame coordinates. processing_scale
+    # (or scale_controller, when set) shrinks the frame before processing; the output is then
+    # at that reduced size unless full_resolution=True is passed to process().
+    # With reuse_buffers=True the output array is allocated once and overwritten on every
+    # call, so the caller must consume the result before the next frame.
+    # metrics, when set to a metrics.Metrics, receives per-stage timings for every frame.
+    # incremental, when set to an incremental.IncrementalRenderer, re-renders only the tiles
+    # of a full-frame chain that changed since the previous frame (for static cameras).
+    # cache, when set to a cache.ResultCache, memoizes full-frame stage results for frames
+    # passed to process() with a frame_id (recorded footage; live frames are never repeated).
+    # auto_threshold, when set to a tuning.AutoThreshold, replaces low/high_threshold with
+    # values measured on every frame.
+    def __init__(self, low_threshold=50, high_threshold=150, canny_active=False,
+                 current_filter="None", roi=None, flip=False, reuse_buffers=False, filters=None,
+                 rois=None, processing_scale=1.0, scale_controller=None, metrics=None,
+                 incremental=None, cache=None, auto_threshold=None):
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.canny_active = canny_active
+        self.filters = list(filters) if filters is not None else []
+        if filters is None:
+            self.current_filter = current_filter
+        self.rois = list(rois) if rois is not None else []
+        if rois is None:
+            self.roi = roi
+        self.flip = flip
+        self.processing_scale = processing_scale
+        self.scale_controller = scale_controller
+        self.last_scale = 1.0
+        self.reuse_buffers = reuse_buffers
+        self.metrics = metrics
+        self.incremental = incremental
+        self.cache = cache
+        self.auto_threshold = auto_threshold
+        self._buffers = {}
+        self._chain = None
+        self._chain_key = None
+        # The compiled chain owns its intermediate buffers, so one frame at a time
+        self._lock = threading.Lock()
+
+    @property
+    def current_filter(self):
+        # Single-filter view of the chain, as used by the filter combo box
+        return self.filters[-1] if self.filters else "None"
+
+    @current_filter.setter
+    def current_filter(self, filter_name):
+        self.filters = [] if filter_name == "None" else [filter_name]
+
+    @property
+    def roi(self):
+        # Single-ROI view used by the mouse selection: the first region's rectangle
+        return self.rois[0].rect if self.rois else None
+
+    @roi.setter
+    def roi(self, rect):
+        self.rois = [] if rect is None else [RoiRegion(rect)]
+
+    def stage_names(self):
+        names = list(self.filters)
+        if self.canny_active and "Canny" not in names:
+            names.append("Canny")
+        return names
+
+    def chain(self):
+        key = tuple(self.stage_names())
+        if key != self._chain_key:
+            self._chain = compile_chain(key, self.low_threshold, self.high_threshold)
+            self._chain_key = key
+        self._chain.set_thresholds(self.low_threshold, self.high_threshold)
+        return self._chain
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        if not self.reuse_buffers:
+            return None
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    def current_scale(self):
+        controller = self.scale_controller
+        if controller is not None:
+            return controller.scale
+        return self.processing_scale
+
+    def clamp_roi(self, rect, shape, scale=1.0):
+        x1, y1, x2, y2 = (int(round(v * scale)) for v in rect)
+        # Ensure coordinates are within frame bounds
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(shape[1], x2), min(shape[0], y2)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def process(self, frame, draw_roi=True, full_resolution=False, frame_id=None):
+        with self._lock:
+            controller = None if full_resolution else self.scale_controller
+            start = time.perf_counter()
+            result = self._process(frame, draw_roi, 1.0 if full_resolution else self.current_scale(),
+                                   frame_id)
+            if controller is not None:
+                controller.update(time.perf_counter() - start)
+            return result
+
+    def _process(self, frame, draw_roi, scale, frame_id=None):
+        metrics = self.metrics
+        chain = self.chain()
+        rois = self.rois
+        incremental = self.incremental
+        cache = self.cache
+        source = frame
+        start = time.perf_counter()
+        if scale != 1.0:
+            # Shrink first so the flip and every filter stage touch fewer pixels
+            height, width = frame.shape[:2]
+            size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            frame = cv2.resize(frame, size, dst=self._buffer("scaled", (size[1], size[0], 3)),
+                               interpolation=cv2.INTER_AREA)
+            if metrics is not None:
+                start = metrics.since("scale", start)
+        if self.flip:
+            # Flip horizontally for selfie view
+            frame = cv2.flip(frame, 1, dst=self._buffer("flipped", frame.shape))
+            if metrics is not None:
+                start = metrics.since("flip", start)
+        auto = self.auto_threshold
+        if auto is not None:
+            # Measured on the frame as it enters the chain; ROI chains read them from here too
+            self.low_threshold, self.high_threshold = auto.update(frame)
+            chain.set_thresholds(self.low_threshold, self.high_threshold)
+            if metrics is not None:
+                start = metrics.since("auto_threshold", start)
+        if frame is source and rois and (not self.reuse_buffers or not frame.flags.writeable):
+            # The ROI path edits the frame in place; keep the caller's frame intact. Cached
+            # clip frames and frame store pages are read-only, so those are copied even when
+            # the caller lets its frame be reused.
+            frame = frame.copy()
+        self.last_scale = scale
+
+        if rois:
+            self.composite_rois(frame, rois, draw_roi, scale)
+            if metrics is not None:
+                metrics.since("roi_composite", start)
+        elif len(chain) and cache is not None and frame_id is not None:
+            # Everything before the chain is part of the key: frame, scale and flip
+            frame = chain.apply_cached(frame, cache, (frame_id, scale, self.flip), metrics)
+        elif len(chain) and incremental is not None:
+            # Only the tiles that changed are re-rendered; the rest is the previous output
+            key = (self._chain_key, self.low_threshold, self.high_threshold)
+            frame = incremental.apply(chain, frame, key, metrics)
+            if not self.reuse_buffers:
+                frame = frame.copy()
+        elif len(chain):
+            # Process full frame
+            frame = chain.apply(frame, reuse_output=self.reuse_buffers, metrics=metrics)
+
+        return frame
+
+    def composite_rois(self, frame, rois, draw_roi=True, scale=1.0):
+        # Each region is processed on a view of the frame and the last stage writes straight
+        # back into that view: no full-frame mask, background or blend is ever built.
+        rects = []
+        for region in rois:
+            rect = self.clamp_roi(region.rect, frame.shape, scale)
+            if rect is None:
+                continue
+            x1, y1, x2, y2 = rect
+            chain = region.chain(self)
+            if len(chain):
+                view = frame[y1:y2, x1:x2]
+                chain.apply(view, out=view, metrics=self.metrics)
+            rects.append(rect)
+
+        if draw_roi:
+            # Outlines go on last so an overlapping region never processes another's border
+            for x1, y1, x2, y2 in rects:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        return frame
+
+    def draw_rois(self, frame, scale=1.0):
+        # Outlines for a frame processed with draw_roi=False, at the scale it was processed at
+        for region in self.rois:
+            rect = self.clamp_roi(region.rect, frame.shape, scale)
+            if rect is not None:
+                x1, y1, x2, y2 = rect
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        return frame
@@ -0,0 +1,294 @@
+import os
+import queue
+import struct
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Background recording. Frames are queued by the processing thread and encoded on a
+# dedicated thread, so encoder stalls never hold up the preview. When the queue is full the
+# overflow policy decides: "block" waits, "drop" discards the frame, "spill" appends it to a
+# temporary raw file on disk that the encoder drains in order once it catches up.
+
+# label -> (file extension, fourcc); fourcc None means a PNG image sequence in a directory
+CODECS = {
+    "XVID (AVI)": (".avi", "XVID"),
+    "MJPG (AVI)": (".avi", "MJPG"),
+    "FFV1 Lossless (MKV)": (".mkv", "FFV1"),
+    "Raw (AVI)": (".avi", ""),
+    "PNG Sequence": ("", None),
+}
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+
+class VideoFileOutput:
+    def __init__(self, path, fourcc, fps):
+        self.path = path
+        # An empty fourcc asks OpenCV for uncompressed frames
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc) if fourcc else 0
+        self.fps = fps
+        self.size = None
+        self._writer = None
+
+    def write(self, frame):
+        if self._writer is None:
+            # Open with the size of the first frame actually produced, not the camera's
+            height, width = frame.shape[:2]
+            self.size = (width, height)
+            self._writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, self.size)
+            if not self._writer.isOpened():
+                raise IOError(f"Could not open video writer for {self.path}")
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            # VideoWriter silently drops frames of the wrong size
+            frame = cv2.resize(frame, self.size)
+        self._writer.write(frame)
+
+    def release(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+
+class ImageSequenceOutput:
+    def __init__(self, directory, extension=".png"):
+        self.directory = directory
+        self.extension = extension
+        self.index = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame):
+        path = os.path.join(self.directory, f"frame_{self.index:06d}{self.extension}")
+        if not cv2.imwrite(path, frame):
+            raise IOError(f"Could not write {path}")
+        self.index += 1
+
+    def release(self):
+        pass
+
+
+def open_output(path, codec, fps):
+    extension, fourcc = CODECS[codec]
+    if fourcc is None:
+        return ImageSequenceOutput(path)
+    if extension and not path.lower().endswith(extension):
+        path += extension
+    return VideoFileOutput(path, fourcc, fps)
+
+
+class SpillFile:
+    # Unbounded FIFO of raw frames in a temporary file, read back in the order written
+    HEADER = struct.Struct("<III")
+
+    def __init__(self, directory=None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._read_pos = 0
+        self._write_pos = 0
+        self.pending = 0
+        self.total = 0
+
+    def append(self, frame):
+        frame = np.ascontiguousarray(frame)
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        self._file.seek(self._write_pos)
+        self._file.write(self.HEADER.pack(height, width, channels))
+        self._file.write(frame.data)
+        self._write_pos = self._file.tell()
+        self.pending += 1
+        self.total += 1
+
+    def pop(self):
+        self._file.seek(self._read_pos)
+        height, width, channels = self.HEADER.unpack(self._file.read(self.HEADER.size))
+        frame = np.empty((height, width, channels), dtype=np.uint8)
+        self._file.readinto(frame.data)
+        self._read_pos = self._file.tell()
+        self.pending -= 1
+        if self.pending == 0:
+            # Fully drained: start over at the beginning and give the space back
+            self._read_pos = self._write_pos = 0
+            self._file.truncate(0)
+        return frame
+
+    def close(self):
+        self._file.close()
+
+
+class AsyncVideoWriter:
+    # Frames passed to write() are queued without copying, so the caller must not modify
+    # them afterwards.
+    def __init__(self, output, queue_size=64, overflow="block", spill_dir=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.output = output
+        self.overflow = overflow
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill = SpillFile(spill_dir) if overflow == "spill" else None
+        # Guards the spill file and the accept/close state; never held while waiting
+        self._lock = threading.Lock()
+        # write() calls waiting for queue space in "block" mode
+        self._putting = 0
+        self._closing = threading.Event()
+        self._write_time = 0.0
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        # Returns False for a frame that was not accepted. A frame accepted before close() is
+        # always written: the encoder only stops once nothing is queued and no write() is
+        # still waiting to queue.
+        with self._lock:
+            if self._closing.is_set():
+                return False
+            if self.overflow == "block":
+                self._putting += 1
+            elif self.overflow == "drop":
+                try:
+                    self._queue.put_nowait(frame)
+                    return True
+                except queue.Full:
+                    self.frames_dropped += 1
+                    return False
+            else:
+                # Once anything is on disk, newer frames must queue behind it to keep the order
+                if self._spill.pending == 0:
+                    try:
+                        self._queue.put_nowait(frame)
+                        return True
+                    except queue.Full:
+                        pass
+                self._spill.append(frame)
+                return True
+        try:
+            # Waits for the encoder outside the lock, so close() and stats() never wait on it
+            self._queue.put(frame)
+        finally:
+            with self._lock:
+                self._putting -= 1
+        return True
+
+    def _next_frame(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        if self._spill is not None:
+            with self._lock:
+                if self._spill.pending:
+                    return self._spill.pop()
+        try:
+            return self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return None
+
+    def _run(self):
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                if self._closing.is_set() and self._drained():
+                    break
+                continue
+            if self.error is not None:
+                # Keep draining so producers never block on a dead encoder
+                self.frames_dropped += 1
+                continue
+            start = time.perf_counter()
+            try:
+                self.output.write(frame)
+                self.frames_written += 1
+            except Exception as exc:
+                self.error = exc
+            self._write_time += time.perf_counter() - start
+        self.output.release()
+        if self._spill is not None:
+            self._spill.close()
+
+    def _drained(self):
+        with self._lock:
+            return self._putting == 0 and self.queue_depth() == 0
+
+    def queue_depth(self):
+        depth = self._queue.qsize()
+        if self._spill is not None:
+            depth += self._spill.pending
+        return depth
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started
+        return {
+            "queue_depth": self._queue.qsize(),
+            "spilled_pending": self._spill.pending if self._spill is not None else 0,
+            "spilled_total": self._spill.total if self._spill is not None else 0,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            # Throughput the encoder achieves while busy vs. what it has delivered overall
+            "encode_fps": self.frames_written / self._write_time if self._write_time > 0 else 0.0,
+            "write_fps": self.frames_written / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def close(self, wait=True):
+        # Stop accepting frames; everything already queued or spilled is still written
+        with self._lock:
+            self._closing.set()
+        if wait:
+            self.join()
+
+    def join(self, timeout=None):
+        # False if the encoder is still running when the timeout expires
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+class SnapshotWriter:
+    # Encodes and writes still images on a background thread. on_done(path, error) is called
+    # from that thread once per image, with error None on success.
+    def __init__(self, on_done=None):
+        self.on_done = on_done
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="snapshots", daemon=True)
+        self._thread.start()
+
+    def save(self, path, frame):
+        # The frame is written as is, so it must not be modified after this call
+        self._queue.put((path, frame))
+
+    def save_burst(self, directory, packets, extension=".png"):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for packet in packets:
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(packet.wall_time))
+            millis = int((packet.wall_time % 1) * 1000)
+            path = os.path.join(directory, f"burst_{stamp}_{millis:03d}_{packet.index:06d}{extension}")
+            self.save(path, packet.frame)
+            paths.append(path)
+        return paths
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            path, frame = job
+            error = None
+            try:
+                if not cv2.imwrite(path, frame):
+                    error = IOError(f"Could not write {path}")
+            except cv2.error as exc:
+                error = exc
+            if self.on_done is not None:
+                self.on_done(path, error)
+
+    def close(self):
+        # Writes everything already queued, then stops
+        self._queue.put(None)
+        self._thread.join()
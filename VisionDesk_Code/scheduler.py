@@ -0,0 +1,140 @@
+import threading
+
+from processing import ScaleController
+
+# Adaptive frame scheduling. Frames are processed as they arrive from the capture thread; the
+# scheduler tracks the arrival interval, the processing and display times and the latency from
+# capture to screen, and when they do not fit the target it degrades one step at a time:
+#   1. skip display updates (show every other frame), which frees the GUI thread and the GIL
+#   2. lower the processing scale, through a ScaleController on the processor
+#   3. drop frames that already waited longer than the latency target before processing
+# Steps are undone in reverse order once there is headroom again. Changes wait for cooldown
+# frames so a single slow frame does not make it oscillate. Every skipped or dropped frame is
+# counted.
+
+LEVELS = ("full", "skip display", "lower scale", "drop late frames")
+SKIP_DISPLAY, LOWER_SCALE, DROP_LATE = 1, 2, 3
+
+
+class AdaptiveScheduler:
+    def __init__(self, processor, target_latency=0.1, target_fps=0.0, smoothing=0.1,
+                 cooldown=30):
+        self.processor = processor
+        # Capture-to-display latency to stay under, in seconds
+        self.target_latency = target_latency
+        # Frame rate to keep up with; 0 follows the camera's actual frame arrival, measured on
+        # every captured frame (arrived()), before the capture queue drops any under load
+        self.target_fps = target_fps
+        self.smoothing = smoothing
+        self.cooldown = cooldown
+        self.level = 0
+        self.arrival_interval = None
+        self.process_time = None
+        self.display_time = None
+        self.latency = None
+        self.display_skipped = 0
+        self.dropped_late = 0
+        self._last_arrival = None
+        self._last_display = 0.0
+        self._wait = 0
+        # ScaleController installed at LOWER_SCALE; a user-chosen one is left alone
+        self._scale_controller = None
+        self._lock = threading.Lock()
+
+    def _average(self, current, sample):
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    @property
+    def frame_budget(self):
+        # Time available per frame: the target rate if set, else the camera's frame interval
+        if self.target_fps > 0:
+            return 1.0 / self.target_fps
+        return self.arrival_interval or 1.0 / 30.0
+
+    def arrived(self, t_capture):
+        # Capture thread, for every frame the source delivers. Frames that reach processing
+        # are too few to measure the camera by: under load the capture queue drops the rest,
+        # and their spacing would grow with the processing time it is compared against.
+        with self._lock:
+            if self._last_arrival is not None and t_capture > self._last_arrival:
+                self.arrival_interval = self._average(self.arrival_interval,
+                                                      t_capture - self._last_arrival)
+            self._last_arrival = t_capture
+
+    def admit(self, packet, now):
+        # Processing thread, before processing. False means drop the frame.
+        with self._lock:
+            if self.level >= DROP_LATE and now - packet.t_capture > self.target_latency:
+                self.dropped_late += 1
+                return False
+            return True
+
+    def processed(self, elapsed):
+        # Processing thread, after processing
+        with self._lock:
+            self.process_time = self._average(self.process_time, elapsed)
+            self._adjust()
+
+    def should_display(self, now):
+        # Processing thread, before notifying the GUI. A skipped frame stays in the display
+        # queue, so the next notification still shows the newest frame.
+        with self._lock:
+            if self.level >= SKIP_DISPLAY and now - self._last_display < 2.0 * self.frame_budget:
+                self.display_skipped += 1
+                return False
+            self._last_display = now
+            return True
+
+    def displayed(self, packet, elapsed):
+        # GUI thread, once the frame is on screen
+        with self._lock:
+            self.display_time = self._average(self.display_time, elapsed)
+            self.latency = self._average(self.latency, packet.t_displayed - packet.t_capture)
+
+    def _adjust(self):
+        if self._wait > 0:
+            self._wait -= 1
+            return
+        budget = self.frame_budget
+        # Processing and display share the interpreter, so both count against the budget
+        busy = (self.process_time or 0.0) + (self.display_time or 0.0)
+        latency = self.latency or 0.0
+        if (busy > budget or latency > self.target_latency) and self.level < len(LEVELS) - 1:
+            self._set_level(self.level + 1)
+        elif self.level > 0 and busy < 0.7 * budget and latency < 0.7 * self.target_latency:
+            # The headroom may only come from the lower scale; its controller steps back up to
+            # full resolution on its own once that fits, and only then is it removed
+            controller = self._scale_controller
+            if self.level == LOWER_SCALE and controller is not None and controller.level > 0:
+                return
+            self._set_level(self.level - 1)
+
+    def _set_level(self, level):
+        processor = self.processor
+        if level >= LOWER_SCALE and processor.scale_controller is None:
+            self._scale_controller = ScaleController(target_fps=1.0 / self.frame_budget)
+            processor.scale_controller = self._scale_controller
+        elif level < LOWER_SCALE and self._scale_controller is not None:
+            if processor.scale_controller is self._scale_controller:
+                processor.scale_controller = None
+            self._scale_controller = None
+        self.level = level
+        self._wait = self.cooldown
+
+    def stop(self):
+        # Hand the processor back in its original state
+        with self._lock:
+            self._set_level(0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "level": self.level,
+                "mode": LEVELS[self.level],
+                "frame_budget_ms": self.frame_budget * 1000.0,
+                "latency_ms": (self.latency or 0.0) * 1000.0,
+                "display_skipped": self.display_skipped,
+                "dropped_late": self.dropped_late,
+            }
@@ -0,0 +1,300 @@
+import os
+import threading
+import time
+
+import cv2
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from capture import URL_PREFIXES
+from pipeline import FrameHistory, FramePacket
+from processing import FrameProcessor
+
+# Several sources (camera indices, video files, http/rtsp URLs) processed by one fixed pool of
+# worker threads. Each stream keeps only its newest unprocessed frame, and workers take streams
+# in round-robin order, one frame per stream per turn, so a fast camera cannot starve a slow
+# one and the processing cost follows the total pixel rate rather than the number of cameras.
+# Capture threads only wait on their source; all filtering happens on the pool.
+
+
+def parse_source(text):
+    # A bare integer selects a camera, anything else is handed to OpenCV as a file/URL
+    text = str(text).strip()
+    return int(text) if text.isdigit() else text
+
+
+def source_label(source):
+    if isinstance(source, int):
+        return f"Camera {source}"
+    if source.startswith(URL_PREFIXES):
+        return source
+    return os.path.basename(source)
+
+
+class Stream:
+    # One source with its own processor (thresholds, ROIs, filters, flip, scale) and history.
+    # Settings are changed on the GUI thread by assigning to stream.processor, exactly like
+    # the single-camera app does.
+    def __init__(self, key, source, processor=None, history_size=30, loop=True):
+        self.key = key
+        self.source = source
+        self.label = source_label(source)
+        self.processor = processor if processor is not None else FrameProcessor()
+        self.history = FrameHistory(history_size)
+        # Files restart at the end so a test rig can run indefinitely
+        self.loop = loop
+        self.latest = None
+        self.error = None
+        self.frame_size = (0, 0)
+        self.fps = 0.0
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        # Owned by the worker pool and guarded by its condition
+        self._pending = None
+        self._busy = False
+        self._capture = None
+        self._thread = None
+        self._running = threading.Event()
+
+    @property
+    def is_file(self):
+        return isinstance(self.source, str) and not self.source.startswith(URL_PREFIXES)
+
+    def open(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            self.error = f"Could not open {self.label}"
+            return None
+        self.frame_size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.error = None
+        return capture
+
+    def start(self, pool):
+        self._running.set()
+        self._thread = threading.Thread(target=self._capture_loop, args=(pool,),
+                                        name=f"capture-{self.key}", daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self, pool):
+        # The source is opened here, so a slow camera or unreachable URL never holds up the
+        # GUI or the other streams
+        self._capture = capture = self.open()
+        if capture is None:
+            return
+        # Files are paced to their own frame rate; live sources block in read()
+        interval = 1.0 / self.fps if self.is_file and self.fps > 0 else 0.0
+        next_time = time.perf_counter()
+        while self._running.is_set():
+            ret, frame = capture.read()
+            if not ret:
+                self.read_failures += 1
+                if self.is_file and self.loop:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                else:
+                    time.sleep(0.01)
+                continue
+            t_capture = time.perf_counter()
+            pool.submit(self, FramePacket(self.frames_captured, frame, t_capture))
+            self.frames_captured += 1
+            if interval:
+                next_time = max(next_time + interval, t_capture - interval)
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        capture.release()
+
+    def stop(self):
+        self._running.clear()
+
+    def join(self, timeout=None):
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def process(self, packet):
+        # Runs on a pool worker; never concurrently for the same stream
+        frame = self.processor.process(packet.raw, draw_roi=False)
+        packet.frame = frame
+        packet.scale = frame.shape[1] / packet.raw.shape[1]
+        return packet
+
+
+class StreamWorkerPool:
+    # Fixed set of worker threads shared by every stream. A stream is only ever handled by
+    # one worker at a time, which keeps its frames in order and its processor's buffers safe.
+    def __init__(self, workers=None, on_processed=None, metrics=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.on_processed = on_processed
+        self.metrics = metrics
+        self._streams = []
+        self._cursor = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def add(self, stream):
+        with self._cond:
+            # Replaced rather than appended so the scheduler's loop never sees a resize
+            self._streams = self._streams + [stream]
+
+    def remove(self, stream):
+        with self._cond:
+            self._streams = [s for s in self._streams if s is not stream]
+            stream._pending = None
+
+    def submit(self, stream, packet):
+        # Called from capture threads. Only the newest frame per stream waits for a worker;
+        # one that was still waiting is replaced and counted as dropped.
+        with self._cond:
+            if stream._pending is not None:
+                stream.frames_dropped += 1
+            stream._pending = packet
+            self._cond.notify()
+
+    def start(self):
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"stream-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def _next_job(self):
+        with self._cond:
+            while self._running:
+                streams = self._streams
+                count = len(streams)
+                for offset in range(count):
+                    index = (self._cursor + offset) % count
+                    stream = streams[index]
+                    if stream._pending is not None and not stream._busy:
+                        # The next search starts after this stream: round-robin fairness
+                        self._cursor = index + 1
+                        packet, stream._pending = stream._pending, None
+                        stream._busy = True
+                        return stream, packet
+                self._cond.wait(0.1)
+            return None
+
+    def _run(self):
+        # Every worker is one of a fixed number of threads, so keep OpenCV from adding its
+        # own pool on top
+        cv2.setNumThreads(1)
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            stream, packet = job
+            start = time.perf_counter()
+            try:
+                stream.process(packet)
+            except Exception as exc:
+                # One bad frame or filter must not take a worker away from every other stream
+                stream.error = str(exc) or type(exc).__name__
+                packet = None
+            finally:
+                with self._cond:
+                    stream._busy = False
+                    if stream._pending is not None:
+                        self._cond.notify()
+            if packet is None:
+                continue
+            packet.t_processed = time.perf_counter()
+            if self.metrics is not None:
+                self.metrics.record("queue_wait", start - packet.t_capture)
+                self.metrics.record(f"process.{stream.key}", packet.t_processed - start)
+            stream.frames_processed += 1
+            stream.history.append(packet)
+            stream.latest = packet
+            if self.on_processed is not None:
+                self.on_processed(stream)
+
+
+class StreamManager(QObject):
+    # Owns the streams and the shared pool. frames_ready is emitted from pool threads at most
+    # once until the GUI calls take_updated(), like FramePipeline.frame_ready.
+    frames_ready = pyqtSignal()
+
+    def __init__(self, workers=None, history_size=30, metrics=None):
+        super().__init__()
+        self.metrics = metrics
+        self.history_size = history_size
+        self.streams = []
+        self.pool = StreamWorkerPool(workers, on_processed=self._on_processed, metrics=metrics)
+        self._updated = set()
+        self._lock = threading.Lock()
+        self._notify_pending = threading.Event()
+        self._started = False
+        self._next_key = 0
+
+    def add_stream(self, source, **settings):
+        # settings are FrameProcessor keyword arguments for this stream only
+        processor = FrameProcessor(reuse_buffers=False, metrics=self.metrics, **settings)
+        stream = Stream(f"stream{self._next_key}", parse_source(source), processor,
+                        history_size=self.history_size)
+        self._next_key += 1
+        self.streams = self.streams + [stream]
+        self.pool.add(stream)
+        if self._started:
+            stream.start(self.pool)
+        return stream
+
+    def remove_stream(self, stream):
+        stream.stop()
+        self.pool.remove(stream)
+        self.streams = [s for s in self.streams if s is not stream]
+        with self._lock:
+            self._updated.discard(stream)
+        stream.join(timeout=1.0)
+
+    def start(self):
+        self._started = True
+        self.pool.start()
+        for stream in self.streams:
+            stream.start(self.pool)
+
+    def stop(self):
+        for stream in self.streams:
+            stream.stop()
+        self.pool.stop()
+        for stream in self.streams:
+            stream.join(timeout=1.0)
+
+    def _on_processed(self, stream):
+        with self._lock:
+            self._updated.add(stream)
+        if not self._notify_pending.is_set():
+            self._notify_pending.set()
+            self.frames_ready.emit()
+
+    def take_updated(self):
+        # Streams with a new processed frame since the last call
+        self._notify_pending.clear()
+        with self._lock:
+            updated, self._updated = self._updated, set()
+        return updated
+
+    def pixel_rate(self):
+        # Captured pixels per second over all streams, the figure the pool has to keep up with
+        return sum(s.frame_size[0] * s.frame_size[1] * (s.fps or 30.0) for s in self.streams
+                   if s.error is None)
+
+    def update_metrics(self):
+        if self.metrics is None:
+            return
+        for stream in self.streams:
+            self.metrics.set_counter(f"{stream.key}_frames_captured", stream.frames_captured)
+            self.metrics.set_counter(f"{stream.key}_frames_processed", stream.frames_processed)
+            self.metrics.set_counter(f"{stream.key}_frames_dropped", stream.frames_dropped)
+        self.metrics.set_gauge("streams", len(self.streams))
+        self.metrics.set_gauge("stream_workers", self.pool.workers)
+        self.metrics.set_gauge("pixel_rate_mpx", self.pixel_rate() / 1e6)
@@ -0,0 +1,77 @@
+# Application stylesheet, shared by the single-camera app (Canny.py) and multicam.py
+
+APP_STYLESHEET = """
+    QMainWindow {
+        background-color: #2c3e50;
+        color: #ecf0f1;
+    }
+    QLabel {
+        color: #ecf0f1;
+    }
+    QPushButton {
+        background-color: #3498db;
+        color: white;
+        border: none;
+        padding: 8px;
+        border-radius: 4px;
+    }
+    QPushButton:hover {
+        background-color: #2980b9;
+    }
+    QPushButton:pressed {
+        background-color: #1c6ea4;
+    }
+    QSlider::groove:horizontal {
+        border: 1px solid #999999;
+        height: 8px;
+        background: #3c4c5c;
+        margin: 2px 0;
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        background: #3498db;
+        border: 1px solid #5c5c5c;
+        width: 18px;
+        margin: -2px 0;
+        border-radius: 9px;
+    }
+    QGroupBox {
+        border: 2px solid #3498db;
+        border-radius: 5px;
+        margin-top: 12px;
+        padding-top: 15px;
+        color: #ecf0f1;
+    }
+    QGroupBox::title {
+        subcontrol-origin: margin;
+        subcontrol-position: top center;
+        padding: 0 5px;
+        color: #3498db;
+    }
+    QComboBox {
+        background-color: #34495e;
+        color: #ecf0f1;
+        border: 1px solid #3498db;
+        padding: 5px;
+        border-radius: 3px;
+    }
+    QComboBox::drop-down {
+        border: none;
+    }
+    QComboBox QAbstractItemView {
+        background-color: #34495e;
+        color: #ecf0f1;
+        selection-background-color: #3498db;
+    }
+    QCheckBox {
+        color: #ecf0f1;
+    }
+    QCheckBox::indicator {
+        width: 15px;
+        height: 15px;
+    }
+    QStatusBar {
+        background-color: #34495e;
+        color: #ecf0f1;
+    }
+"""
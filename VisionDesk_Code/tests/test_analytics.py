@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import AnalyticsStage, ColumnarSink, JsonLinesSink, read_columns  # noqa: E402
+from processing import FrameProcessor, RoiRegion  # noqa: E402
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+def edge_frame():
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[40:80, 50:110] = 255
+    return frame
+
+
+def test_regions_skipped_counts_latest_frame():
+    processor = FrameProcessor(canny_active=True, flip=False,
+                               rois=[RoiRegion((0, 0, 80, 60)),
+                                     RoiRegion((80, 60, 160, 120), filters=["Invert"])])
+    stage = AnalyticsStage(processor, ListSink())
+    for index in range(5):
+        stage.process(edge_frame(), index, float(index))
+        assert stage.regions_skipped == 1
+    processor.rois = processor.rois[:1]
+    stage.process(edge_frame(), 5, 5.0)
+    assert stage.regions_skipped == 0
+
+
+def test_sinks_replace_existing_output(tmp_path):
+    record = {"frame": 0, "t": 0.0, "regions": []}
+    path = tmp_path / "edges.jsonl"
+    path.write_text("stale\n")
+    sink = JsonLinesSink(str(path))
+    sink.write(record)
+    sink.close()
+    assert path.read_text().splitlines() == [json.dumps(record, separators=(",", ":"))]
+    sink = JsonLinesSink(str(path), append=True)
+    sink.write(record)
+    sink.close()
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_columnar_matches_json_records(tmp_path):
+    processor = FrameProcessor(canny_active=True, flip=False)
+    columns_path = str(tmp_path / "columns")
+    records = ListSink()
+    for sink in (records, ColumnarSink(columns_path), ColumnarSink(columns_path)):
+        # The second columnar sink replaces what the first one wrote
+        stage = AnalyticsStage(processor, sink)
+        stage.process(edge_frame(), 0, 0.5, wall_time=1700000000.25)
+        stage.process(edge_frame(), 1, 1.5)
+        stage.close()
+    data = read_columns(columns_path)
+    assert data["regions.frame"].tolist() == [r["frame"] for r in records.records[:2]]
+    assert data["regions.t"].tolist() == [0.5, 1.5]
+    assert data["regions.wall_time"][0] == records.records[0]["wall_time"]
+    assert np.isnan(data["regions.wall_time"][1])
+    assert data["regions.edge_pixels"].tolist() == [r["regions"][0]["edge_pixels"]
+                                                    for r in records.records[:2]]
+
+
+def test_columnar_append_requires_same_schema(tmp_path):
+    path = str(tmp_path / "columns")
+    ColumnarSink(path).close()
+    with open(os.path.join(path, "schema.json"), "w") as f:
+        json.dump({"version": 1, "columns": {}}, f)
+    with pytest.raises(ValueError):
+        ColumnarSink(path, append=True)
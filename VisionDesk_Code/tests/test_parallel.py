@@ -0,0 +1,68 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import parse_args  # noqa: E402
+from parallel import ParallelVideoEngine  # noqa: E402
+from processing import FrameProcessor, RoiRegion  # noqa: E402
+from tuning import AutoThreshold  # noqa: E402
+
+
+def write_clip(path, frames=20, width=160, height=120):
+    # Lossless, so the serial and the parallel run decode exactly the same frames
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"FFV1"), 30.0, (width, height))
+    if not writer.isOpened():
+        pytest.skip("no FFV1 encoder in this OpenCV build")
+    rng = np.random.default_rng(0)
+    for index in range(frames):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        cv2.rectangle(frame, (10 + 4 * index, 20), (60 + 4 * index, 80), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def serial(path, settings):
+    processor = FrameProcessor(reuse_buffers=True, **settings)
+    capture = cv2.VideoCapture(path)
+    results = []
+    while True:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        results.append(processor.process(frame, draw_roi=False).copy())
+    capture.release()
+    return results
+
+
+SETTINGS = {
+    "canny": dict(canny_active=True),
+    "chain": dict(filters=["Blur", "Sharpen"], canny_active=True, low_threshold=30),
+    "rois": dict(canny_active=True, flip=True,
+                 rois=[RoiRegion((0, 0, 80, 60)), RoiRegion((70, 50, 150, 110), filters=["Sepia"])]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(SETTINGS))
+def test_parallel_matches_serial(tmp_path, name):
+    path = str(tmp_path / "clip.mkv")
+    write_clip(path)
+    expected = serial(path, SETTINGS[name])
+    results = []
+    engine = ParallelVideoEngine(SETTINGS[name], workers=3, chunk_size=2)
+    engine.run(path, lambda frame: results.append(frame.copy()))
+    assert len(results) == len(expected)
+    for got, want in zip(results, expected):
+        assert np.array_equal(got, want)
+
+
+def test_stateful_settings_are_rejected():
+    with pytest.raises(ValueError):
+        ParallelVideoEngine({"auto_threshold": AutoThreshold("median")}, workers=2)
+    with pytest.raises(SystemExit):
+        parse_args(["clip.mp4", "--workers", "2", "--incremental"])
+    assert parse_args(["clip.mp4", "--workers", "1", "--incremental"]).incremental
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ResultCache  # noqa: E402
+from processing import FrameProcessor, RoiRegion  # noqa: E402
+
+
+def gradient_frame(width=160, height=120):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = x[None, :, None]
+    frame[40:80, 60:100] = 255
+    return frame
+
+
+def cached_frame():
+    # Frames handed out by a ClipSource with a ResultCache are the cache's read-only arrays
+    cache = ResultCache()
+    cache.put(("clip", 0), gradient_frame())
+    return cache.get(("clip", 0))
+
+
+def test_read_only_input_with_rois_and_reused_buffers():
+    frame = cached_frame()
+    assert not frame.flags.writeable
+    original = frame.copy()
+    processor = FrameProcessor(canny_active=True, flip=False, reuse_buffers=True,
+                               rois=[RoiRegion((20, 20, 120, 100)),
+                                     RoiRegion((0, 0, 40, 40), filters=["Invert"])])
+    result = processor.process(frame, draw_roi=False)
+    assert result is not frame
+    assert np.array_equal(frame, original)
+    assert np.array_equal(result[:20, 120:], original[:20, 120:])
+    assert np.array_equal(result[:20, :20], 255 - original[:20, :20])
+
+
+def test_read_only_input_full_frame_chain():
+    frame = cached_frame()
+    processor = FrameProcessor(flip=False, reuse_buffers=True, filters=["Blur", "Invert"])
+    result = processor.process(frame)
+    assert result.shape == frame.shape
+    assert np.array_equal(frame, gradient_frame())
@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import AsyncVideoWriter  # noqa: E402
+
+
+class SlowOutput:
+    def __init__(self, delay=0.002):
+        self.delay = delay
+        self.frames = []
+        self.released = False
+
+    def write(self, frame):
+        time.sleep(self.delay)
+        self.frames.append(int(frame[0, 0, 0]))
+
+    def release(self):
+        self.released = True
+
+
+@pytest.mark.parametrize("overflow", ["block", "drop", "spill"])
+def test_every_accepted_frame_is_written_when_close_races_write(overflow):
+    output = SlowOutput()
+    writer = AsyncVideoWriter(output, queue_size=4, overflow=overflow)
+    accepted = []
+
+    def produce():
+        for index in range(200):
+            if writer.write(np.full((2, 2, 3), index % 256, dtype=np.uint8)):
+                accepted.append(index % 256)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    time.sleep(0.02)
+    writer.close(wait=False)
+    producer.join()
+    assert writer.join(timeout=10.0)
+    assert output.released
+    assert output.frames == accepted
+
+
+def test_close_does_not_wait_for_a_blocked_write():
+    output = SlowOutput(delay=0.2)
+    writer = AsyncVideoWriter(output, queue_size=1, overflow="block")
+    producer = threading.Thread(target=lambda: [writer.write(np.zeros((2, 2, 3), np.uint8))
+                                                for _ in range(4)])
+    producer.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    writer.close(wait=False)
+    writer.stats()
+    assert time.perf_counter() - start < 0.1
+    producer.join()
+    assert writer.join(timeout=5.0)
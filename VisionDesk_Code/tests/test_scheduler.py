@@ -0,0 +1,54 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing import FrameProcessor  # noqa: E402
+from scheduler import DROP_LATE, LEVELS, AdaptiveScheduler  # noqa: E402
+
+CAMERA_INTERVAL = 1.0 / 30.0
+
+
+def run(scheduler, t, frames, process_time, admit_every=1):
+    # A 30 fps camera; only every admit_every-th frame gets past the capture queue, as when
+    # the drop-oldest queue sheds load
+    levels = []
+    for index in range(frames):
+        t += CAMERA_INTERVAL
+        scheduler.arrived(t)
+        if index % admit_every:
+            continue
+        packet = SimpleNamespace(t_capture=t, t_displayed=None)
+        if scheduler.admit(packet, t):
+            scheduler.processed(process_time)
+            packet.t_displayed = t + process_time
+            scheduler.displayed(packet, 0.001)
+        levels.append(scheduler.level)
+    return t, levels
+
+
+def test_level_rises_under_load_and_recovers():
+    processor = FrameProcessor()
+    scheduler = AdaptiveScheduler(processor, target_latency=0.5, cooldown=5)
+    # Processing takes 1.8 camera intervals, so only every other frame reaches it. Measured
+    # on those frames alone the camera would seem to fit the budget.
+    t, levels = run(scheduler, 0.0, 400, 0.06, admit_every=2)
+    assert abs(scheduler.frame_budget - CAMERA_INTERVAL) < 1e-3
+    assert levels == sorted(levels)
+    assert scheduler.level == DROP_LATE
+    assert processor.scale_controller is not None
+
+    t, levels = run(scheduler, t, 400, 0.005)
+    assert levels == sorted(levels, reverse=True)
+    assert scheduler.level == 0
+    assert processor.scale_controller is None
+    assert scheduler.stats()["mode"] == LEVELS[0]
+
+
+def test_level_stays_at_full_when_processing_fits():
+    scheduler = AdaptiveScheduler(FrameProcessor(), cooldown=5)
+    run(scheduler, 0.0, 300, 0.01)
+    assert scheduler.level == 0
+    assert scheduler.display_skipped == 0
+    assert scheduler.dropped_late == 0
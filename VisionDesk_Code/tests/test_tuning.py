@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import CannyStage, compile_chain  # noqa: E402
+from tuning import AutoThreshold, pre_canny_stages, sweep, sweep_async  # noqa: E402
+
+
+def textured_frame(seed, width=160, height=120):
+    rng = np.random.default_rng(seed)
+    frame = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 2)
+    return cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX)
+
+
+def canny_density(frames, low, high):
+    # edges() writes into the stage's own buffer, so count before the next frame
+    stage = CannyStage(int(low), int(high))
+    counts = [np.count_nonzero(stage.edges(frame)) for frame in frames]
+    return sum(counts) / sum(frame.shape[0] * frame.shape[1] for frame in frames)
+
+
+def test_sweep_matches_canny_for_every_pair():
+    frames = [textured_frame(0), textured_frame(1)]
+    result = sweep(frames)
+    for row, low in enumerate(result.lows):
+        for col, high in enumerate(result.highs):
+            if high < low:
+                assert np.isnan(result.density[row, col])
+            else:
+                assert result.density[row, col] == pytest.approx(canny_density(frames, low, high),
+                                                                 abs=1e-12)
+
+
+def test_sweep_runs_pre_canny_stages_first():
+    frame = textured_frame(2)
+    names = ["Sharpen", "Canny", "Invert"]
+    stages = pre_canny_stages(names)
+    assert stages == ["Sharpen"]
+    sharpened = compile_chain(stages).apply(frame, reuse_output=False)
+    result = sweep(frame, lows=[40, 80], highs=[120], stages=stages)
+    assert result.density[0, 0] == pytest.approx(canny_density([sharpened], 40, 120), abs=1e-12)
+    assert result.density[1, 0] == pytest.approx(canny_density([sharpened], 80, 120), abs=1e-12)
+    assert pre_canny_stages(["Blur"]) == ["Blur"]
+
+
+def test_sweep_async_reports_result():
+    done = threading.Event()
+    results = []
+
+    def on_done(result, seconds):
+        results.append((result, seconds))
+        done.set()
+
+    sweep_async([textured_frame(3)], on_done).join(timeout=30)
+    assert done.is_set()
+    result, seconds = results[0]
+    assert seconds >= 0
+    assert np.array_equal(result.density, sweep(textured_frame(3)).density, equal_nan=True)
+
+
+def test_auto_threshold_median():
+    frame = np.full((60, 80, 3), 100, dtype=np.uint8)
+    auto = AutoThreshold("median", sigma=0.33)
+    assert auto.measure(frame) == pytest.approx((67.0, 133.0))
+    assert auto.update(frame) == (67, 133)
+
+
+def test_auto_threshold_otsu():
+    frame = np.zeros((60, 80, 3), dtype=np.uint8)
+    frame[:, 40:] = 200
+    low, high = AutoThreshold("otsu").measure(frame)
+    assert 0 <= high < 200
+    assert low == pytest.approx(0.5 * high)
+
+
+def test_auto_threshold_smoothing():
+    dark = np.full((60, 80, 3), 50, dtype=np.uint8)
+    bright = np.full((60, 80, 3), 150, dtype=np.uint8)
+    auto = AutoThreshold("median", sigma=0.0, smoothing=0.5)
+    assert auto.update(dark) == (50, 50)
+    assert auto.update(bright) == (100, 100)
+    assert auto.update(bright) == (125, 125)
+
+
+def test_auto_threshold_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        AutoThreshold("mean")
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from filters import canny_gradients, compile_chain
+
+# Threshold tuning for Canny. sweep() evaluates a whole grid of (low, high) pairs on one frame
+# or a batch of frames: gradients and non-maximum suppression are computed once per frame,
+# then each low threshold needs one connected-components pass, after which the edge count for
+# every high threshold follows from a single matrix product. AutoThreshold picks thresholds
+# from the image statistics (median or Otsu) and is cheap enough to run on every frame.
+# Stages that run before Canny in the live chain are applied to the frames first, so the
+# grid describes the image Canny actually sees.
+
+DEFAULT_GRID = np.arange(0, 256, 10)
+AUTO_METHODS = ("median", "otsu")
+
+# tan(22.5 degrees), the same direction binning cv2.Canny uses
+TAN_22_5 = 0.41421356237309503
+
+
+def suppress_non_maxima(dx, dy):
+    # Returns (magnitude, keep) where keep marks local maxima along the gradient direction,
+    # following cv2.Canny: L1 magnitude, zero border, four direction bins
+    dx = dx.astype(np.int32)
+    dy = dy.astype(np.int32)
+    ax, ay = np.abs(dx), np.abs(dy)
+    magnitude = ax + ay
+    padded = np.pad(magnitude, 1)
+    centre = padded[1:-1, 1:-1]
+    up, down = padded[:-2, 1:-1], padded[2:, 1:-1]
+    left, right = padded[1:-1, :-2], padded[1:-1, 2:]
+
+    horizontal = ay < ax * TAN_22_5
+    vertical = ~horizontal & (ay > ax * (TAN_22_5 + 2.0))
+    diagonal = ~horizontal & ~vertical
+    same_sign = (dx ^ dy) >= 0
+    keep = horizontal & (centre > left) & (centre >= right)
+    keep |= vertical & (centre > up) & (centre >= down)
+    keep |= diagonal & same_sign & (centre > padded[:-2, :-2]) & (centre > padded[2:, 2:])
+    keep |= diagonal & ~same_sign & (centre > padded[:-2, 2:]) & (centre > padded[2:, :-2])
+    return magnitude, keep
+
+
+class SweepResult:
+    def __init__(self, lows, highs, density):
+        self.lows = np.asarray(lows)
+        self.highs = np.asarray(highs)
+        # Fraction of pixels that are edges, shape (len(lows), len(highs)); NaN where high < low
+        self.density = density
+
+    def best_pair(self, target_density):
+        # The valid pair whose edge density is closest to the target
+        error = np.abs(self.density - target_density)
+        error[np.isnan(error)] = np.inf
+        row, col = np.unravel_index(np.argmin(error), error.shape)
+        return int(self.lows[row]), int(self.highs[col])
+
+
+def pre_canny_stages(names):
+    # The part of a chain that feeds Canny; a chain without Canny is all pre-Canny
+    names = list(names)
+    return names[:names.index("Canny")] if "Canny" in names else names
+
+
+def sweep(frames, lows=DEFAULT_GRID, highs=DEFAULT_GRID, stages=()):
+    # frames is one BGR frame or a list of them; all pairs are evaluated on every frame.
+    # stages names the filters to run before Canny, compiled here so the caller's chain and
+    # its buffers are never shared with this thread
+    if isinstance(frames, np.ndarray):
+        frames = [frames]
+    prefix = compile_chain(stages)
+    lows = np.asarray(lows)
+    highs = np.asarray(highs)
+    counts = np.zeros((len(lows), len(highs)), dtype=np.int64)
+    pixels = 0
+    for frame in frames:
+        if len(prefix):
+            frame = prefix.apply(frame, reuse_output=False)
+        magnitude, keep = suppress_non_maxima(*canny_gradients(frame))
+        pixels += magnitude.size
+        peak = magnitude[keep].max() if keep.any() else 0
+        for row, low in enumerate(lows):
+            if low >= peak:
+                continue
+            # Weak candidates: local maxima above low, grouped into 8-connected chains
+            candidates = keep & (magnitude > low)
+            count, labels = cv2.connectedComponents(candidates.view(np.uint8), connectivity=8,
+                                                    ltype=cv2.CV_32S)
+            chain_labels = labels[candidates]
+            sizes = np.bincount(chain_labels, minlength=count)
+            strongest = np.zeros(count, dtype=np.int32)
+            np.maximum.at(strongest, chain_labels, magnitude[candidates])
+            # Hysteresis keeps a whole chain when any of its pixels is above high
+            counts[row] += (strongest[None, 1:] > highs[:, None]) @ sizes[1:]
+    density = counts / max(1, pixels)
+    density[highs[None, :] < lows[:, None]] = np.nan
+    return SweepResult(lows, highs, density)
+
+
+def sweep_async(frames, on_done, stages=()):
+    # Runs sweep() on a background thread and calls on_done(result, seconds) from there;
+    # a full grid over a burst of frames takes long enough to stall a GUI
+    def run():
+        start = time.perf_counter()
+        result = sweep(frames, stages=stages)
+        on_done(result, time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, name="threshold-sweep", daemon=True)
+    thread.start()
+    return thread
+
+
+def heatmap_image(result, cell=16):
+    # BGR picture of the density grid: lows down, highs across, invalid cells dark grey
+    density = result.density
+    valid = ~np.isnan(density)
+    peak = density[valid].max() if valid.any() else 0.0
+    scaled = np.zeros(density.shape, dtype=np.uint8)
+    if peak > 0:
+        scaled[valid] = np.clip(density[valid] / peak * 255.0, 0, 255).astype(np.uint8)
+    image = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    image[~valid] = (60, 60, 60)
+    rows, cols = density.shape
+    return cv2.resize(image, (cols * cell, rows * cell), interpolation=cv2.INTER_NEAREST)
+
+
+class AutoThreshold:
+    # Per-frame thresholds from the grey-level statistics of a small copy of the frame:
+    # "median" uses (1 -/+ sigma) * median, "otsu" uses Otsu's threshold as high and half
+    # of it as low. Results are smoothed so the edges do not flicker from frame to frame.
+    def __init__(self, method="median", sigma=0.33, smoothing=0.2, width=320):
+        if method not in AUTO_METHODS:
+            raise ValueError(f"Unknown auto threshold method: {method}")
+        self.method = method
+        self.sigma = sigma
+        self.smoothing = smoothing
+        self.width = width
+        self._low = None
+        self._high = None
+
+    def measure(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.width:
+            size = (self.width, max(1, height * self.width // width))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.method == "otsu":
+            high, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            return 0.5 * high, high
+        histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        median = float(np.searchsorted(np.cumsum(histogram), gray.size / 2.0))
+        return max(0.0, (1.0 - self.sigma) * median), min(255.0, (1.0 + self.sigma) * median)
+
+    def update(self, frame):
+        low, high = self.measure(frame)
+        if self._low is None:
+            self._low, self._high = low, high
+        else:
+            self._low += self.smoothing * (low - self._low)
+            self._high += self.smoothing * (high - self._high)
+        return int(round(self._low)), int(round(self._high))